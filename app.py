@@ -1,11 +1,22 @@
-from flask import Flask, render_template, request, jsonify, session, send_from_directory, redirect, url_for
+import time
+# Cold start is timed from here, before the framework imports, to the end of this module (startup_seconds)
+IMPORT_STARTED = time.perf_counter()
+
+from flask import Flask, render_template, request, jsonify, session, send_from_directory, redirect, url_for, Response, stream_with_context, abort
 import os
 import re
 import tempfile
 import base64
 import json
 import logging
-import time
+import logging.handlers
+import multiprocessing
+import queue
+import atexit
+import itertools
+import contextlib
+import contextvars
+import functools
 import subprocess
 import math
 import random
@@ -14,36 +25,171 @@ import glob
 import difflib
 from difflib import SequenceMatcher
 from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
+from flask.sessions import SecureCookieSessionInterface
 from dotenv import load_dotenv
+import click
 import traceback
+import gzip
+import hashlib
+import heapq
+import hmac
+import cProfile
+import marshal
+import tracemalloc
+import uuid
+import shutil
+import sys
+import array
+import struct
+import threading
+import wave
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+try:
+    import brotli  # In requirements.txt; enables Content-Encoding: br
+except ImportError:
+    brotli = None
+
+try:
+    import fcntl  # POSIX: locks reading progress files across worker processes
+except ImportError:
+    fcntl = None
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Configure logging with more detailed format
-logging.basicConfig(
-    level=logging.INFO,  # Set to INFO instead of DEBUG for production
-    format='%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s',
-    handlers=[
-        logging.FileHandler("app.log"),
-        logging.StreamHandler()  # This outputs to console
-    ]
-)
+# Logging configuration
+LOG_FILE = os.getenv('LOG_FILE', 'app.log')
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()  # INFO instead of DEBUG for production
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))  # Rotate app.log at 10 MB
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+# Sampling of very frequent messages: "<child logger>=<N>" keeps 1 in N records below WARNING
+LOG_SAMPLE_RATES = os.getenv('LOG_SAMPLE_RATES', 'realtime=10')
+
+class SamplingFilter(logging.Filter):
+    """Pass one in every `rate` records below WARNING; warnings and errors always pass"""
+    
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = max(1, rate)
+        self._counter = itertools.count()
+    
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or next(self._counter) % self.rate == 0
+
+# ID of the request being handled, set by start_request_trace(); "-" outside requests
+_request_id_var = contextvars.ContextVar('request_id', default='-')
+
+class RequestIdFilter(logging.Filter):
+    """Stamp each record with the ID of the request that logged it"""
+    
+    def filter(self, record):
+        record.request_id = _request_id_var.get()
+        return True
+
+class ProcessQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler for a multiprocessing.SimpleQueue, which has put() but no put_nowait()"""
+    
+    def enqueue(self, record):
+        self.queue.put(record)
+
+class ProcessQueueListener(logging.handlers.QueueListener):
+    """QueueListener reading a multiprocessing.SimpleQueue, whose get() takes no arguments"""
+    
+    def dequeue(self, block):
+        return self.queue.get()
+    
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+# Set in the environment of the PDF/OCR pool processes, which do not write LOG_FILE
+POOL_PROCESS_ENV = 'APP_POOL_PROCESS'
+
+# Open for the life of the process that writes LOG_FILE; its flock marks it as the writer
+_log_lock_file = None
+
+def log_file_path():
+    """
+    Return the file this process writes its log to
+    
+    LOG_FILE has a single writer, which holds a lock on LOG_FILE.lock. A process that imports
+    the app while another one already writes LOG_FILE (uvicorn --workers, gunicorn without
+    preload_app) writes LOG_FILE with its pid added instead, e.g. app.1234.log.
+    """
+    global _log_lock_file
+    if fcntl is None:
+        return LOG_FILE
+    lock_file = open(f"{LOG_FILE}.lock", 'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        root, ext = os.path.splitext(LOG_FILE)
+        return f"{root}.{os.getpid()}{ext}"
+    _log_lock_file = lock_file
+    return LOG_FILE
+
+def setup_logging():
+    """
+    Send all log records through a queue to a background thread that writes them
+    
+    Request threads only enqueue records; the rotating log file and the console are written
+    by a QueueListener thread in the process that imported the app. The queue is a pipe, so
+    processes forked from it (gunicorn workers with preload_app) send their records to that
+    same thread: only one process writes and rotates LOG_FILE.
+    
+    Returns:
+        The running QueueListener
+    """
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] [%(filename)s:%(lineno)d] - %(message)s')
+    handlers = [logging.StreamHandler()]  # This outputs to console
+    # PDF/OCR pool processes import the app afresh (see get_process_pool); they only log to the console
+    if not os.environ.get(POOL_PROCESS_ENV):
+        handlers.append(logging.handlers.RotatingFileHandler(log_file_path(), maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    
+    log_queue = multiprocessing.SimpleQueue()
+    queue_handler = ProcessQueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())  # Runs in the thread that logs, where the request ID is set
+    root_logger = logging.getLogger()
+    root_logger.setLevel(LOG_LEVEL)
+    root_logger.handlers[:] = [queue_handler]
+    
+    listener = ProcessQueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    
+    writer_pid = os.getpid()
+    def stop_listener():
+        # Forked processes inherit this hook but not the listener thread; their sentinel would stop the writer's
+        if os.getpid() == writer_pid:
+            listener.stop()
+    atexit.register(stop_listener)
+    
+    return listener
+
+log_listener = setup_logging()
 logger = logging.getLogger(__name__)
+# Per-chunk realtime messages (transcription, speech results) are sampled, see LOG_SAMPLE_RATES
+realtime_logger = logger.getChild('realtime')
+
+for sample_spec in filter(None, LOG_SAMPLE_RATES.split(',')):
+    child_name, _, sample_rate = sample_spec.partition('=')
+    logger.getChild(child_name.strip()).addFilter(SamplingFilter(int(sample_rate or 1)))
 
 # Print startup banner for easy identification in logs
 logger.info("="*50)
 logger.info("ENHANCED READING ASSESSMENT TOOL STARTING")
 logger.info("="*50)
 
-app = Flask(__name__)
+# Static files are served by send_static below (fingerprinted URLs, cache headers, compression)
+app = Flask(__name__, static_folder=None)
 app.secret_key = os.getenv('FLASK_SECRET_KEY', os.urandom(24))
 
-# Serve static files
-@app.route('/static/<path:path>')
-def send_static(path):
-    return send_from_directory('static', path)
-
 # Configuration
 UPLOAD_FOLDER = os.path.join(os.getcwd(), 'uploads')
 ALLOWED_EXTENSIONS = {'pdf', 'txt'}
@@ -54,23 +200,70 @@ try:
     os.makedirs(UPLOAD_FOLDER, exist_ok=True)
     # Check and set permissions if possible
     os.chmod(UPLOAD_FOLDER, 0o755)
-    logger.info(f"Upload folder created/verified: {UPLOAD_FOLDER}")
+    logger.info("Upload folder created/verified: %s", UPLOAD_FOLDER)
 except Exception as e:
-    logger.error(f"Error creating/accessing upload folder: {e}")
+    logger.error("Error creating/accessing upload folder: %s", e)
 
 try:
     os.makedirs(DATABASE_FOLDER, exist_ok=True)
-    logger.info(f"Database folder created/verified: {DATABASE_FOLDER}")
+    logger.info("Database folder created/verified: %s", DATABASE_FOLDER)
 except Exception as e:
-    logger.error(f"Error creating/accessing database folder: {e}")
+    logger.error("Error creating/accessing database folder: %s", e)
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16 MB max upload size
 
+def available_cores():
+    """CPU cores this process may run on (the affinity mask is narrower than cpu_count in containers)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+# PDF extraction limits and parallelism. Every worker process has its own pool, so by default
+# the cores are shared out between the WEB_CONCURRENCY workers (gunicorn_config.py sets the share)
+PDF_MAX_PAGES = int(os.getenv('PDF_MAX_PAGES', 500))
+PDF_MAX_CHARS = int(os.getenv('PDF_MAX_CHARS', 2000000))
+PDF_EXTRACT_WORKERS = int(os.getenv('PDF_EXTRACT_WORKERS', max(1, available_cores() // int(os.getenv('WEB_CONCURRENCY', 1)))))
+PDF_PAGES_PER_TASK = int(os.getenv('PDF_PAGES_PER_TASK', 20))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARALLEL_MIN_PAGES', 40))  # Smaller PDFs are read in-process
+PDF_STREAM_SAVE_INTERVAL = float(os.getenv('PDF_STREAM_SAVE_INTERVAL', 2))  # Seconds between passage saves while streaming
+
+# OCR fallback for scanned PDF pages (requires pdf2image/poppler and pytesseract/tesseract)
+OCR_ENABLED = os.getenv('OCR_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+OCR_DPI = min(int(os.getenv('OCR_DPI', 200)), 300)  # Higher DPI rarely improves tesseract output
+OCR_MAX_PAGE_PIXELS = int(os.getenv('OCR_MAX_PAGE_PIXELS', 12000000))  # ~12 MB per grayscale page
+OCR_MAX_PAGES = int(os.getenv('OCR_MAX_PAGES', 50))
+OCR_CACHE_FOLDER = os.path.join(DATABASE_FOLDER, 'ocr_cache')
+OCR_CACHE_MAX_AGE = int(os.getenv('OCR_CACHE_MAX_AGE', 30 * 24 * 3600))  # OCR results not used this long are removed
+OCR_CACHE_MAX_BYTES = int(os.getenv('OCR_CACHE_MAX_BYTES', 100 * 1024 * 1024))  # Least recently used results go first
+OCR_PROBE_TTL = int(os.getenv('OCR_PROBE_TTL', 300))  # Seconds before the tesseract check is re-run
+
+# Server-side passage storage (cookie sessions cannot hold book-length texts)
+PASSAGE_FOLDER = os.path.join(DATABASE_FOLDER, 'passages')
+PROGRESS_FOLDER = os.path.join(DATABASE_FOLDER, 'progress')
+PROGRESS_MAX_AGE = int(os.getenv('PROGRESS_MAX_AGE', 30 * 24 * 3600))  # Reading progress untouched this long is removed
+PASSAGE_MAX_AGE = int(os.getenv('PASSAGE_MAX_AGE', 30 * 24 * 3600))  # Passages not used this long are removed
+PASSAGE_SEGMENT_WORDS = int(os.getenv('PASSAGE_SEGMENT_WORDS', 300))  # Target words per segment
+TRACKING_CACHE_SIZE = int(os.getenv('TRACKING_CACHE_SIZE', 64))  # Passages with cached tracking markup
+TRACKING_CACHE_MAX_BYTES = int(os.getenv('TRACKING_CACHE_MAX_BYTES', 32 * 1024 * 1024))  # Per worker; larger passages are not cached
+
+# Response compression and static asset caching
+STATIC_FOLDER = os.path.join(app.root_path, 'static')
+STATIC_MAX_AGE = int(os.getenv('STATIC_MAX_AGE', 31536000))  # Fingerprinted URLs never change content
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))  # Smaller bodies are not worth compressing
+STATIC_COMPRESSED_CACHE_SIZE = int(os.getenv('STATIC_COMPRESSED_CACHE_SIZE', 64))  # Compressed static files kept in memory
+COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', 6))  # gzip level; brotli quality is derived from it
+COMPRESS_MIMETYPES = {
+    'application/json', 'text/html', 'text/css', 'text/plain',
+    'application/javascript', 'text/javascript', 'image/svg+xml'
+}
+
 # =====================================================================
 # WHISPER.CPP CONFIGURATION - IMPROVED SECTION
 # =====================================================================
 
+WHISPER_PROBE_TTL = int(os.getenv('WHISPER_PROBE_TTL', 300))  # Seconds before the whisper.cpp/ffmpeg checks are re-run
+
 # Function to auto-detect whisper.cpp paths
 def detect_whisper_paths():
     """Auto-detect whisper.cpp paths based on common installation patterns"""
@@ -78,30 +271,27 @@ def detect_whisper_paths():
     cli_paths = []
     model_paths = []
     
-    # Look for CLI executable
+    # Look for CLI executable (the glob patterns are only scanned if no fixed path exists)
     if system == "Windows":
-        cli_paths = [
+        cli_paths = itertools.chain([
             './whisper.cpp/build/bin/main.exe',
             './whisper.cpp/build/main.exe',
-            './whisper/bin/main.exe',
-            *glob.glob("./*/whisper*/*/main.exe")
-        ]
+            './whisper/bin/main.exe'
+        ], glob.iglob("./*/whisper*/*/main.exe"))
     else:  # Linux/Mac
-        cli_paths = [
+        cli_paths = itertools.chain([
             './whisper.cpp/build/bin/main',
             './whisper.cpp/main',
             '/usr/local/bin/whisper.cpp',
-            '/usr/local/bin/whisper',
-            *glob.glob("./*/whisper*/*/main")
-        ]
+            '/usr/local/bin/whisper'
+        ], glob.iglob("./*/whisper*/*/main"))
     
     # Look for model files
-    model_paths = [
+    model_paths = itertools.chain([
         './whisper.cpp/models/ggml-base.en.bin',
         './models/ggml-base.en.bin',
-        './whisper/models/ggml-base.en.bin',
-        *glob.glob("./*/whisper*/*/models/ggml-base.en.bin")
-    ]
+        './whisper/models/ggml-base.en.bin'
+    ], glob.iglob("./*/whisper*/*/models/ggml-base.en.bin"))
     
     # Find first existing CLI path
     cli_path = None
@@ -119,20 +309,35 @@ def detect_whisper_paths():
     
     return cli_path, model_path
 
-# Get Whisper.cpp paths with improved detection
-cli_path, model_path = detect_whisper_paths()
-WHISPER_CPP_CLI_PATH = os.getenv('WHISPER_CPP_CLI_PATH', cli_path or './whisper.cpp/build/bin/main')
-WHISPER_CPP_MODEL_PATH = os.getenv('WHISPER_CPP_MODEL_PATH', model_path or './whisper.cpp/models/ggml-base.en.bin')
+# Get Whisper.cpp paths; detection scans the working tree, so it only runs when they are not configured
+WHISPER_CPP_CLI_PATH = os.getenv('WHISPER_CPP_CLI_PATH')
+WHISPER_CPP_MODEL_PATH = os.getenv('WHISPER_CPP_MODEL_PATH')
+if WHISPER_CPP_CLI_PATH is None or WHISPER_CPP_MODEL_PATH is None:
+    cli_path, model_path = detect_whisper_paths()
+    WHISPER_CPP_CLI_PATH = WHISPER_CPP_CLI_PATH or cli_path or './whisper.cpp/build/bin/main'
+    WHISPER_CPP_MODEL_PATH = WHISPER_CPP_MODEL_PATH or model_path or './whisper.cpp/models/ggml-base.en.bin'
+    
+    # Print detected paths for debugging
+    logger.info("Detected Whisper CLI path: %s", cli_path or 'Not found')
+    logger.info("Detected Whisper model path: %s", model_path or 'Not found')
 
-# Print detected paths for debugging
-logger.info(f"Detected Whisper CLI path: {cli_path or 'Not found'}")
-logger.info(f"Detected Whisper model path: {model_path or 'Not found'}")
-logger.info(f"Using Whisper CLI path: {WHISPER_CPP_CLI_PATH}")
-logger.info(f"Using Whisper model path: {WHISPER_CPP_MODEL_PATH}")
+logger.info("Using Whisper CLI path: %s", WHISPER_CPP_CLI_PATH)
+logger.info("Using Whisper model path: %s", WHISPER_CPP_MODEL_PATH)
 
 # Validate whisper.cpp configuration
-def check_whisper_cpp_config():
-    """Check if whisper.cpp is properly configured and log detailed results"""
+def check_whisper_cpp_config(previous=None):
+    """
+    Check if whisper.cpp is properly configured and log detailed results
+    
+    Args:
+        previous: Result of the last check; when given, details are only logged at
+            DEBUG and a change of the overall status is logged as a warning
+    
+    Returns:
+        dict: Paths found and whether each component is available
+    """
+    log_info = logger.debug if previous else logger.info
+    log_error = logger.debug if previous else logger.error
     status = {
         "cli_exists": False,
         "cli_path": WHISPER_CPP_CLI_PATH,
@@ -140,39 +345,45 @@ def check_whisper_cpp_config():
         "model_path": WHISPER_CPP_MODEL_PATH,
         "ffmpeg_available": False,
         "ffmpeg_path": None,
+        "ffmpeg_version": None,
         "overall_status": False
     }
     
     # Check if whisper-cli exists
     if os.path.exists(WHISPER_CPP_CLI_PATH) and os.access(WHISPER_CPP_CLI_PATH, os.X_OK):
         status["cli_exists"] = True
-        logger.info(f"✅ whisper-cli found at: {WHISPER_CPP_CLI_PATH}")
+        log_info("✅ whisper-cli found at: %s", WHISPER_CPP_CLI_PATH)
     else:
-        logger.error(f"❌ whisper-cli NOT found at: {WHISPER_CPP_CLI_PATH}")
+        log_error("❌ whisper-cli NOT found at: %s", WHISPER_CPP_CLI_PATH)
         if os.path.exists(WHISPER_CPP_CLI_PATH):
-            logger.error(f"   File exists but is not executable")
+            log_error("   File exists but is not executable")
         
     # Check if model exists
     if os.path.exists(WHISPER_CPP_MODEL_PATH):
         status["model_exists"] = True
         model_size_mb = os.path.getsize(WHISPER_CPP_MODEL_PATH) / (1024 * 1024)
-        logger.info(f"✅ Whisper model found at: {WHISPER_CPP_MODEL_PATH} (Size: {model_size_mb:.2f} MB)")
+        log_info("✅ Whisper model found at: %s (Size: %.2f MB)", WHISPER_CPP_MODEL_PATH, model_size_mb)
     else:
-        logger.error(f"❌ Whisper model NOT found at: {WHISPER_CPP_MODEL_PATH}")
+        log_error("❌ Whisper model NOT found at: %s", WHISPER_CPP_MODEL_PATH)
     
     # Check for ffmpeg
     try:
-        ffmpeg_path = subprocess.run(['which', 'ffmpeg'], capture_output=True, text=True, check=False).stdout.strip()
+        ffmpeg_path = shutil.which('ffmpeg')
         if ffmpeg_path:
             status["ffmpeg_available"] = True
             status["ffmpeg_path"] = ffmpeg_path
-            logger.info(f"✅ ffmpeg found at: {ffmpeg_path}")
+            log_info("✅ ffmpeg found at: %s", ffmpeg_path)
             
-            # Get ffmpeg version for debugging
-            ffmpeg_version = subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True, check=False).stdout.split('\n')[0]
-            logger.info(f"   ffmpeg version: {ffmpeg_version}")
+            # Get ffmpeg version for debugging (the only subprocess; skipped when the path is unchanged)
+            if previous and previous.get("ffmpeg_path") == ffmpeg_path:
+                status["ffmpeg_version"] = previous.get("ffmpeg_version")
+            else:
+                status["ffmpeg_version"] = subprocess.run(
+                    [ffmpeg_path, '-version'], capture_output=True, text=True, check=False, timeout=10
+                ).stdout.split('\n')[0]
+            log_info("   ffmpeg version: %s", status["ffmpeg_version"])
         else:
-            logger.error("❌ ffmpeg NOT found in PATH")
+            log_error("❌ ffmpeg NOT found in PATH")
             
             # Try to find ffmpeg in common locations
             common_locations = ['/opt/homebrew/bin/ffmpeg', '/usr/local/bin/ffmpeg', '/usr/bin/ffmpeg']
@@ -180,203 +391,1007 @@ def check_whisper_cpp_config():
                 if os.path.exists(location):
                     status["ffmpeg_available"] = True
                     status["ffmpeg_path"] = location
-                    logger.info(f"✅ ffmpeg found at alternative location: {location}")
+                    log_info("✅ ffmpeg found at alternative location: %s", location)
                     os.environ['PATH'] = f"{os.path.dirname(location)}:{os.environ.get('PATH', '')}"
                     break
     except Exception as e:
-        logger.error(f"❌ Error checking for ffmpeg: {e}")
+        logger.error("❌ Error checking for ffmpeg: %s", e)
     
     # Set overall status
     status["overall_status"] = status["cli_exists"] and status["model_exists"] and status["ffmpeg_available"]
-    if status["overall_status"]:
-        logger.info("✅ Whisper.cpp configuration is VALID")
+    if previous and previous.get("overall_status") != status["overall_status"]:
+        logger.warning("Whisper.cpp configuration changed: now %s", "VALID" if status["overall_status"] else "INVALID")
+    elif status["overall_status"]:
+        log_info("✅ Whisper.cpp configuration is VALID")
     else:
-        logger.error("❌ Whisper.cpp configuration is INVALID - some components missing")
+        log_error("❌ Whisper.cpp configuration is INVALID - some components missing")
     
     return status
 
-# Call this function to check and display whisper.cpp status at startup
-whisper_cpp_status = check_whisper_cpp_config()
+class CachedProbe:
+    """
+    Result of a slow environment check (file system, subprocesses), run on first use
+    
+    Later calls return the cached result at once. Once it is older than `ttl` seconds,
+    the check is re-run by a background thread and callers keep the previous result
+    until it finishes, so only the very first caller waits for the check.
+    """
+    
+    def __init__(self, name, check, ttl):
+        self.name = name
+        self.check = check  # check(previous_result) -> result
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()  # One check at a time
+        self._result = None
+        self._checked_at = None  # time.monotonic() of the last completed check
+        self._refresher = None
+    
+    def _run(self):
+        with self._run_lock:
+            with time_stage(f"probe_{self.name}"):
+                result = self.check(self._result)
+            with self._lock:
+                self._result, self._checked_at = result, time.monotonic()
+            return result
+    
+    def _refresh(self):
+        try:
+            self._run()
+        except Exception as e:
+            logger.error("Error refreshing the %s probe: %s", self.name, e)
+    
+    def get(self, refresh=False):
+        """
+        Return the cached result, running the check first if there is none yet
+        
+        Args:
+            refresh: Run the check now and wait for the new result
+        """
+        with self._lock:
+            result, checked_at = self._result, self._checked_at
+            stale = checked_at is not None and time.monotonic() - checked_at > self.ttl
+            # A refresher thread started before a fork is not alive in the child
+            if stale and not refresh and not (self._refresher and self._refresher.is_alive()):
+                self._refresher = threading.Thread(target=self._refresh, name=f"probe-{self.name}", daemon=True)
+                self._refresher.start()
+        if result is not None and not refresh:
+            return result
+        with self._run_lock:
+            if not refresh and self._result is not None:  # Another caller ran the first check meanwhile
+                return self._result
+        return self._run()
+    
+    def age(self):
+        """Seconds since the last completed check (None before the first one)"""
+        checked_at = self._checked_at
+        return None if checked_at is None else round(time.monotonic() - checked_at, 1)
+
+# Run on first use rather than at import, so each worker starts without spawning ffmpeg
+whisper_probe = CachedProbe("whisper_cpp", check_whisper_cpp_config, WHISPER_PROBE_TTL)
 
 # =====================================================================
-# HELPER FUNCTIONS
+# METRICS
 # =====================================================================
 
-def allowed_file(filename):
-    """Check if a file has an allowed extension"""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+# Histogram bucket upper bounds in seconds (Prometheus "le" labels)
+METRIC_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRIC_HELP = {
+    "stage_duration_seconds": ("histogram", "Time spent in each request pipeline stage"),
+    "transcriptions_total": ("counter", "Transcriptions by result source"),
+    "transcriptions_coalesced_total": ("counter", "Recording uploads that shared an identical in-flight transcription"),
+    "cache_requests_total": ("counter", "Cache lookups by cache and result"),
+    "transcriptions_in_progress": ("gauge", "Transcriptions currently running in the ASR backend"),
+    "transcription_queue_depth": ("gauge", "Transcriptions waiting for a free transcription slot"),
+    "startup_seconds": ("gauge", "Seconds spent initializing the app module in this process"),
+}
+
+# Metrics are kept per process; each gunicorn/uvicorn worker reports its own values
+_metrics_lock = threading.Lock()
+_stage_histograms = {}  # stage -> {"buckets": [count per bucket, +Inf last], "sum": seconds, "count": n}
+_metric_values = {}  # (name, ((label, value), ...)) -> counter or gauge value
+# Stage durations of the current request, reported in its Server-Timing header
+_request_timings_var = contextvars.ContextVar('request_timings', default=None)
+
+def observe_stage(stage, seconds):
+    """Record the duration of one pipeline stage"""
+    timings = _request_timings_var.get()
+    if timings is not None:
+        timings["stages"][stage] = timings["stages"].get(stage, 0.0) + seconds
+    with _metrics_lock:
+        histogram = _stage_histograms.get(stage)
+        if histogram is None:
+            histogram = _stage_histograms[stage] = {"buckets": [0] * (len(METRIC_BUCKETS) + 1), "sum": 0.0, "count": 0}
+        index = next((i for i, bound in enumerate(METRIC_BUCKETS) if seconds <= bound), len(METRIC_BUCKETS))
+        histogram["buckets"][index] += 1
+        histogram["sum"] += seconds
+        histogram["count"] += 1
+
+@contextlib.contextmanager
+def time_stage(stage):
+    """Context manager recording the time spent in its block as a pipeline stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+def timed_stage(stage):
+    """Decorator recording every call of a function as a pipeline stage"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with time_stage(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
 
-def extract_text_from_pdf(pdf_path):
+def inc_metric(name, amount=1, **labels):
+    """Add to a counter or gauge (use a negative amount to decrease a gauge)"""
+    key = (name, tuple(sorted(labels.items())))
+    with _metrics_lock:
+        _metric_values[key] = _metric_values.get(key, 0) + amount
+
+def metric_value(name, **labels):
+    """Current value of a counter or gauge"""
+    with _metrics_lock:
+        return _metric_values.get((name, tuple(sorted(labels.items()))), 0)
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+def _copy_metrics():
+    with _metrics_lock:
+        histograms = {stage: dict(h, buckets=list(h["buckets"])) for stage, h in _stage_histograms.items()}
+        return histograms, dict(_metric_values)
+
+def render_prometheus_metrics():
+    """Render all metrics in the Prometheus text exposition format"""
+    histograms, values = _copy_metrics()
+    
+    lines = []
+    kind, help_text = METRIC_HELP["stage_duration_seconds"]
+    lines += [f"# HELP stage_duration_seconds {help_text}", f"# TYPE stage_duration_seconds {kind}"]
+    for stage in sorted(histograms):
+        histogram = histograms[stage]
+        cumulative = 0
+        for bound, count in zip(METRIC_BUCKETS + ('+Inf',), histogram["buckets"]):
+            cumulative += count
+            lines.append(f'stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+        lines.append(f'stage_duration_seconds_sum{{stage="{stage}"}} {histogram["sum"]:.6f}')
+        lines.append(f'stage_duration_seconds_count{{stage="{stage}"}} {histogram["count"]}')
+    
+    for name, (kind, help_text) in METRIC_HELP.items():
+        if kind == "histogram":
+            continue
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for (metric, labels), value in sorted(values.items()):
+            if metric == name:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+    
+    return "\n".join(lines) + "\n"
+
+def _histogram_quantile(histogram, quantile):
+    """Estimate a quantile from histogram buckets (linear within a bucket, as Prometheus does)"""
+    rank = quantile * histogram["count"]
+    cumulative = 0
+    lower = 0.0
+    for bound, count in zip(METRIC_BUCKETS, histogram["buckets"]):
+        if count and cumulative + count >= rank:
+            return lower + (bound - lower) * (rank - cumulative) / count
+        cumulative += count
+        lower = bound
+    return METRIC_BUCKETS[-1]
+
+def metrics_snapshot():
     """
-    Extract text from PDF with error handling and basic cleanup
+    Summarize the metrics for the diagnostics page
     
-    Args:
-        pdf_path: Path to the PDF file
-        
     Returns:
-        str: Extracted text
+        dict: Per-stage count/average/p50/p95 in milliseconds, and counter/gauge values
     """
-    try:
-        # Try using PyPDF2 first
-        try:
-            import PyPDF2
-            with open(pdf_path, 'rb') as file:
-                reader = PyPDF2.PdfReader(file)
-                
-                # Handle encrypted PDFs
-                if reader.is_encrypted:
-                    try:
-                        reader.decrypt('')  # Try empty password
-                    except:
-                        return "Error: PDF is encrypted and could not be decrypted."
-                
-                # Extract text page by page
-                text = ""
-                for page in reader.pages:
-                    text += page.extract_text() + "\n"
-                    
-                if text.strip():
-                    return text
-        except Exception as e:
-            logger.warning(f"PyPDF2 extraction failed: {e}, trying alternate methods...")
-        
-        # If PyPDF2 failed or returned empty text, try pdftotext command line tool
-        try:
-            result = subprocess.run(['pdftotext', pdf_path, '-'], 
-                                  capture_output=True, text=True, check=True)
-            if result.stdout.strip():
-                return result.stdout
-        except:
-            logger.warning("pdftotext command line tool failed, trying next method...")
-        
-        # If all methods failed, return error
-        return "Error: Could not extract text from PDF. File may be corrupted or contains only images."
-        
-    except Exception as e:
-        logger.error(f"PDF text extraction error: {e}")
-        return f"Error extracting text: {str(e)}"
+    histograms, values = _copy_metrics()
+    
+    stages = {
+        stage: {
+            "count": h["count"],
+            "avg_ms": round(h["sum"] / h["count"] * 1000, 2) if h["count"] else 0,
+            "p50_ms": round(_histogram_quantile(h, 0.5) * 1000, 2),
+            "p95_ms": round(_histogram_quantile(h, 0.95) * 1000, 2)
+        }
+        for stage, h in sorted(histograms.items())
+    }
+    counters = [
+        {"name": name, "labels": dict(labels), "value": value}
+        for (name, labels), value in sorted(values.items())
+    ]
+    return {"stages": stages, "counters": counters, "pid": os.getpid()}
 
-def enhance_and_format_text(text, grade_level=None):
+class TimedSessionInterface(SecureCookieSessionInterface):
+    """Signed cookie sessions with loading and serialization recorded as pipeline stages"""
+    
+    def open_session(self, app, request):
+        with time_stage("session_load"):
+            return super().open_session(app, request)
+    
+    def save_session(self, app, session, response):
+        with time_stage("session_serialization"):
+            super().save_session(app, session, response)
+        # Sessions are saved after the after_request hooks, so refresh the timing header
+        if 'Server-Timing' in response.headers:
+            response.headers['Server-Timing'] = server_timing_header()
+
+app.session_interface = TimedSessionInterface()
+
+# =====================================================================
+# REQUEST TRACING
+# =====================================================================
+
+REQUEST_ID_HEADER = os.getenv('REQUEST_ID_HEADER', 'X-Request-ID')
+# IDs from clients or proxies are reused only if they look like IDs (they end up in log lines)
+_REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._:-]{1,64}$')
+
+def start_request_trace(incoming_id=None):
     """
-    Format extracted text for better readability
+    Start tracing a request: set its ID for log records and reset its stage timings
     
     Args:
-        text (str): Raw text to format
-        grade_level (int, optional): Student grade level
-    
+        incoming_id: Request ID sent by the client or a proxy, reused when well-formed
+        
     Returns:
-        str: Formatted text
+        str: The request ID
     """
-    if not text or len(text.strip()) < 10:
-        return text
+    request_id = incoming_id if incoming_id and _REQUEST_ID_PATTERN.match(incoming_id) else uuid.uuid4().hex
+    _request_id_var.set(request_id)
+    _request_timings_var.set({"start": time.perf_counter(), "stages": {}})
+    return request_id
+
+def current_request_id():
+    """Return the ID of the request being handled ("-" outside requests)"""
+    return _request_id_var.get()
+
+def server_timing_header():
+    """
+    Build a Server-Timing header value from the current request's stage timings
     
-    # Normalize line breaks and whitespace
-    text = text.replace('\r\n', '\n').replace('\r', '\n')
-    text = re.sub(r'\n{3,}', '\n\n', text)  # Normalize multiple line breaks
-    
-    # Handle encoding issues and special characters
-    char_replacements = {
-        'â€™': "'", 'â€˜': "'", 'â€œ': '"', 'â€': '"',
-        'â€"': '–', 'â€"': '—', 'â€¢': '•', 'â€¦': '…',
-        'Â©': '©', 'Â®': '®', 'â„¢': '™', 'Â°': '°',
-        '&amp;': '&', '&lt;': '<', '&gt;': '>', '\u00a0': ' ',
-    }
-    for old, new in char_replacements.items():
-        text = text.replace(old, new)
+    Returns:
+        str: e.g. "whisper;dur=812.4, alignment;dur=3.1, total;dur=840.2"
+    """
+    timings = _request_timings_var.get()
+    if timings is None:
+        return ''
+    entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings["stages"].items()]
+    entries.append(f"total;dur={(time.perf_counter() - timings['start']) * 1000:.1f}")
+    return ', '.join(entries)
+
+class RequestTraceMiddleware:
+    """WSGI middleware starting each request's trace before Flask opens the session"""
     
-    # Remove PDF artifacts (page numbers, headers/footers)
-    text = re.sub(r'\n\s*\d+\s*\n', '\n', text)  # Standalone page numbers
-    text = re.sub(r'\n\s*Page\s+\d+(\s+of\s+\d+)?\s*\n', '\n', text, flags=re.IGNORECASE)  # Page X [of Y]
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+        self.environ_key = 'HTTP_' + REQUEST_ID_HEADER.upper().replace('-', '_')
     
-    # Handle hyphenation across lines
-    text = re.sub(r'(\w)-\n(\s*[a-z])', r'\1\2', text)
+    def __call__(self, environ, start_response):
+        start_request_trace(environ.get(self.environ_key))
+        return self.wsgi_app(environ, start_response)
+
+app.wsgi_app = RequestTraceMiddleware(app.wsgi_app)
+
+@app.after_request
+def add_trace_headers(response):
+    """Send the request ID and the per-stage timings back with every response"""
+    response.headers[REQUEST_ID_HEADER] = current_request_id()
+    response.headers['Server-Timing'] = server_timing_header()
+    return response
+
+# =====================================================================
+# PROFILING
+# =====================================================================
+
+# Requests sent with "X-Profile-Token: <token>" are always profiled. The profiling and tracemalloc
+# diagnostics endpoints require the token, and are refused when none is set (except in debug mode)
+PROFILE_ADMIN_TOKEN = os.getenv('PROFILE_ADMIN_TOKEN', '')
+PROFILE_TOKEN_HEADER = 'X-Profile-Token'
+# Sampled profiling can also be switched on from the diagnostics page
+PROFILE_ENABLED = os.getenv('PROFILE_ENABLED', 'false').lower() == 'true'
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0.05))  # Fraction of requests profiled
+PROFILE_BUFFER_SIZE = int(os.getenv('PROFILE_BUFFER_SIZE', 20))  # Slowest profiles kept
+TRACEMALLOC_FRAMES = int(os.getenv('TRACEMALLOC_FRAMES', 10))  # Stack depth recorded per allocation
+
+# Like the metrics, profiling state and profiles are kept per worker process
+profiling_state = {"enabled": PROFILE_ENABLED, "sample_rate": PROFILE_SAMPLE_RATE}
+# Min-heap of (duration_ms, sequence, profile): the fastest kept profile is evicted first
+_profiles = []
+_profiles_sequence = itertools.count()
+_profile_lock = threading.Lock()  # One request is profiled at a time
+_profiles_lock = threading.Lock()
+_tracemalloc_baseline = None
+
+def has_profile_token(headers):
+    """Whether the request carries the profiling admin token"""
+    return bool(PROFILE_ADMIN_TOKEN) and hmac.compare_digest(headers.get(PROFILE_TOKEN_HEADER, ''), PROFILE_ADMIN_TOKEN)
+
+def profile_access_denied():
+    """
+    Check access to the profiling and tracemalloc endpoints
     
-    # Split text into paragraphs
-    paragraphs = text.split('\n\n')
-    formatted_paragraphs = []
+    Profiles contain code paths and request data, so without a configured token the
+    endpoints are only open in debug mode.
     
-    for paragraph in paragraphs:
-        if paragraph.strip():
-            # Check if this looks like a heading
-            if re.match(r'^[A-Z0-9\s]{5,}$', paragraph.strip()):
-                formatted_paragraphs.append(f"## {paragraph.strip()}")
-            else:
-                formatted_paragraphs.append(paragraph.strip())
+    Returns:
+        An error response tuple, or None if the request may proceed
+    """
+    if PROFILE_ADMIN_TOKEN:
+        if has_profile_token(request.headers):
+            return None
+        return jsonify({"error": "Profiling token required"}), 403
+    if app.debug:
+        return None
+    return jsonify({"error": "Profiling is disabled: set PROFILE_ADMIN_TOKEN"}), 403
+
+def record_profile(profile):
+    """Keep a profile if it is among the PROFILE_BUFFER_SIZE slowest seen by this worker"""
+    entry = (profile["duration_ms"], next(_profiles_sequence), profile)
+    with _profiles_lock:
+        if len(_profiles) < PROFILE_BUFFER_SIZE:
+            heapq.heappush(_profiles, entry)
+        elif entry[0] > _profiles[0][0]:
+            heapq.heapreplace(_profiles, entry)
+
+def slowest_profiles():
+    """Return the buffered profiles, slowest first"""
+    with _profiles_lock:
+        entries = list(_profiles)
+    return [profile for _, _, profile in sorted(entries, reverse=True)]
+
+def should_profile(environ):
+    """Decide whether to profile a request: admin token, or sampling while enabled"""
+    path = environ.get('PATH_INFO', '')
+    if path.startswith(('/static/', '/api/diagnostics/')):
+        return False
+    if PROFILE_ADMIN_TOKEN:
+        header_key = 'HTTP_' + PROFILE_TOKEN_HEADER.upper().replace('-', '_')
+        if hmac.compare_digest(environ.get(header_key, ''), PROFILE_ADMIN_TOKEN):
+            return True
+    return profiling_state["enabled"] and random.random() < profiling_state["sample_rate"]
+
+class ProfilingMiddleware:
+    """WSGI middleware running sampled requests under cProfile"""
     
-    # Join paragraphs with proper spacing
-    formatted_text = '\n\n'.join(formatted_paragraphs)
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
     
-    return formatted_text
+    def __call__(self, environ, start_response):
+        if not should_profile(environ) or not _profile_lock.acquire(blocking=False):
+            return self.wsgi_app(environ, start_response)
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            return profiler.runcall(self.wsgi_app, environ, start_response)
+        finally:
+            duration = time.perf_counter() - start
+            _profile_lock.release()
+            profiler.create_stats()
+            record_profile({
+                # The inner trace middleware has set the request ID in this context
+                "id": current_request_id(),
+                "method": environ.get('REQUEST_METHOD'),
+                "path": environ.get('PATH_INFO'),
+                "duration_ms": round(duration * 1000, 2),
+                "timestamp": time.time(),
+                "stats": profiler.stats
+            })
+            logger.info("Profiled %s %s in %.1f ms", environ.get('REQUEST_METHOD'), environ.get('PATH_INFO'), duration * 1000)
 
-def count_syllables(word):
-    """Count syllables in a word (English)"""
-    word = word.lower().strip(".,;:!?-\"'()[]{}")
-    if not word:
-        return 0
-        
-    # Special cases
-    if word in ['the', 'me', 'he', 'she', 'be', 'see']:
-        return 1
+app.wsgi_app = ProfilingMiddleware(app.wsgi_app)
+
+def find_profile(profile_id):
+    """Return the buffered profile with the given request ID, or None"""
+    return next((profile for profile in slowest_profiles() if profile["id"] == profile_id), None)
+
+def _profile_frame_label(func):
+    filename, lineno, name = func
+    if filename == '~':  # Built-in functions
+        return name.replace(';', ':')
+    return f"{name} ({os.path.basename(filename)}:{lineno})".replace(';', ':')
+
+def collapse_profile_stats(stats, max_depth=64):
+    """
+    Convert cProfile stats to collapsed stacks ("outer;inner microseconds") for flame graphs
+    
+    cProfile records caller/callee pairs rather than whole stacks, so the time of a
+    function with several callers is split between them in proportion to each call edge.
+    
+    Args:
+        stats: Stats dict of a cProfile.Profile (after create_stats)
+        max_depth: Deepest stack emitted
         
-    # Count vowel groups
-    vowels = "aeiouy"
-    count = 0
-    prev_is_vowel = False
+    Returns:
+        str: One "frame;frame;frame microseconds" line per stack
+    """
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
     
-    for char in word:
-        is_vowel = char in vowels
-        if is_vowel and not prev_is_vowel:
-            count += 1
-        prev_is_vowel = is_vowel
+    stacks = {}
     
-    # Adjust for silent e
-    if word.endswith('e') and len(word) > 2 and word[-2] not in vowels:
-        count -= 1
+    def walk(func, path, share):
+        path = path + (_profile_frame_label(func),)
+        self_us = stats[func][2] * share * 1e6
+        if self_us >= 1:
+            key = ';'.join(path)
+            stacks[key] = stacks.get(key, 0) + self_us
+        if len(path) >= max_depth:
+            return
+        for callee, edge_time in callees.get(func, ()):
+            callee_time = stats[callee][3]
+            # Skip recursion and edges worth less than a microsecond on this path
+            if callee_time <= 0 or share * edge_time < 1e-6 or _profile_frame_label(callee) in path:
+                continue
+            walk(callee, path, share * edge_time / callee_time)
     
-    # Words can't have zero syllables
-    return max(1, count)
+    for func, entry in stats.items():
+        if not entry[4]:
+            walk(func, (), 1.0)
+    return ''.join(f"{stack} {round(us)}\n" for stack, us in sorted(stacks.items()))
 
-def get_wpm_benchmark(grade_level):
+def tracemalloc_snapshot_diff(limit=25):
     """
-    Return expected words-per-minute benchmark for a given grade level
-    Based on research-backed fluency norms (Hasbrouck & Tindal)
+    Take a tracemalloc snapshot and compare it with the previous one
+    
+    Tracing starts on the first call, so that snapshot is nearly empty; later calls
+    show which source lines allocated the memory retained since the call before.
+    
+    Args:
+        limit: Number of source lines returned
+        
+    Returns:
+        dict: Traced memory totals and the top lines by growth
     """
-    # Research-based WPM targets by grade level (50th percentile, spring)
-    benchmarks = {
-        1: 60,
-        2: 95,
-        3: 115,
-        4: 140,
-        5: 150,
-        6: 160,
-        7: 165,
-        8: 170,
-        9: 180,
-        10: 190,
-        11: 200,
-        12: 210
+    global _tracemalloc_baseline
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+        _tracemalloc_baseline = None
+    
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ))
+    if _tracemalloc_baseline is None:
+        stats = snapshot.statistics('lineno')
+    else:
+        stats = snapshot.compare_to(_tracemalloc_baseline, 'lineno')
+    _tracemalloc_baseline = snapshot
+    
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "tracing": True,
+        "current_kb": round(current / 1024, 1),
+        "peak_kb": round(peak / 1024, 1),
+        "top": [
+            {
+                "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                "size_kb": round(stat.size / 1024, 1),
+                "size_diff_kb": round(getattr(stat, 'size_diff', stat.size) / 1024, 1),
+                "count": stat.count,
+                "count_diff": getattr(stat, 'count_diff', stat.count)
+            }
+            for stat in stats[:limit]
+        ]
     }
+
+# =====================================================================
+# HELPER FUNCTIONS
+# =====================================================================
+
+def allowed_file(filename):
+    """Check if a file has an allowed extension"""
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+# Process pool shared by the PDF extraction helpers (created lazily per worker process)
+_process_pool = None
+_process_pool_pid = None
+
+def get_process_pool():
+    """
+    Return the shared process pool, creating it on first use in this process
     
-    # Default to nearest grade if out of range
-    if grade_level < 1:
-        grade_level = 1
-    elif grade_level > 12:
-        grade_level = 12
-        
-    return benchmarks.get(grade_level, 150)
+    Pool processes are started from a fork server (or spawned), not forked from this
+    process: a fork of a threaded worker copies locks held by its other threads (the log
+    listener, request threads) in whatever state they are in. They import the app afresh
+    and log to the console only.
+    """
+    global _process_pool, _process_pool_pid
+    
+    # A pool inherited through fork (e.g. gunicorn --preload) cannot be used by the child
+    if _process_pool is None or _process_pool_pid != os.getpid():
+        start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        os.environ[POOL_PROCESS_ENV] = '1'  # Inherited by the fork server or spawned processes
+        _process_pool = ProcessPoolExecutor(max_workers=max(1, PDF_EXTRACT_WORKERS),
+                                            mp_context=multiprocessing.get_context(start_method))
+        _process_pool_pid = os.getpid()
+        logger.info("Started process pool with %s workers", PDF_EXTRACT_WORKERS)
+    
+    return _process_pool
 
-def calculate_reading_accuracy(original_text, spoken_text):
-    """Calculate reading accuracy percentage"""
-    original_words = original_text.lower().split()
-    spoken_words = spoken_text.lower().split()
+def _open_pdf_reader(file):
+    """Open a PdfReader, decrypting with an empty password if needed"""
+    import PyPDF2
+    reader = PyPDF2.PdfReader(file)
     
-    # Filter out filler words
-    filler_words = {"um", "uh", "er", "like", "you know"}
-    filtered_spoken = [word for word in spoken_words if word not in filler_words]
+    if reader.is_encrypted:
+        try:
+            reader.decrypt('')  # Try empty password
+        except:
+            raise PermissionError("PDF is encrypted and could not be decrypted.")
     
-    # Count matching words
-    matched_count = 0
-    matched_indices = set()
+    return reader
+
+def _extract_pdf_page_range(pdf_path, start, end):
+    """
+    Extract text from pages [start, end) of a PDF (runs inside a pool worker)
+    
+    Returns:
+        list: Text of each page in the range
+    """
+    with open(pdf_path, 'rb') as file:
+        reader = _open_pdf_reader(file)
+        return [(reader.pages[i].extract_text() or "") for i in range(start, end)]
+
+def iter_pdf_pages(pdf_path, max_pages=None):
+    """
+    Yield the text of each PDF page in order, spreading page ranges over the process pool
+    
+    Args:
+        pdf_path: Path to the PDF file
+        max_pages (int, optional): Maximum number of pages to read (defaults to PDF_MAX_PAGES)
+        
+    Yields:
+        tuple: (page_index, page_text)
+    """
+    max_pages = PDF_MAX_PAGES if max_pages is None else max_pages
+    
+    with open(pdf_path, 'rb') as file:
+        reader = _open_pdf_reader(file)
+        page_count = min(len(reader.pages), max_pages)
+        if len(reader.pages) > max_pages:
+            logger.warning("PDF has %s pages; only the first %s are read", len(reader.pages), max_pages)
+        
+        # Small documents are cheaper to read here than to ship to the pool
+        if page_count < PDF_PARALLEL_MIN_PAGES or PDF_EXTRACT_WORKERS <= 1:
+            for i in range(page_count):
+                yield i, reader.pages[i].extract_text() or ""
+            return
+    
+    pool = get_process_pool()
+    futures = [
+        (start, pool.submit(_extract_pdf_page_range, pdf_path, start, min(start + PDF_PAGES_PER_TASK, page_count)))
+        for start in range(0, page_count, PDF_PAGES_PER_TASK)
+    ]
+    
+    try:
+        for start, future in futures:
+            for offset, page_text in enumerate(future.result()):
+                yield start + offset, page_text
+    finally:
+        # Drop ranges that are no longer needed (e.g. the caller hit the character cap)
+        for _, future in futures:
+            future.cancel()
+
+def _pdf_page_hash(page):
+    """Hash a page's content stream and embedded images, so identical scans share one OCR result"""
+    digest = hashlib.sha256()
+    
+    contents = page.get_contents()
+    if contents is not None:
+        digest.update(contents.get_data())
+    
+    resources = page.get('/Resources')
+    xobjects = resources.get_object().get('/XObject') if resources else None
+    if xobjects:
+        xobjects = xobjects.get_object()
+        for name in sorted(xobjects):
+            xobject = xobjects[name].get_object()
+            digest.update(name.encode('utf-8'))
+            if hasattr(xobject, 'get_data'):
+                digest.update(xobject.get_data())
+    
+    return digest.hexdigest()
+
+def _ocr_pdf_page(pdf_path, page_index, dpi, max_pixels, cache_folder):
+    """
+    Rasterize and OCR one PDF page (runs inside a pool worker)
+    
+    The DPI is lowered for large pages so the rendered image stays under max_pixels.
+    Results are cached on disk by page hash.
+    
+    Returns:
+        str: Recognized text (may be empty)
+    """
+    from pdf2image import convert_from_path
+    import pytesseract
+    
+    with open(pdf_path, 'rb') as file:
+        page = _open_pdf_reader(file).pages[page_index]
+        page_hash = _pdf_page_hash(page)
+        width_in = float(page.mediabox.width) / 72
+        height_in = float(page.mediabox.height) / 72
+    
+    cache_path = os.path.join(cache_folder, f"{page_hash}.txt")
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        os.utime(cache_path)  # Keep recently used results when the cache is pruned
+        return text
+    except FileNotFoundError:
+        pass
+    
+    # Keep the rendered page inside the memory budget
+    if width_in > 0 and height_in > 0:
+        dpi = min(dpi, int(math.sqrt(max_pixels / (width_in * height_in))))
+    dpi = max(dpi, 72)
+    
+    images = convert_from_path(pdf_path, dpi=dpi, first_page=page_index + 1,
+                               last_page=page_index + 1, grayscale=True)
+    try:
+        text = pytesseract.image_to_string(images[0]) if images else ""
+    finally:
+        for image in images:
+            image.close()
+    
+    os.makedirs(cache_folder, exist_ok=True)
+    _write_file_atomic(cache_path, text.encode('utf-8'))
+    
+    return text
+
+_ocr_cache_pruned_at = 0.0
+
+def prune_ocr_cache():
+    """
+    Remove OCR results unused for OCR_CACHE_MAX_AGE, then the least recently used ones
+    until the cache fits in OCR_CACHE_MAX_BYTES (checked at most hourly per process)
+    """
+    global _ocr_cache_pruned_at
+    now = time.time()
+    if now - _ocr_cache_pruned_at < 3600:
+        return
+    _ocr_cache_pruned_at = now
+    
+    if not os.path.isdir(OCR_CACHE_FOLDER):
+        return
+    entries = []
+    for name in os.listdir(OCR_CACHE_FOLDER):
+        path = os.path.join(OCR_CACHE_FOLDER, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue  # Removed by another process meanwhile
+        entries.append((stat.st_mtime, stat.st_size, path))
+    
+    entries.sort(reverse=True)  # Most recently used first
+    cutoff = now - OCR_CACHE_MAX_AGE
+    total_bytes = 0
+    for mtime, size, path in entries:
+        total_bytes += size
+        if mtime < cutoff or total_bytes > OCR_CACHE_MAX_BYTES:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def check_ocr_available(previous=None):
+    """Check whether the OCR fallback can run (Python packages plus the tesseract binary)"""
+    if not OCR_ENABLED:
+        return False
+    try:
+        import pdf2image
+        import pytesseract
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+# get_tesseract_version spawns tesseract, so the result is cached like the whisper.cpp checks
+ocr_probe = CachedProbe("ocr", check_ocr_available, OCR_PROBE_TTL)
+
+def ocr_available():
+    """Return whether the OCR fallback can run (cached, see check_ocr_available)"""
+    return ocr_probe.get()
+
+def ocr_pdf_pages(pdf_path, page_indices):
+    """
+    OCR the given PDF pages in parallel using the process pool
+    
+    Args:
+        pdf_path: Path to the PDF file
+        page_indices (list): Zero-based indices of pages whose text extraction came back empty
+        
+    Returns:
+        dict: page_index -> recognized text (pages that failed are left out)
+    """
+    if not page_indices or not ocr_available():
+        return {}
+    
+    if len(page_indices) > OCR_MAX_PAGES:
+        logger.warning("OCR limited to the first %s of %s image-only pages", OCR_MAX_PAGES, len(page_indices))
+        page_indices = page_indices[:OCR_MAX_PAGES]
+    
+    logger.info("Running OCR on %s image-only pages", len(page_indices))
+    prune_ocr_cache()
+    
+    pool = get_process_pool()
+    futures = {
+        page_index: pool.submit(_ocr_pdf_page, pdf_path, page_index, OCR_DPI, OCR_MAX_PAGE_PIXELS, OCR_CACHE_FOLDER)
+        for page_index in page_indices
+    }
+    
+    results = {}
+    for page_index, future in futures.items():
+        try:
+            results[page_index] = future.result()
+        except Exception as e:
+            logger.warning("OCR failed for page %s: %s", page_index + 1, e)
+    
+    return results
+
+def pdf_page_count(pdf_path):
+    """Return the number of pages in a PDF, or None if it cannot be read"""
+    try:
+        with open(pdf_path, 'rb') as file:
+            return len(_open_pdf_reader(file).pages)
+    except Exception as e:
+        logger.warning("Could not count PDF pages: %s", e)
+        return None
+
+def extraction_limits(total_pages, pages_read, text_capped, more_pages=False):
+    """
+    Describe whether PDF_MAX_PAGES or PDF_MAX_CHARS cut an extraction short, for the client
+    
+    Args:
+        total_pages (int): Pages in the document (None if unknown)
+        pages_read (int): Pages whose text was kept
+        text_capped (bool): Whether the text was cut at PDF_MAX_CHARS
+        more_pages (bool): Whether pages were left out when total_pages is unknown
+        
+    Returns:
+        dict: total_pages, truncated and, when truncated, a warning to show the user
+    """
+    limits = {"total_pages": total_pages, "truncated": False}
+    if text_capped:
+        limits.update(truncated=True, warning=f"The text was cut at {PDF_MAX_CHARS} characters.")
+    elif total_pages and pages_read < total_pages:
+        limits.update(truncated=True, warning=f"Only the first {pages_read} of {total_pages} pages were extracted.")
+    elif more_pages:
+        limits.update(truncated=True, warning=f"Only the first {pages_read} pages were extracted.")
+    return limits
+
+def extract_pdf(pdf_path, max_pages=None, max_chars=None):
+    """
+    Extract text from PDF with error handling and basic cleanup, reporting the limits hit
+    
+    Args:
+        pdf_path: Path to the PDF file
+        max_pages (int, optional): Page cap (defaults to PDF_MAX_PAGES)
+        max_chars (int, optional): Character cap (defaults to PDF_MAX_CHARS)
+        
+    Returns:
+        tuple: (extracted text or an "Error: ..." message, extraction_limits dict)
+    """
+    max_pages = PDF_MAX_PAGES if max_pages is None else max_pages
+    max_chars = PDF_MAX_CHARS if max_chars is None else max_chars
+    no_limits = extraction_limits(None, 0, False)
+    
+    try:
+        # Try using PyPDF2 first
+        try:
+            # Collect pages and join once at the end
+            page_texts = []
+            total_chars = 0
+            
+            for page_index, page_text in iter_pdf_pages(pdf_path, max_pages):
+                page_texts.append(page_text)
+                total_chars += len(page_text) + 1
+                if total_chars >= max_chars:
+                    logger.warning("PDF text capped at %s characters (page %s)", max_chars, page_index + 1)
+                    break
+            
+            # OCR only the pages where text extraction came back empty (scanned pages)
+            empty_pages = [i for i, page_text in enumerate(page_texts) if not page_text.strip()]
+            for page_index, page_text in ocr_pdf_pages(pdf_path, empty_pages).items():
+                page_texts[page_index] = page_text
+            
+            text = ("\n".join(page_texts) + "\n")[:max_chars] if page_texts else ""
+                
+            if text.strip():
+                return text, extraction_limits(pdf_page_count(pdf_path), len(page_texts), total_chars >= max_chars)
+        except PermissionError as e:
+            return f"Error: {e}", no_limits
+        except Exception as e:
+            logger.warning("PyPDF2 extraction failed: %s, trying alternate methods...", e)
+        
+        # If PyPDF2 failed or returned empty text, try pdftotext command line tool. It ends every
+        # page with a form feed; one page past the cap shows whether the document is longer
+        try:
+            result = subprocess.run(['pdftotext', '-l', str(max_pages + 1), pdf_path, '-'],
+                                  capture_output=True, text=True, check=True)
+            pages = result.stdout.split('\f')
+            if pages and not pages[-1].strip():
+                pages.pop()  # Empty remainder after the last form feed
+            more_pages = len(pages) > max_pages
+            if more_pages:
+                logger.warning("PDF has more than %s pages; only the first %s are read", max_pages, max_pages)
+            text = "\n".join(pages[:max_pages])
+            if text.strip():
+                return text[:max_chars], extraction_limits(
+                    pdf_page_count(pdf_path), min(len(pages), max_pages), len(text) > max_chars, more_pages
+                )
+        except:
+            logger.warning("pdftotext command line tool failed, trying next method...")
+        
+        # If all methods failed, return error
+        return "Error: Could not extract text from PDF. File may be corrupted or contains only images.", no_limits
+        
+    except Exception as e:
+        logger.error("PDF text extraction error: %s", e)
+        return f"Error extracting text: {str(e)}", no_limits
+
+def extract_text_from_pdf(pdf_path, max_pages=None, max_chars=None):
+    """Extract text from PDF (see extract_pdf), without the limits report"""
+    return extract_pdf(pdf_path, max_pages, max_chars)[0]
+
+# Character fixes for common encoding issues, applied in this order.
+# 'â€' comes before the longer 'â€' sequences after it, so those never apply.
+CHAR_REPLACEMENTS = {
+    'â€™': "'", 'â€˜': "'", 'â€œ': '"', 'â€': '"',
+    'â€"': '–', 'â€"': '—', 'â€¢': '•', 'â€¦': '…',
+    'Â©': '©', 'Â®': '®', 'â„¢': '™', 'Â°': '°',
+    '&amp;': '&', '&lt;': '<', '&gt;': '>', '\u00a0': ' ',
+}
+
+# One alternation for all character fixes. '&amp;lt;' and '&amp;gt;' are listed first because
+# the original chained replaces decoded them twice ('&amp;' -> '&', then '&lt;' -> '<').
+_CHAR_FIXES = {'&amp;lt;': '<', '&amp;gt;': '>', **CHAR_REPLACEMENTS}
+_CHAR_FIX_RE = re.compile('|'.join(re.escape(old) for old in _CHAR_FIXES))
+
+_MULTI_NEWLINE_RE = re.compile(r'\n\n\n+')
+_PAGE_NUMBER_RE = re.compile(r'\n\s*\d+\s*\n')
+_PAGE_LABEL_RE = re.compile(r'\n\s*Page\s+\d+(\s+of\s+\d+)?\s*\n', re.IGNORECASE)
+_LINE_HYPHEN_RE = re.compile(r'-\n(?=\s*[a-z])')
+_WORD_CHAR_RE = re.compile(r'\w')
+_LEADING_SPACE_RE = re.compile(r'\s*')
+_HEADING_RE = re.compile(r'[A-Z0-9\s]{5,}')
+
+def _join_hyphenated_lines(text):
+    """
+    Join words hyphenated across line breaks ("read-\ning" -> "reading")
+    
+    Same result as re.sub(r'(\w)-\n(\s*[a-z])', r'\1\2', text), but the search is anchored on
+    the literal "-\n" instead of trying \w at every character.
+    """
+    consumed_end = 0  # End of the text the equivalent (\w)...(\s*[a-z]) match would have consumed
+    
+    def join(match):
+        nonlocal consumed_end
+        hyphen_pos = match.start()
+        if hyphen_pos - 1 < consumed_end or not _WORD_CHAR_RE.match(text, hyphen_pos - 1):
+            return match.group()
+        consumed_end = _LEADING_SPACE_RE.match(text, match.end()).end() + 1
+        return ''
+    
+    return _LINE_HYPHEN_RE.sub(join, text)
+
+def enhance_and_format_text(text, grade_level=None):
+    """
+    Format extracted text for better readability
+    
+    Args:
+        text (str): Raw text to format
+        grade_level (int, optional): Student grade level
+    
+    Returns:
+        str: Formatted text
+    """
+    if not text or len(text.strip()) < 10:
+        return text
+    
+    # Normalize line breaks and whitespace
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    text = _MULTI_NEWLINE_RE.sub('\n\n', text)  # Normalize multiple line breaks
+    
+    # Handle encoding issues and special characters in a single pass
+    text = _CHAR_FIX_RE.sub(lambda match: _CHAR_FIXES[match.group()], text)
+    
+    # Remove PDF artifacts (page numbers, headers/footers)
+    text = _PAGE_NUMBER_RE.sub('\n', text)  # Standalone page numbers
+    text = _PAGE_LABEL_RE.sub('\n', text)  # Page X [of Y]
+    
+    # Handle hyphenation across lines
+    text = _join_hyphenated_lines(text)
+    
+    # Split text into paragraphs, marking lines that look like headings
+    paragraphs = (paragraph.strip() for paragraph in text.split('\n\n'))
+    formatted_paragraphs = [
+        f"## {paragraph}" if _HEADING_RE.fullmatch(paragraph) else paragraph
+        for paragraph in paragraphs if paragraph
+    ]
+    
+    # Join paragraphs with proper spacing
+    return '\n\n'.join(formatted_paragraphs)
+
+def count_syllables(word):
+    """Count syllables in a word (English)"""
+    word = word.lower().strip(".,;:!?-\"'()[]{}")
+    if not word:
+        return 0
+        
+    # Special cases
+    if word in ['the', 'me', 'he', 'she', 'be', 'see']:
+        return 1
+        
+    # Count vowel groups
+    vowels = "aeiouy"
+    count = 0
+    prev_is_vowel = False
+    
+    for char in word:
+        is_vowel = char in vowels
+        if is_vowel and not prev_is_vowel:
+            count += 1
+        prev_is_vowel = is_vowel
+    
+    # Adjust for silent e
+    if word.endswith('e') and len(word) > 2 and word[-2] not in vowels:
+        count -= 1
+    
+    # Words can't have zero syllables
+    return max(1, count)
+
+def get_wpm_benchmark(grade_level):
+    """
+    Return expected words-per-minute benchmark for a given grade level
+    Based on research-backed fluency norms (Hasbrouck & Tindal)
+    """
+    # Research-based WPM targets by grade level (50th percentile, spring)
+    benchmarks = {
+        1: 60,
+        2: 95,
+        3: 115,
+        4: 140,
+        5: 150,
+        6: 160,
+        7: 165,
+        8: 170,
+        9: 180,
+        10: 190,
+        11: 200,
+        12: 210
+    }
+    
+    # Default to nearest grade if out of range
+    if grade_level < 1:
+        grade_level = 1
+    elif grade_level > 12:
+        grade_level = 12
+        
+    return benchmarks.get(grade_level, 150)
+
+def calculate_reading_accuracy(original_text, spoken_text):
+    """Calculate reading accuracy percentage"""
+    original_words = original_text.lower().split()
+    spoken_words = spoken_text.lower().split()
+    
+    # Filter out filler words
+    filler_words = {"um", "uh", "er", "like", "you know"}
+    filtered_spoken = [word for word in spoken_words if word not in filler_words]
+    
+    # Count matching words
+    matched_count = 0
+    matched_indices = set()
     
     for i, orig_word in enumerate(original_words):
         # Look for best match in spoken words that hasn't been matched yet
@@ -642,7 +1657,7 @@ def compare_reading_with_text(original_text, spoken_text):
         
         return css_styles + ''.join(result)
     except Exception as e:
-        logger.error(f"Error in text comparison: {e}")
+        logger.error("Error in text comparison: %s", e)
         return original_text  # Return original text if highlighting fails
 
 # =====================================================================
@@ -1014,351 +2029,1326 @@ def suggest_reading_topics(grammar_score, concepts_to_improve):
     return all_topics[:4]  # Return top 4 suggestions
 
 # =====================================================================
-# ENHANCED TRANSCRIPTION AND ANALYSIS FUNCTIONS
+# MOCK TRANSCRIPTION
 # =====================================================================
 
-def transcribe_audio_realtime(audio_data):
-    """Transcribe audio using Whisper.cpp or fallback to mock if not available"""
-    try:
-        # Log that we're using Whisper.cpp
-        logger.info("Using Whisper.cpp for transcription")
-        
-        # Check if we have Whisper.cpp available
-        has_whisper = whisper_cpp_status.get("overall_status", False)
+# Simulated transcription used when Whisper.cpp is unavailable or fails, and for capacity
+# testing. Set MOCK_TRANSCRIPTION_SEED for reproducible output: the same passage position
+# and audio length always give the same simulated reading, in any request order.
+MOCK_TRANSCRIPTION_SEED = os.getenv('MOCK_TRANSCRIPTION_SEED')
+# Per-word probabilities of reading mistakes, "name=rate,..." (skip, substitute, mispronounce, insert, reread)
+MOCK_ERROR_RATES = os.getenv('MOCK_ERROR_RATES', 'skip=0.1,substitute=0.1,mispronounce=0.1')
+MOCK_WORDS_PER_SECOND = float(os.getenv('MOCK_WORDS_PER_SECOND', 2.5))
+MOCK_TIMING_JITTER = float(os.getenv('MOCK_TIMING_JITTER', 0.25))  # Std. deviation of word durations, relative
+# Imitated Whisper latency: MOCK_LATENCY_SECONDS + audio seconds * MOCK_LATENCY_RTF (0 = answer immediately)
+MOCK_LATENCY_SECONDS = float(os.getenv('MOCK_LATENCY_SECONDS', 0))
+MOCK_LATENCY_RTF = float(os.getenv('MOCK_LATENCY_RTF', 0))
+# Used to estimate the length of compressed (non-WAV) audio chunks; ~32 kbit/s Opus
+MOCK_AUDIO_BYTES_PER_SECOND = int(os.getenv('MOCK_AUDIO_BYTES_PER_SECOND', 4000))
+
+# Read when there is no passage to simulate a reading of
+MOCK_FALLBACK_TEXTS = [
+    "This is a test of the enhanced reading assessment tool. It helps students practice their reading skills.",
+    "Education is the passport to the future, tomorrow belongs to those who prepare for it today.",
+    "The quick brown fox jumps over the lazy dog. This pangram contains all the letters of the alphabet.",
+    "Reading is essential for those who seek to rise above the ordinary. It is a habit that must be cultivated.",
+    "Success is not final, failure is not fatal: It is the courage to continue that counts."
+]
+
+# Similar-sounding words a reader (or recognizer) confuses
+MOCK_SUBSTITUTIONS = {
+    'the': 'a', 'a': 'the', 'their': 'there', 'there': 'their', "they're": 'their',
+    'your': "you're", "you're": 'your', 'to': 'too', 'too': 'to', 'two': 'to', 'for': 'four',
+    'than': 'then', 'then': 'than', 'affect': 'effect', 'effect': 'affect',
+    'accept': 'except', 'except': 'accept', 'hear': 'here', 'here': 'hear',
+    'sun': 'son', 'bright': 'light', 'different': 'various', 'uniquely': 'truly'
+}
+
+MOCK_FILLERS = ['um', 'uh', 'and', 'so']
+
+def parse_rate_spec(spec):
+    """Parse "name=rate,name=rate" into a dict of floats"""
+    rates = {}
+    for item in filter(None, spec.split(',')):
+        name, _, rate = item.partition('=')
+        rates[name.strip()] = float(rate or 0)
+    return rates
+
+class MockTranscriptionEngine:
+    """
+    Simulated speech recognition that reads the real passage with mistakes
+    
+    Each passage word is read correctly, skipped, substituted or mispronounced at the
+    configured rates, with optional filler insertions and re-read phrases. Word timings
+    are drawn around MOCK_WORDS_PER_SECOND. With a seed, the random choices depend only
+    on the seed and the input, so results are reproducible under concurrent requests.
+    """
+    
+    def __init__(self, seed=None, error_rates=None, words_per_second=2.5, timing_jitter=0.25,
+                 latency_seconds=0.0, latency_rtf=0.0):
+        self.seed = seed
+        self.error_rates = dict({"skip": 0.0, "substitute": 0.0, "mispronounce": 0.0, "insert": 0.0, "reread": 0.0},
+                                **(error_rates or {}))
+        self.words_per_second = words_per_second
+        self.timing_jitter = timing_jitter
+        self.latency_seconds = latency_seconds
+        self.latency_rtf = latency_rtf
+    
+    @classmethod
+    def from_env(cls):
+        """Build the engine configured by the MOCK_* environment variables"""
+        return cls(
+            seed=MOCK_TRANSCRIPTION_SEED,
+            error_rates=parse_rate_spec(MOCK_ERROR_RATES),
+            words_per_second=MOCK_WORDS_PER_SECOND,
+            timing_jitter=MOCK_TIMING_JITTER,
+            latency_seconds=MOCK_LATENCY_SECONDS,
+            latency_rtf=MOCK_LATENCY_RTF
+        )
+    
+    def _rng(self, *key):
+        if self.seed is None:
+            return random.Random()
+        return random.Random(':'.join(str(part) for part in (self.seed,) + key))
+    
+    def latency(self, audio_seconds):
+        """Seconds a Whisper.cpp run on audio_seconds of audio is imitated to take"""
+        return self.latency_seconds + audio_seconds * self.latency_rtf
+    
+    def read_words(self, words, rng, include_skipped=True):
+        """
+        Simulate reading a list of words aloud
         
-        if has_whisper:
-            logger.info("Using enhanced transcription service")
+        Args:
+            words: Passage words in reading order
+            rng: random.Random to draw from
+            include_skipped: Add entries (word None) for skipped words, as the recording analysis expects
             
-            # Save audio to a temporary file
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
-                temp_file_path = temp_file.name
-                temp_file.write(audio_data)
+        Returns:
+            Tuple of (spoken words, word details)
+        """
+        rates = self.error_rates
+        spoken = []
+        word_details = []
+        current_time = 0.0
+        mean_duration = 1.0 / self.words_per_second
+        
+        def say(word, status, confidence, intended_word=None):
+            nonlocal current_time
+            duration = max(0.1, rng.gauss(mean_duration, mean_duration * self.timing_jitter))
+            detail = {
+                "word": word,
+                "status": status,
+                "confidence": round(confidence, 3),
+                "start": round(current_time, 3),
+                "end": round(current_time + duration, 3),
+                "timestamp": round(current_time, 3)
+            }
+            if intended_word:
+                detail["intended_word"] = intended_word
+            word_details.append(detail)
+            spoken.append(word)
+            current_time += duration
+        
+        for i, word in enumerate(words):
+            if rng.random() < rates["insert"]:
+                say(rng.choice(MOCK_FILLERS), "inserted", rng.uniform(0.4, 0.7))
+            if i and rng.random() < rates["reread"]:
+                for repeated in words[max(0, i - rng.randint(1, 2)):i]:
+                    say(repeated, "repeated", rng.uniform(0.85, 0.99))
             
-            try:
-                # Get the CLI path from config
-                whisper_cli = whisper_cpp_status.get("cli_path", "./whisper.cpp/build/bin/main")
-                whisper_model = whisper_cpp_status.get("model_path", "./whisper.cpp/models/ggml-base.en.bin")
-                
-                logger.info(f"Attempting Whisper.cpp transcription with CLI: {whisper_cli}")
-                
-                # Convert audio to 16kHz WAV format
-                output_path = f"{temp_file_path}_converted.wav"
-                ffmpeg_cmd = f"ffmpeg -i {temp_file_path} -ar 16000 -ac 1 -y {output_path}"
-                
-                logger.info(f"Running ffmpeg command: {ffmpeg_cmd}")
-                
-                # Run ffmpeg
-                process = subprocess.run(ffmpeg_cmd, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                
-                logger.info(f"Audio converted successfully to {output_path}")
-                
-                # Create the output TXT path
-                txt_output_path = f"{temp_file_path}.txt"
-                
-                # Check if model file exists
-                if not os.path.exists(whisper_model):
-                    logger.error(f"Whisper.cpp model file not found at: {whisper_model}")
-                    
-                    # Try to find model in a different location if using a relative path
-                    if whisper_model.startswith('./'):
-                        absolute_model_path = os.path.abspath(whisper_model)
-                        logger.info(f"Trying absolute model path: {absolute_model_path}")
-                        if os.path.exists(absolute_model_path):
-                            whisper_model = absolute_model_path
-                            logger.info(f"Found model at absolute path: {whisper_model}")
-                        else:
-                            # Try to look in common locations
-                            possible_paths = [
-                                "/Users/adityadubey/Desktop/Enhance_English_Learning /whisper.cpp/models/ggml-base.en.bin",
-                                os.path.join(os.getcwd(), "whisper.cpp/models/ggml-base.en.bin"),
-                                os.path.join(os.path.dirname(os.getcwd()), "whisper.cpp/models/ggml-base.en.bin")
-                            ]
-                            
-                            for path in possible_paths:
-                                logger.info(f"Checking for model at: {path}")
-                                if os.path.exists(path):
-                                    whisper_model = path
-                                    logger.info(f"Found model at: {whisper_model}")
-                                    break
-                            else:
-                                raise FileNotFoundError(f"Cannot find Whisper model file: {whisper_model}")
-                            
-                # Prepare the Whisper.cpp command with word timestamps
-                whisper_cmd = f"{whisper_cli} -m {whisper_model} -f {output_path} -otxt --output-file {txt_output_path} --word-timestamps"
-                
-                logger.info(f"Running Whisper.cpp command: {whisper_cmd}")
-                
-                # Run Whisper.cpp
-                process = subprocess.run(whisper_cmd, shell=True, check=False, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                
-                if process.returncode != 0:
-                    error_msg = process.stderr.decode('utf-8', errors='ignore')
-                    logger.error(f"Whisper.cpp error: {error_msg}")
-                    raise RuntimeError(f"Whisper.cpp failed: {error_msg}")
-                
-                # Read the output file if it exists
-                if os.path.exists(txt_output_path):
-                    with open(txt_output_path, 'r', encoding='utf-8') as f:
-                        transcribed_text = f.read()
-                    
-                    # Extract word timing information if available
-                    word_details = []
-                    word_timing_pattern = r'\[\s*(\d+\.\d+)\s*->\s*(\d+\.\d+)\s*\]\s*(\S+)'
-                    
-                    if '--word-timestamps' in whisper_cmd:
-                        # Look for a JSON file with word timestamps
-                        json_output_path = txt_output_path.replace('.txt', '.json')
-                        if os.path.exists(json_output_path):
-                            try:
-                                with open(json_output_path, 'r', encoding='utf-8') as f:
-                                    word_data = json.load(f)
-                                
-                                # Extract word timestamps from the JSON structure
-                                # Format depends on Whisper.cpp version, try different structures
-                                if 'words' in word_data:
-                                    for word_info in word_data['words']:
-                                        word_details.append({
-                                            'word': word_info.get('word', ''),
-                                            'start': word_info.get('start', 0),
-                                            'end': word_info.get('end', 0),
-                                            'confidence': word_info.get('confidence', 0.0)
-                                        })
-                            except Exception as e:
-                                logger.error(f"Error parsing word timing JSON: {e}")
-                        else:
-                            # Try to extract word timings from the raw output
-                            with open(txt_output_path.replace('.txt', '.json'), 'w', encoding='utf-8') as f:
-                                # Find all the word timing information
-                                matches = re.findall(word_timing_pattern, transcribed_text)
-                                for start_time, end_time, word in matches:
-                                    word_details.append({
-                                        'word': word,
-                                        'start': float(start_time),
-                                        'end': float(end_time),
-                                        'confidence': 1.0  # No confidence info available
-                                    })
-                    
-                    # Clean up temporary files
-                    for file_path in [temp_file_path, output_path, txt_output_path]:
-                        try:
-                            if os.path.exists(file_path):
-                                os.remove(file_path)
-                        except Exception as e:
-                            logger.warning(f"Failed to remove temporary file {file_path}: {e}")
-                    
-                    return {
-                        'transcription': transcribed_text.strip(),
-                        'word_details': word_details,
-                        'source': 'whisper_cpp'
-                    }
+            roll = rng.random()
+            if roll < rates["skip"]:
+                if include_skipped:
+                    word_details.append({"word": None, "status": "skipped", "intended_word": word,
+                                         "confidence": 0, "timestamp": round(current_time, 3)})
+            elif roll < rates["skip"] + rates["substitute"]:
+                substitute = MOCK_SUBSTITUTIONS.get(word.lower()) or rng.choice(words)
+                if substitute.lower() == word.lower():
+                    say(word, "correct", rng.uniform(0.85, 0.99))
                 else:
-                    logger.error(f"Output file {txt_output_path} not found")
-                    raise FileNotFoundError(f"Whisper.cpp output file not found: {txt_output_path}")
-                    
-            except Exception as e:
-                logger.error(f"Error using Whisper.cpp: {e}")
-                logger.error("Falling back to mock transcription")
-                
-                # Clean up temporary files
-                try:
-                    if os.path.exists(temp_file_path):
-                        os.remove(temp_file_path)
-                    if os.path.exists(f"{temp_file_path}_converted.wav"):
-                        os.remove(f"{temp_file_path}_converted.wav")
-                    if os.path.exists(f"{temp_file_path}.txt"):
-                        os.remove(f"{temp_file_path}.txt")
-                except Exception as cleanup_error:
-                    logger.warning(f"Error cleaning up temporary files: {cleanup_error}")
-        
-        # Fall back to mock transcription if Whisper.cpp is not available or failed
-        logger.info("Using mock transcription with IMPROVED WORD DETAILS")
-        
-        # Generate a mock transcription
-        # In a production environment, this would be replaced with an actual backup transcription service
-        
-        # Sample texts for different content types
-        sample_texts = [
-            "This is a test of the enhanced reading assessment tool. It helps students practice their reading skills.",
-            "Education is the passport to the future, tomorrow belongs to those who prepare for it today.",
-            "The quick brown fox jumps over the lazy dog. This pangram contains all the letters of the alphabet.",
-            "Reading is essential for those who seek to rise above the ordinary. It is a habit that must be cultivated.",
-            "Success is not final, failure is not fatal: It is the courage to continue that counts."
-        ]
+                    say(substitute, "substituted", rng.uniform(0.5, 0.7), word)
+            elif roll < rates["skip"] + rates["substitute"] + rates["mispronounce"] and len(word) > 2:
+                pos = rng.randint(1, len(word) - 1)
+                misspelled = word[:pos] + rng.choice('abcdefghijklmnopqrstuvwxyz') + word[pos + 1:]
+                say(misspelled, "mispronounced", rng.uniform(0.6, 0.8), word)
+            else:
+                say(word, "correct", rng.uniform(0.85, 0.99))
         
-        # Select a sample text randomly
-        sample_text = random.choice(sample_texts)
-        
-        # Add some random errors to simulate real speech recognition
-        words = sample_text.split()
-        for i in range(len(words)):
-            if random.random() < 0.1:  # 10% chance of error for each word
-                if random.random() < 0.5:
-                    # Misspell the word
-                    word = words[i]
-                    if len(word) > 3:
-                        pos = random.randint(1, len(word) - 2)
-                        words[i] = word[:pos] + random.choice('abcdefghijklmnopqrstuvwxyz') + word[pos+1:]
-                else:
-                    # Replace with a similarly sounding word
-                    common_substitutions = {
-                        'their': 'there', 'there': 'their', 'they\'re': 'their',
-                        'your': 'you\'re', 'you\'re': 'your',
-                        'to': 'too', 'too': 'to', 'two': 'to',
-                        'than': 'then', 'then': 'than',
-                        'affect': 'effect', 'effect': 'affect',
-                        'accept': 'except', 'except': 'accept',
-                        'hear': 'here', 'here': 'hear'
-                    }
-                    if words[i].lower() in common_substitutions:
-                        words[i] = common_substitutions[words[i].lower()]
+        return spoken, word_details
+    
+    def transcribe_passage(self, original_text):
+        """
+        Simulate the transcription of a recording of the whole passage
         
-        # Generate the final transcribed text
-        transcribed_text = ' '.join(words)
+        Returns:
+            Tuple of (transcribed text, word details)
+        """
+        if not original_text:
+            return "No original text provided for simulation.", []
+        words = original_text.split()
+        rng = self._rng('passage', hashlib.sha256(original_text.encode('utf-8')).hexdigest())
+        spoken, word_details = self.read_words(words, rng)
+        return ' '.join(spoken), word_details
+    
+    def transcribe_chunk(self, audio_seconds, passage_words=None, start_word=0):
+        """
+        Simulate the transcription of one realtime audio chunk
         
-        # Create word details with timing information
-        word_details = []
-        current_time = 0.0
-        for word in words:
-            # Simulate word duration based on length
-            duration = 0.2 + len(word) * 0.05  # Longer words take more time
-            
-            # Add random variation
-            duration += random.uniform(-0.05, 0.05)
-            
-            # Add to the list
-            word_details.append({
-                'word': word,
-                'start': current_time,
-                'end': current_time + duration,
-                'confidence': random.uniform(0.8, 1.0)  # Random confidence score
-            })
+        Args:
+            audio_seconds: Length of the chunk; about words_per_second words are read per second
+            passage_words: Words of the passage being read (fallback sentences when missing)
+            start_word: Index of the first passage word not read yet
             
-            # Update the current time
-            current_time += duration + 0.1  # Add 0.1s gap between words
-        
-        logger.info(f"Generated mock transcription: {transcribed_text[:100]}...")
-        logger.info(f"Created {len(word_details)} word details for highlighting")
+        Returns:
+            Transcription result dictionary (transcription, word_details, source)
+        """
+        count = max(1, round(audio_seconds * self.words_per_second))
+        if passage_words and start_word < len(passage_words):
+            words = passage_words[start_word:start_word + count]
+        else:
+            fallback = self._rng('fallback', start_word).choice(MOCK_FALLBACK_TEXTS).split()
+            words = fallback[:count]
         
+        rng = self._rng('chunk', start_word, ' '.join(words))
+        spoken, word_details = self.read_words(words, rng, include_skipped=False)
         return {
-            'transcription': transcribed_text,
+            'transcription': ' '.join(spoken),
             'word_details': word_details,
             'source': 'mock'
         }
-    except Exception as e:
-        logger.error(f"Error in transcription service: {e}")
+
+def estimate_audio_seconds(audio_data):
+    """
+    Estimate the length of an audio chunk
+    
+    Args:
+        audio_data: Raw audio bytes (WAV or compressed)
         
-        # Return a minimal response on error
+    Returns:
+        float: Seconds of audio (exact for WAV, estimated from the size otherwise)
+    """
+    if audio_data[:4] == b'RIFF' and audio_data[8:12] == b'WAVE':
+        byte_rate, offset = 0, 12
+        while offset + 8 <= len(audio_data):
+            chunk_id = audio_data[offset:offset + 4]
+            size = int.from_bytes(audio_data[offset + 4:offset + 8], 'little')
+            if chunk_id == b'fmt ':
+                byte_rate = int.from_bytes(audio_data[offset + 16:offset + 20], 'little')
+            elif chunk_id == b'data' and byte_rate:
+                return min(size, len(audio_data) - offset - 8) / byte_rate
+            offset += 8 + size + (size & 1)
+    return len(audio_data) / MOCK_AUDIO_BYTES_PER_SECOND
+
+# Replace to plug in a differently configured engine (e.g. in benchmarks)
+mock_transcription_engine = MockTranscriptionEngine.from_env()
+
+# =====================================================================
+# ASR BACKENDS
+# =====================================================================
+
+# Speech recognizer used for transcriptions: "whisper_cli" (a whisper.cpp process per request),
+# "whisper_server" (a persistent whisper.cpp server with the model loaded) or "mock"
+ASR_BACKEND = os.getenv('ASR_BACKEND', 'whisper_cli')
+WHISPER_SERVER_URL = os.getenv('WHISPER_SERVER_URL', 'http://127.0.0.1:8080')
+# A hung ffmpeg/Whisper.cpp run (or server request) is abandoned after this many seconds
+SUBPROCESS_TIMEOUT = float(os.getenv('SUBPROCESS_TIMEOUT', 300))
+# Audio formats picked up by the asr-benchmark command, each next to a same-name .txt reference
+ASR_BENCHMARK_EXTENSIONS = ('.wav', '.webm', '.ogg', '.mp3', '.m4a', '.flac')
+# Whisper.cpp models the router picks from, "name=path,..." in order of preference (most accurate
+# first); defaults to WHISPER_CPP_MODEL_PATH alone
+WHISPER_MODELS = os.getenv('WHISPER_MODELS', '')
+# Models each request type may use, "type=name|name,..." (default: all of them), e.g.
+# "realtime=base_q5|tiny,recording=base" keeps full recordings on the full model
+WHISPER_MODEL_ROUTES = os.getenv('WHISPER_MODEL_ROUTES', '')
+# Latency targets in seconds per request type; a realtime chunk should be back before the next one
+WHISPER_LATENCY_TARGETS = os.getenv('WHISPER_LATENCY_TARGETS', 'realtime=3,recording=60')
+# Request types decoded with the expected passage as Whisper's initial prompt and greedy search
+# ("realtime,recording"). Off by default: the prompt biases Whisper toward the expected words,
+# which lowers latency and WER but can also hide a misread word
+WHISPER_PASSAGE_DECODING = os.getenv('WHISPER_PASSAGE_DECODING', '')
+WHISPER_PROMPT_WORDS = int(os.getenv('WHISPER_PROMPT_WORDS', 40))  # Passage words in the prompt (Whisper keeps ~224 tokens)
+
+# ASR backend runs allowed at once in this process, whichever thread or entry point starts them;
+# more would only compete for the same cores. gunicorn_config.py sets each worker's share
+TRANSCRIPTION_CONCURRENCY = int(os.getenv('TRANSCRIPTION_CONCURRENCY', available_cores()))
+
+def parse_name_spec(spec):
+    """Parse "name=value,name=value" into a dict of strings"""
+    values = {}
+    for item in filter(None, spec.split(',')):
+        name, _, value = item.partition('=')
+        values[name.strip()] = value.strip()
+    return values
+
+def wav_seconds(wav_path):
+    """Length in seconds of a WAV file, read from its header"""
+    with wave.open(wav_path, 'rb') as wav_file:
+        return wav_file.getnframes() / wav_file.getframerate()
+
+def decoding_options(request_type, passage_words=None, start_word=0, decoding=None):
+    """
+    Whisper decoding settings for a transcription
+    
+    Args:
+        request_type: "realtime" or "recording"
+        passage_words: Words of the passage being read, if known
+        start_word: Index of the first passage word not read yet
+        decoding: "passage" or "default" to override WHISPER_PASSAGE_DECODING
+        
+    Returns:
+        Dictionary with the decoding mode and, for passage decoding, the prompt and search widths
+    """
+    if decoding is None:
+        enabled = request_type in [item.strip() for item in WHISPER_PASSAGE_DECODING.split(',')]
+        decoding = "passage" if enabled else "default"
+    if decoding != "passage" or not passage_words:
+        return {"decoding": "default"}
+    # The words the student is about to read: a chunk starts near start_word
+    window = passage_words[start_word:start_word + WHISPER_PROMPT_WORDS] or passage_words[-WHISPER_PROMPT_WORDS:]
+    return {"decoding": "passage", "prompt": ' '.join(window), "beam_size": 1, "best_of": 1}
+
+class ModelRouter:
+    """
+    Picks the Whisper.cpp model for a transcription from the request type and current load
+    
+    Each model's speed is learned as a smoothed real-time factor (seconds of work per audio
+    second, with the CPU contention during the run divided out). A transcription gets the
+    most accurate model allowed for its request type whose expected latency - the current
+    queue wait plus its run time at the current contention - meets the type's target, or
+    the fastest allowed model when none does.
+    """
+    
+    def __init__(self, models, routes=None, targets=None, smoothing=0.3):
+        self.models = models  # name -> path, in the order configured
+        self.routes = {request_type: [name for name in names if name in models]
+                       for request_type, names in (routes or {}).items()}
+        self.targets = targets or {}
+        self.smoothing = smoothing
+        self._rtf = {}  # model name -> smoothed real-time factor at no contention
+        self._queue_wait = 0.0  # Smoothed seconds transcriptions waited for a slot
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_env(cls):
+        models = parse_name_spec(WHISPER_MODELS) or {
+            os.path.basename(WHISPER_CPP_MODEL_PATH).replace('ggml-', '').replace('.bin', ''): WHISPER_CPP_MODEL_PATH
+        }
+        routes = {request_type: [name.strip() for name in names.split('|') if name.strip()]
+                  for request_type, names in parse_name_spec(WHISPER_MODEL_ROUTES).items()}
+        return cls(models, routes, parse_rate_spec(WHISPER_LATENCY_TARGETS))
+    
+    def _smooth(self, previous, sample):
+        return sample if previous is None else previous + self.smoothing * (sample - previous)
+    
+    def contention(self):
+        """How many times slower a CPU-bound run is now than alone (1 = a free core each)"""
+        running = metric_value("transcriptions_in_progress")
+        return max(1.0, running / available_cores())
+    
+    def observe_queue_wait(self, seconds):
+        """Record how long a transcription waited for a free slot"""
+        with self._lock:
+            self._queue_wait = self._smooth(self._queue_wait, seconds)
+    
+    def observe_run(self, model, seconds, audio_seconds, contention):
+        """Record a model's run time on audio_seconds of audio at the given contention"""
+        if audio_seconds <= 0:
+            return
+        with self._lock:
+            self._rtf[model] = self._smooth(self._rtf.get(model), seconds / audio_seconds / contention)
+    
+    def expected_seconds(self, model, audio_seconds, contention=None):
+        """Expected latency of a run (an unmeasured model is assumed to be instant)"""
+        contention = contention or self.contention()
+        with self._lock:
+            return self._queue_wait + self._rtf.get(model, 0.0) * contention * audio_seconds
+    
+    def choose(self, request_type, audio_seconds):
+        """
+        Choose the model for a transcription
+        
+        Args:
+            request_type: "realtime" or "recording"
+            audio_seconds: Length of the audio
+            
+        Returns:
+            Tuple of (model name, model path, expected seconds)
+            
+        Raises:
+            FileNotFoundError: If none of the allowed model files exists
+        """
+        candidates = [name for name in self.routes.get(request_type) or list(self.models)
+                      if os.path.exists(self.models[name])]
+        if not candidates:
+            raise FileNotFoundError(f"No Whisper model file found for {request_type} transcriptions")
+        
+        contention = self.contention()
+        expected = {name: self.expected_seconds(name, audio_seconds, contention) for name in candidates}
+        target = self.targets.get(request_type)
+        for name in candidates:
+            if target is None or expected[name] <= target:
+                return name, self.models[name], expected[name]
+        fastest = min(candidates, key=expected.get)
+        return fastest, self.models[fastest], expected[fastest]
+    
+    def snapshot(self):
+        """Models, routes, targets and learned speeds for the diagnostics page"""
+        with self._lock:
+            return {
+                "models": dict(self.models),
+                "routes": {request_type: list(names) for request_type, names in self.routes.items()},
+                "targets": dict(self.targets),
+                "rtf": {name: round(rtf, 4) for name, rtf in self._rtf.items()},
+                "queue_wait_seconds": round(self._queue_wait, 3),
+                "contention": round(self.contention(), 2)
+            }
+
+model_router = ModelRouter.from_env()
+
+def run_command(cmd, stage, timeout=None):
+    """
+    Run a command, recording its duration as a pipeline stage
+    
+    Args:
+        cmd: Command and arguments as a list
+        stage: Pipeline stage the run is recorded as in the metrics
+        timeout: Seconds before the process is killed (defaults to SUBPROCESS_TIMEOUT)
+        
+    Returns:
+        Completed process (stdout/stderr as bytes)
+    """
+    timeout = timeout or SUBPROCESS_TIMEOUT
+    try:
+        with time_stage(stage):
+            return subprocess.run(cmd, check=False, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        raise RuntimeError(f"{os.path.basename(cmd[0])} timed out after {timeout} seconds")
+
+def convert_to_wav(audio_path, start_seconds=0):
+    """
+    Convert audio to the 16 kHz mono WAV whisper.cpp expects
+    
+    Args:
+        audio_path: Path of the uploaded audio
+        start_seconds: Position to start decoding from; earlier audio is skipped, not decoded
+        
+    Returns:
+        Path of the converted file (the caller removes it)
+    """
+    wav_path = f"{audio_path}_converted.wav"
+    process = run_command(build_ffmpeg_command(audio_path, wav_path, start_seconds), "ffmpeg")
+    if process.returncode != 0:
+        error_msg = process.stderr.decode('utf-8', errors='ignore')
+        logger.error("ffmpeg error: %s", error_msg)
+        raise RuntimeError(f"ffmpeg conversion failed: {error_msg}")
+    return wav_path
+
+def spread_word_timestamps(transcribed_text, audio_duration):
+    """
+    Build word details for a transcription without word timings, spreading the words evenly
+    
+    Args:
+        transcribed_text: Transcribed text
+        audio_duration: Recording length in seconds
+        
+    Returns:
+        List of word detail dictionaries (word, status, confidence, timestamp)
+    """
+    words = transcribed_text.split()
+    time_per_word = audio_duration / max(1, len(words))
+    return [
+        {
+            "word": word,
+            "status": "correct",  # Default status, will be compared later
+            "confidence": 0.9,    # Whisper doesn't provide per-word confidence
+            "timestamp": i * time_per_word
+        }
+        for i, word in enumerate(words)
+    ]
+
+class ASRBackend:
+    """
+    A speech recognizer the transcription endpoints can use
+    
+    Subclasses implement transcribe(); failures are raised and the caller falls back
+    to the mock transcription.
+    """
+    
+    name = None
+    
+    def available(self):
+        """Whether the backend is configured (checked before each transcription, keep it cheap)"""
+        return True
+    
+    def transcribe(self, audio_path, audio_seconds, passage_words=None, start_word=0,
+                   request_type="realtime", model=None, decoding=None):
+        """
+        Transcribe an audio file
+        
+        Args:
+            audio_path: Path of the audio file (any format ffmpeg reads)
+            audio_seconds: Audio length in seconds
+            passage_words: Words of the passage being read, if known
+            start_word: Index of the first passage word not read yet
+            request_type: "realtime" (a chunk) or "recording" (a full reading), for model routing
+            model: Model name to use instead of the routed one (backends with several models)
+            decoding: "passage" or "default" to override WHISPER_PASSAGE_DECODING
+            
+        Returns:
+            Transcription result dictionary (transcription, word_details, source, model, decoding)
+        """
+        raise NotImplementedError
+    
+    def transcribe_recording(self, audio_path, audio_duration, original_text):
+        """
+        Transcribe a full recording of the passage
+        
+        Returns:
+            Transcription result dictionary, with word details spread evenly over the recording
+        """
+        result = self.transcribe(audio_path, audio_duration, original_text.split(), request_type="recording")
+        logger.info("Transcription from %s: %s...", self.name, result['transcription'][:100])
+        return dict(result, word_details=spread_word_timestamps(result['transcription'], audio_duration))
+
+class WhisperCLIBackend(ASRBackend):
+    """Runs the whisper.cpp CLI once per transcription (loads the model every time)"""
+    
+    name = "whisper_cpp"
+    
+    def __init__(self, router=None):
+        self.router = router or model_router
+    
+    def available(self):
+        return (os.path.exists(WHISPER_CPP_CLI_PATH) and any(map(os.path.exists, self.router.models.values()))
+                and whisper_probe.get()["ffmpeg_available"])
+    
+    def transcribe(self, audio_path, audio_seconds, passage_words=None, start_word=0,
+                   request_type="realtime", model=None, decoding=None):
+        wav_path = convert_to_wav(audio_path)
+        txt_output_path = f"{audio_path}.txt"
+        try:
+            # The converted file gives the exact length (recordings may arrive without one)
+            audio_seconds = wav_seconds(wav_path) or audio_seconds
+            if model:
+                model_path, expected = self.router.models[model], None
+            else:
+                model, model_path, expected = self.router.choose(request_type, audio_seconds)
+            realtime_logger.info("Routed %s transcription of %.1fs to model %s (expected %s s)",
+                                 request_type, audio_seconds, model, expected and round(expected, 2))
+            
+            options = decoding_options(request_type, passage_words, start_word, decoding)
+            whisper_cmd = build_whisper_command(WHISPER_CPP_CLI_PATH, model_path, wav_path, txt_output_path, options)
+            realtime_logger.info("Running Whisper.cpp command: %s", ' '.join(whisper_cmd))
+            contention = self.router.contention()
+            start = time.perf_counter()
+            process = run_command(whisper_cmd, "whisper")
+            if process.returncode != 0:
+                error_msg = process.stderr.decode('utf-8', errors='ignore')
+                logger.error("Whisper.cpp error: %s", error_msg)
+                raise RuntimeError(f"Whisper.cpp failed: {error_msg}")
+            self.router.observe_run(model, time.perf_counter() - start, audio_seconds, contention)
+            return dict(read_realtime_whisper_output(txt_output_path), model=model, decoding=options["decoding"])
+        finally:
+            remove_temp_files([wav_path, txt_output_path])
+
+class WhisperServerBackend(ASRBackend):
+    """Posts audio to a whisper.cpp server (examples/server) that keeps the model loaded"""
+    
+    name = "whisper_server"
+    
+    def __init__(self, url=None):
+        self.url = (url or WHISPER_SERVER_URL).rstrip('/')
+    
+    def available(self):
+        return bool(self.url) and whisper_probe.get()["ffmpeg_available"]
+    
+    def transcribe(self, audio_path, audio_seconds, passage_words=None, start_word=0,
+                   request_type="realtime", model=None, decoding=None):
+        wav_path = convert_to_wav(audio_path)
+        try:
+            with open(wav_path, 'rb') as f:
+                audio = f.read()
+            options = decoding_options(request_type, passage_words, start_word, decoding)
+            fields = {"temperature": "0.0", "response_format": "json"}
+            fields.update({key: str(value) for key, value in options.items() if key != "decoding"})
+            body, content_type = encode_multipart_form(
+                fields,
+                {"file": (os.path.basename(wav_path), audio, "audio/wav")}
+            )
+            http_request = urllib.request.Request(f"{self.url}/inference", data=body, method='POST',
+                                                  headers={'Content-Type': content_type})
+            with time_stage("whisper"):
+                with urllib.request.urlopen(http_request, timeout=SUBPROCESS_TIMEOUT) as response:
+                    payload = response.read()
+        except urllib.error.URLError as e:
+            raise RuntimeError(f"Whisper.cpp server request failed: {e}")
+        finally:
+            remove_temp_files([wav_path])
+        
+        with time_stage("parsing"):
+            result = json.loads(payload)
+            if 'error' in result:
+                raise RuntimeError(f"Whisper.cpp server error: {result['error']}")
         return {
-            'transcription': 'Error transcribing audio.',
+            'transcription': result.get('text', '').strip(),
             'word_details': [],
-            'source': 'error'
+            'source': self.name,
+            'model': None,  # Whichever model the server was started with
+            'decoding': options["decoding"]
         }
 
-def create_enhanced_transcription(transcribed_text, audio_duration):
+class MockBackend(ASRBackend):
+    """The simulated transcription (see MOCK TRANSCRIPTION); never fails"""
+    
+    name = "mock"
+    
+    def transcribe(self, audio_path, audio_seconds, passage_words=None, start_word=0,
+                   request_type="realtime", model=None, decoding=None):
+        return mock_realtime_transcription(audio_seconds, passage_words, start_word)
+    
+    def transcribe_recording(self, audio_path, audio_duration, original_text):
+        transcribed_text, word_details = simulate_recording_transcription(original_text, audio_duration)
+        return {'transcription': transcribed_text, 'word_details': word_details, 'source': self.name, 'model': None}
+
+ASR_BACKENDS = {
+    "whisper_cli": WhisperCLIBackend,
+    "whisper_server": WhisperServerBackend,
+    "mock": MockBackend,
+}
+
+@functools.lru_cache(maxsize=None)
+def get_asr_backend(name=None):
     """
-    Create an enhanced transcription result with word-level details
+    Return the ASR backend instance for a name in ASR_BACKENDS (default: ASR_BACKEND)
+    
+    Raises:
+        ValueError: For an unknown backend name
+    """
+    name = name or ASR_BACKEND
+    if name not in ASR_BACKENDS:
+        raise ValueError(f"Unknown ASR backend '{name}', expected one of: {', '.join(ASR_BACKENDS)}")
+    return ASR_BACKENDS[name]()
+
+def encode_multipart_form(fields, files):
+    """
+    Encode a multipart/form-data request body
     
     Args:
-        transcribed_text (str): The transcribed text
-        audio_duration (float): Duration of the audio in seconds
+        fields: Form field name -> string value
+        files: Form field name -> (filename, bytes, content type)
         
     Returns:
-        dict: Enhanced transcription result with word details
+        Tuple of (body bytes, Content-Type header value)
     """
-    words = transcribed_text.split()
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, data, content_type) in files.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                     f'Content-Type: {content_type}\r\n\r\n'.encode() + data + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+_transcription_slots = threading.BoundedSemaphore(TRANSCRIPTION_CONCURRENCY)
+
+@contextlib.contextmanager
+def transcription_slot():
+    """Hold one of the process's TRANSCRIPTION_CONCURRENCY slots, counting waiting transcriptions"""
+    inc_metric("transcription_queue_depth", 1)
+    start = time.perf_counter()
+    try:
+        _transcription_slots.acquire()
+    finally:
+        inc_metric("transcription_queue_depth", -1)
+    # The model router trades accuracy for speed while transcriptions queue up; the wait is
+    # recorded before the backend picks this transcription's model
+    model_router.observe_queue_wait(time.perf_counter() - start)
+    try:
+        yield
+    finally:
+        _transcription_slots.release()
+
+def run_asr_backend(method, audio_path, *args):
+    """
+    Run a transcription with the configured backend, or return None so the caller falls back
+    
+    The run holds a transcription slot, so callers on every thread share the process-wide
+    TRANSCRIPTION_CONCURRENCY limit.
+    
+    Args:
+        method: "transcribe" or "transcribe_recording"
+        audio_path: Path of the saved audio
+        *args: Remaining arguments of the backend method
+        
+    Returns:
+        The backend method's result, or None if the backend is unavailable or failed
+    """
+    backend = get_asr_backend()
+    if not backend.available():
+        logger.info("ASR backend %s not available, using fallback", backend.name)
+        return None
+    
+    with transcription_slot():
+        inc_metric("transcriptions_in_progress", 1)
+        try:
+            return getattr(backend, method)(audio_path, *args)
+        except Exception as e:
+            logger.error("Error using %s: %s", backend.name, e)
+            logger.error("Falling back to mock transcription")
+            return None
+        finally:
+            inc_metric("transcriptions_in_progress", -1)
+
+def word_error_rate(reference, hypothesis):
+    """
+    Word error rate of a transcription: (substitutions + deletions + insertions) / reference words
+    
+    Case and punctuation are ignored.
+    """
+    ref = re.findall(r"[a-z0-9']+", reference.lower())
+    hyp = re.findall(r"[a-z0-9']+", hypothesis.lower())
+    if not ref:
+        return float(bool(hyp))
+    
+    # Levenshtein distance over words, one row at a time
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1] / len(ref)
+
+def audio_file_seconds(audio_path):
+    """Length of an audio file: from the WAV header, or of its ffmpeg conversion for other formats"""
+    with open(audio_path, 'rb') as f:
+        audio_data = f.read()
+    if audio_data[:4] == b'RIFF' or not whisper_probe.get()["ffmpeg_available"]:
+        return estimate_audio_seconds(audio_data)
+    wav_path = convert_to_wav(audio_path)
+    try:
+        with open(wav_path, 'rb') as f:
+            return estimate_audio_seconds(f.read())
+    finally:
+        remove_temp_files([wav_path])
+
+def split_wav(wav_path, chunk_seconds, out_dir):
+    """
+    Split a WAV file into consecutive chunks, as the realtime page records them
+    
+    Returns:
+        List of (chunk path, chunk seconds)
+    """
+    chunks = []
+    with wave.open(wav_path, 'rb') as source:
+        params = source.getparams()
+        frames_per_chunk = max(1, int(chunk_seconds * params.framerate))
+        while True:
+            frames = source.readframes(frames_per_chunk)
+            if not frames:
+                break
+            chunk_path = os.path.join(out_dir, f"{os.path.basename(wav_path)}.{len(chunks):04d}.wav")
+            with wave.open(chunk_path, 'wb') as chunk:
+                chunk.setparams(params)
+                chunk.writeframes(frames)
+            chunks.append((chunk_path, len(frames) / (params.sampwidth * params.nchannels) / params.framerate))
+    return chunks
+
+def load_asr_corpus(corpus_dir, chunk_seconds=None, temp_dir=None):
+    """
+    Read a benchmark corpus: audio files, each with a same-name .txt reference transcript
+    
+    Args:
+        corpus_dir: Corpus directory
+        chunk_seconds: Split each recording into realtime chunks of this length (in temp_dir)
+        temp_dir: Directory for converted and split audio
+        
+    Returns:
+        List of (file name, audio seconds, reference text, [(audio path, seconds), ...])
+    """
+    corpus = []
+    for name in sorted(os.listdir(corpus_dir)):
+        stem, ext = os.path.splitext(name)
+        reference_path = os.path.join(corpus_dir, stem + '.txt')
+        if ext.lower() not in ASR_BENCHMARK_EXTENSIONS or not os.path.exists(reference_path):
+            continue
+        with open(reference_path, 'r', encoding='utf-8') as f:
+            reference = f.read().strip()
+        audio_path = os.path.join(corpus_dir, name)
+        audio_seconds = audio_file_seconds(audio_path)
+        segments = [(audio_path, audio_seconds)]
+        if chunk_seconds:
+            with open(audio_path, 'rb') as f:
+                is_wav = f.read(4) == b'RIFF'
+            wav_path = audio_path if is_wav else convert_to_wav(shutil.copy(audio_path, temp_dir))
+            segments = split_wav(wav_path, chunk_seconds, temp_dir)
+        corpus.append((name, audio_seconds, reference, segments))
+    if not corpus:
+        raise ValueError(f"No audio files with .txt references found in {corpus_dir}")
+    return corpus
+
+def _benchmark_file(backend, reference, segments, model, decoding):
+    """Transcribe one corpus file, chunk by chunk when split; returns (transcription, latencies, models)"""
+    # The reference is the passage: prompted decoding and the mock read it, as in the app
+    passage_words = reference.split()
+    request_type = "realtime" if len(segments) > 1 else "recording"
+    texts, latencies, models = [], [], set()
+    start_word = 0
+    for audio_path, seconds in segments:
+        start = time.perf_counter()
+        result = backend.transcribe(audio_path, seconds, passage_words, start_word,
+                                    request_type=request_type, model=model, decoding=decoding)
+        latencies.append(time.perf_counter() - start)
+        texts.append(result['transcription'])
+        models.add(result.get('model'))
+        # As on the realtime page, the next chunk continues after the words recognized so far
+        start_word = min(len(passage_words), start_word + len(result['transcription'].split()))
+    return ' '.join(texts), latencies, sorted(models, key=str)
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def benchmark_asr_backends(corpus_dir, backend_names, repeat=1, decodings=(None,), chunk_seconds=None):
+    """
+    Measure the latency, real-time factor and word error rate of ASR backends on a local corpus
+    
+    Args:
+        corpus_dir: Directory of audio files, each with a same-name .txt reference transcript
+        backend_names: Names from ASR_BACKENDS to measure, optionally with a Whisper model
+            name from WHISPER_MODELS ("whisper_cli:tiny") instead of the routed one
+        repeat: Runs per file; the fastest is reported
+        decodings: Decoding modes to compare ("default", "passage"; None for the configured one)
+        chunk_seconds: Transcribe the recordings as realtime chunks of this length
+        
+    Returns:
+        Dictionary of "backend[/decoding]" -> results (audio and processing seconds, RTF, WER,
+        p50/p95 latency per transcription, per file)
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        corpus = load_asr_corpus(corpus_dir, chunk_seconds, temp_dir)
+        reference_words = {name: len(reference.split()) for name, _, reference, _ in corpus}
+        
+        results = {}
+        for backend_name in backend_names:
+            name, _, model = backend_name.partition(':')
+            backend = get_asr_backend(name)
+            if model and model not in getattr(backend, 'router', model_router).models:
+                raise ValueError(f"Unknown Whisper model '{model}', expected one of: {', '.join(model_router.models)}")
+            for decoding in decodings:
+                label = backend_name if len(decodings) == 1 else f"{backend_name}/{decoding or 'configured'}"
+                if not backend.available():
+                    results[label] = {"available": False}
+                    continue
+                
+                files = []
+                latencies = []
+                for file_name, audio_seconds, reference, segments in corpus:
+                    runs = []
+                    try:
+                        for _ in range(max(1, repeat)):
+                            runs.append(_benchmark_file(backend, reference, segments, model or None, decoding))
+                    except Exception as e:
+                        files.append({"file": file_name, "error": str(e)})
+                        continue
+                    transcription, file_latencies, models = min(runs, key=lambda run: sum(run[1]))
+                    latencies += file_latencies
+                    files.append({
+                        "file": file_name,
+                        "audio_seconds": round(audio_seconds, 3),
+                        "seconds": round(sum(file_latencies), 3),
+                        "rtf": round(sum(file_latencies) / audio_seconds, 3) if audio_seconds else None,
+                        "wer": round(word_error_rate(reference, transcription), 4),
+                        "models": models
+                    })
+                
+                measured = [f for f in files if "error" not in f]
+                audio_total = sum(f["audio_seconds"] for f in measured)
+                seconds_total = sum(f["seconds"] for f in measured)
+                word_total = sum(reference_words[f["file"]] for f in measured)
+                results[label] = {
+                    "available": True,
+                    "files": files,
+                    "audio_seconds": round(audio_total, 3),
+                    "seconds": round(seconds_total, 3),
+                    "rtf": round(seconds_total / audio_total, 3) if audio_total else None,
+                    # Corpus WER: errors over all reference words, not the mean of per-file rates
+                    "wer": round(sum(f["wer"] * reference_words[f["file"]] for f in measured) / word_total, 4) if word_total else None,
+                    # Per transcription: a whole file, or one chunk with chunk_seconds
+                    "latency_p50": round(_percentile(latencies, 50), 3) if latencies else None,
+                    "latency_p95": round(_percentile(latencies, 95), 3) if latencies else None,
+                    "errors": len(files) - len(measured)
+                }
+    return results
+
+@app.cli.command("asr-benchmark")
+@click.argument("corpus_dir", type=click.Path(exists=True, file_okay=False))
+@click.option("--backends", default=','.join(ASR_BACKENDS), show_default=True,
+              help="Comma-separated backends to measure; whisper_cli:<model> measures one of WHISPER_MODELS")
+@click.option("--decoding", "decodings", default=None,
+              help="Comma-separated decoding modes to compare, e.g. default,passage (default: as configured)")
+@click.option("--chunk-seconds", type=float, help="Transcribe the recordings as realtime chunks of this length")
+@click.option("--repeat", default=1, show_default=True, help="Runs per file (the fastest is reported)")
+@click.option("--json", "json_path", type=click.Path(dir_okay=False), help="Also write the results as JSON")
+def asr_benchmark_command(corpus_dir, backends, decodings, chunk_seconds, repeat, json_path):
+    """Report the latency, real-time factor and word error rate of each ASR backend on CORPUS_DIR"""
+    decodings = tuple(mode.strip() for mode in decodings.split(',') if mode.strip()) if decodings else (None,)
+    for mode in decodings:
+        if mode not in (None, "default", "passage"):
+            raise click.BadParameter(f"unknown decoding mode '{mode}'", param_hint="--decoding")
+    try:
+        results = benchmark_asr_backends(corpus_dir, [name.strip() for name in backends.split(',') if name.strip()],
+                                         repeat, decodings, chunk_seconds)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    
+    for label, result in results.items():
+        if not result["available"]:
+            click.echo(f"{label:>28}: not available")
+            continue
+        click.echo(f"{label:>28}: RTF {result['rtf']}  WER {result['wer']}  "
+                   f"latency p50 {result['latency_p50']}s p95 {result['latency_p95']}s  "
+                   f"({result['seconds']}s for {result['audio_seconds']}s of audio, {result['errors']} errors)")
+        for file_result in result["files"]:
+            if "error" in file_result:
+                click.echo(f"{'':>30}{file_result['file']}: {file_result['error']}")
+            else:
+                click.echo(f"{'':>30}{file_result['file']}: RTF {file_result['rtf']}  WER {file_result['wer']}  "
+                           f"models {', '.join(map(str, file_result['models']))}")
+    
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+# =====================================================================
+# ENHANCED TRANSCRIPTION AND ANALYSIS FUNCTIONS
+# =====================================================================
+
+def build_ffmpeg_command(input_path, output_path, start_seconds=0):
+    """Build the ffmpeg command that converts audio to the 16 kHz mono WAV whisper.cpp expects"""
+    # -ss before -i seeks the input, so the audio before start_seconds is never decoded
+    seek = ['-ss', f"{start_seconds:.3f}"] if start_seconds else []
+    return ['ffmpeg'] + seek + ['-i', input_path, '-ar', '16000', '-ac', '1', '-y', output_path]
+
+def build_whisper_command(cli_path, model_path, wav_path, txt_output_path, options=None):
+    """Build the Whisper.cpp command with text output and word timestamps (options from decoding_options)"""
+    cmd = [cli_path, '-m', model_path, '-f', wav_path, '-otxt', '--output-file', txt_output_path, '--word-timestamps']
+    options = options or {}
+    if options.get("prompt"):
+        cmd += ['--prompt', options["prompt"]]
+    if "beam_size" in options:
+        # Greedy search without temperature fallback: one decoding pass per segment
+        cmd += ['--beam-size', str(options["beam_size"]), '--best-of', str(options["best_of"]), '--no-fallback']
+    return cmd
+
+def remove_temp_files(paths):
+    """Remove temporary files, logging (not raising) failures"""
+    for file_path in paths:
+        try:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        except Exception as e:
+            logger.warning("Failed to remove temporary file %s: %s", file_path, e)
+
+@timed_stage("parsing")
+def read_realtime_whisper_output(txt_output_path):
+    """
+    Read the Whisper.cpp output of a realtime chunk, with word timings when available
+    
+    Args:
+        txt_output_path: Path passed to Whisper.cpp as --output-file
+        
+    Returns:
+        Transcription result dictionary (transcription, word_details, source)
+    """
+    if not os.path.exists(txt_output_path):
+        logger.error("Output file %s not found", txt_output_path)
+        raise FileNotFoundError(f"Whisper.cpp output file not found: {txt_output_path}")
+    
+    with open(txt_output_path, 'r', encoding='utf-8') as f:
+        transcribed_text = f.read()
+    
+    # Extract word timing information if available
     word_details = []
+    word_timing_pattern = r'\[\s*(\d+\.\d+)\s*->\s*(\d+\.\d+)\s*\]\s*(\S+)'
     
-    # Generate approximate timestamps based on audio duration
-    if len(words) > 0:
-        time_per_word = audio_duration / len(words)
+    # Look for a JSON file with word timestamps
+    json_output_path = txt_output_path.replace('.txt', '.json')
+    if os.path.exists(json_output_path):
+        try:
+            with open(json_output_path, 'r', encoding='utf-8') as f:
+                word_data = json.load(f)
+            
+            # Extract word timestamps from the JSON structure
+            # Format depends on Whisper.cpp version, try different structures
+            if 'words' in word_data:
+                for word_info in word_data['words']:
+                    word_details.append({
+                        'word': word_info.get('word', ''),
+                        'start': word_info.get('start', 0),
+                        'end': word_info.get('end', 0),
+                        'confidence': word_info.get('confidence', 0.0)
+                    })
+        except Exception as e:
+            logger.error("Error parsing word timing JSON: %s", e)
     else:
-        time_per_word = 0.5  # Default if no words
-    
-    # Create word details with estimated confidence and timestamps
-    for i, word in enumerate(words):
-        # Simulate confidence levels (would be provided by actual ASR system)
-        confidence = random.uniform(0.75, 0.98)
-        word_details.append({
-            "word": word,
-            "status": "correct",  # Default status
-            "confidence": confidence,
-            "timestamp": i * time_per_word
-        })
+        # Try to extract word timings from the raw output
+        matches = re.findall(word_timing_pattern, transcribed_text)
+        for start_time, end_time, word in matches:
+            word_details.append({
+                'word': word,
+                'start': float(start_time),
+                'end': float(end_time),
+                'confidence': 1.0  # No confidence info available
+            })
     
     return {
-        "transcribed_text": transcribed_text,
-        "word_details": word_details,
-        "duration": audio_duration,
-        "original_text": transcribed_text  # Same as transcribed for real transcription
+        'transcription': transcribed_text.strip(),
+        'word_details': word_details,
+        'source': 'whisper_cpp'
     }
 
-def compare_reading_with_text_enhanced(original_text, transcription_result):
+def mock_realtime_transcription(audio_seconds=3.0, passage_words=None, start_word=0):
     """
-    Create enhanced highlighted visualization of reading accuracy with detailed categories
+    Simulate the transcription of a realtime chunk (used when Whisper.cpp is unavailable)
     
     Args:
-        original_text (str): Original text
-        transcription_result (dict): Transcription result with text and word details
+        audio_seconds: Length of the audio chunk
+        passage_words: Words of the passage being read, if known
+        start_word: Index of the first passage word not read yet
         
     Returns:
-        str: HTML with highlighted text and detailed statistics
+        Transcription result dictionary (transcription, word_details, source)
+    """
+    realtime_logger.info("Using mock transcription from word %s", start_word)
+    time.sleep(mock_transcription_engine.latency(audio_seconds))
+    result = mock_transcription_engine.transcribe_chunk(audio_seconds, passage_words, start_word)
+    realtime_logger.info("Generated mock transcription: %s...", result['transcription'][:100])
+    return result
+
+def transcribe_audio_realtime(audio_data, passage_words=None, start_word=0):
+    """
+    Transcribe audio with the configured ASR backend or fallback to mock if not available
+    
+    Args:
+        audio_data: Raw audio bytes of one chunk
+        passage_words: Words of the passage being read (lets the mock follow the reading)
+        start_word: Index of the first passage word not read yet
+        
+    Returns:
+        Transcription result dictionary (transcription, word_details, source)
     """
     try:
-        # Extract information from transcription result
-        spoken_text = transcription_result.get("transcribed_text", transcription_result.get("text", ""))
-        word_details = transcription_result.get("word_details", [])
+        audio_seconds = estimate_audio_seconds(audio_data)
         
-        logger.info(f"Comparing original text ({len(original_text)} chars) with spoken text ({len(spoken_text)} chars)")
-        logger.info(f"Word details available: {len(word_details)}")
+        # Save audio to a temporary file
+        with time_stage("temp_write"), tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
+            temp_file_path = temp_file.name
+            temp_file.write(audio_data)
         
-        # If we have word details, use them directly for more accurate highlighting
-        if word_details:
-            return compare_reading_with_word_details(original_text, word_details)
+        try:
+            result = run_asr_backend("transcribe", temp_file_path, audio_seconds, passage_words, start_word)
+        finally:
+            remove_temp_files([temp_file_path])
         
-        # If no word details, fall back to difflib comparison
-        original_words = re.findall(r'\b\w+\b', original_text.lower())
-        spoken_words = re.findall(r'\b\w+\b', spoken_text.lower())
+        # Fall back to mock transcription if the backend is not available or failed
+        return result or mock_realtime_transcription(audio_seconds, passage_words, start_word)
+    except Exception as e:
+        logger.error("Error in transcription service: %s", e)
         
-        # Track statistics
-        stats = {
-            "correct": 0,
-            "mispronounced": 0,
-            "skipped": 0,
-            "substituted": 0,
-            "total_words": len(original_words)
+        # Return a minimal response on error
+        return {
+            'transcription': 'Error transcribing audio.',
+            'word_details': [],
+            'source': 'error'
         }
+
+def transcribe_recording(audio_path, original_text, audio_duration):
+    """
+    Transcribe a full recording with the configured ASR backend, falling back to a simulation
+    
+    Args:
+        audio_path: Path of the saved recording
+        original_text: Text the student was reading
+        audio_duration: Recording length in seconds
         
-        # Compare words using difflib
-        matcher = difflib.SequenceMatcher(None, original_words, spoken_words)
-        
-        # Create a mapping of word status based on difflib comparison
-        word_status_map = {}
-        
-        # Process each opcode (match, delete, insert, replace)
-        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
-            if tag == 'equal':
-                # Words match exactly
-                for k in range(i2 - i1):
-                    word_status_map[i1 + k] = {
-                        "status": "correct",
-                        "confidence": 1.0
-                    }
-                    stats["correct"] += 1
-            elif tag == 'delete':
-                # Words in original but not in spoken (skipped)
-                for k in range(i2 - i1):
-                    word_status_map[i1 + k] = {
-                        "status": "skipped",
-                        "confidence": 0.0
-                    }
-                    stats["skipped"] += 1
-            elif tag == 'replace':
-                # Words in both but different (mispronounced or substituted)
-                for k in range(i2 - i1):
-                    # If there's a corresponding word, check similarity
-                    if k < (j2 - j1):
-                        orig_word = original_words[i1 + k]
-                        spoken_word = spoken_words[j1 + k]
+    Returns:
+        Transcription result dictionary (transcription, word_details, source, model)
+    """
+    result = run_asr_backend("transcribe_recording", audio_path, audio_duration, original_text)
+    if result:
+        return result
+    transcribed_text, word_details = simulate_recording_transcription(original_text, audio_duration)
+    return {'transcription': transcribed_text, 'word_details': word_details, 'source': 'mock', 'model': None}
+
+class FileSingleFlight:
+    """
+    Coalesces identical calls across worker processes, through files in a shared folder
+    
+    While a call for a key is running, later calls with that key, in any process, wait
+    for it and get its result instead of running again. The first call creates <key>.lock
+    exclusively and runs; its result is written to <key>.json, which calls that found the
+    lock wait for. The result is kept for a short `grace` period only, long enough for the
+    waiters (which poll every 0.1 s) to read it and for a double click to share it; this
+    is not a cache. Errors are not stored: when the running call fails, its waiters run
+    the call again themselves, one at a time. Results must be JSON-serializable.
+    """
+    
+    def __init__(self, folder, grace=5, timeout=None):
+        self.folder = folder
+        self.grace = grace
+        self.timeout = timeout  # Seconds a lock is honoured (defaults to twice SUBPROCESS_TIMEOUT)
+    
+    def _paths(self, key):
+        base = os.path.join(self.folder, key)
+        return f"{base}.lock", f"{base}.json"
+    
+    def _timeout(self):
+        return self.timeout or 2 * SUBPROCESS_TIMEOUT
+    
+    def _remove_expired(self):
+        now = time.time()
+        for name in os.listdir(self.folder):
+            path = os.path.join(self.folder, name)
+            max_age = self.grace if name.endswith('.json') else self._timeout()
+            try:
+                if os.path.getmtime(path) < now - max_age:
+                    os.remove(path)
+            except OSError:
+                pass  # Removed by another process meanwhile
+    
+    def _read_result(self, result_path):
+        """Return the stored outcome if it is still within the grace period, else None"""
+        try:
+            with open(result_path, 'r', encoding='utf-8') as f:
+                outcome = json.load(f)
+            if os.path.getmtime(result_path) < time.time() - self.grace:
+                return None
+        except FileNotFoundError:
+            return None
+        return outcome
+    
+    def do(self, key, func, *args):
+        """
+        Run func(*args), or wait for the identical call running (or just finished) in any process
+        
+        Returns:
+            Tuple of (result, whether it was shared from another call)
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        self._remove_expired()
+        lock_path, result_path = self._paths(key)
+        
+        while True:
+            outcome = self._read_result(result_path)
+            if outcome is not None:
+                return outcome['result'], True
+            try:
+                os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                outcome = self._wait(lock_path, result_path)
+                if outcome is not None:
+                    return outcome['result'], True
+                # The call in progress failed without a result: try again here
+        
+        try:
+            # The previous call may have finished between the check and taking the lock
+            outcome = self._read_result(result_path)
+            if outcome is not None:
+                return outcome['result'], True
+            result = func(*args)
+            _write_file_atomic(result_path, json.dumps({"result": result}).encode('utf-8'))
+            return result, False
+        finally:
+            os.remove(lock_path)
+    
+    def _wait(self, lock_path, result_path):
+        """Wait for the call holding the lock; return its outcome, or None if it failed"""
+        deadline = time.monotonic() + self._timeout()
+        while True:
+            outcome = self._read_result(result_path)
+            if outcome is not None:
+                return outcome
+            if not os.path.exists(lock_path):
+                return self._read_result(result_path)  # Written just before the lock was removed
+            if time.monotonic() > deadline:
+                raise RuntimeError("Timed out waiting for the identical request in progress")
+            time.sleep(0.1)
+
+# Recordings being transcribed in any worker process, by recording_flight_key
+recording_flights = FileSingleFlight(os.path.join(DATABASE_FOLDER, 'recording_flights'))
+
+def recording_flight_key(audio_bytes, original_text, audio_duration):
+    """Key identifying identical transcription requests: same audio, passage and duration"""
+    digest = hashlib.sha256(audio_bytes)
+    digest.update(b'\0' + original_text.encode('utf-8') + b'\0' + repr(audio_duration).encode())
+    return digest.hexdigest()
+
+def transcribe_uploaded_recording(audio_bytes, original_text, audio_duration):
+    """
+    Save an uploaded recording to a temporary directory and transcribe it
+    
+    Args:
+        audio_bytes: Uploaded audio
+        original_text: Text the student was reading
+        audio_duration: Recording length in seconds
+        
+    Returns:
+        Transcription result dictionary (transcription, word_details, source, model)
+    """
+    temp_dir = tempfile.mkdtemp()
+    try:
+        temp_path = os.path.join(temp_dir, "recording.webm")
+        with time_stage("temp_write"), open(temp_path, 'wb') as f:
+            f.write(audio_bytes)
+        logger.info("Audio saved to temporary file: %s", temp_path)
+        
+        result = transcribe_recording(temp_path, original_text, audio_duration)
+        inc_metric("transcriptions_total", source=result['source'])
+        return result
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def simulate_recording_transcription(original_text, audio_duration=None):
+    """
+    Simulate a transcription of the original text with reading mistakes
+    
+    Args:
+        original_text: Text the student was reading
+        audio_duration: Recording length in seconds, for the imitated Whisper latency
+        
+    Returns:
+        Tuple of (transcribed text, word details)
+    """
+    logger.info("Using fallback transcription method")
+    if not audio_duration:
+        audio_duration = len(original_text.split()) / mock_transcription_engine.words_per_second
+    time.sleep(mock_transcription_engine.latency(audio_duration))
+    transcribed_text, word_details = mock_transcription_engine.transcribe_passage(original_text)
+    logger.info("Fallback transcription: %s...", transcribed_text[:100])
+    return transcribed_text, word_details
+
+def build_recording_transcription_result(transcribed_text, word_details, audio_duration, source=None, model=None):
+    """Build the transcription result stored in the session and returned to the client"""
+    return {
+        "transcribed_text": transcribed_text,
+        "text": transcribed_text,  # For compatibility
+        "word_details": word_details,
+        "audio_duration": audio_duration,
+        "duration": audio_duration,  # For compatibility
+        "source": source,
+        "model": model,  # Whisper model the router chose, None for the mock
+        "timestamp": time.time()
+    }
+
+def create_enhanced_transcription(transcribed_text, audio_duration):
+    """
+    Create an enhanced transcription result with word-level details
+    
+    Args:
+        transcribed_text (str): The transcribed text
+        audio_duration (float): Duration of the audio in seconds
+        
+    Returns:
+        dict: Enhanced transcription result with word details
+    """
+    words = transcribed_text.split()
+    word_details = []
+    
+    # Generate approximate timestamps based on audio duration
+    if len(words) > 0:
+        time_per_word = audio_duration / len(words)
+    else:
+        time_per_word = 0.5  # Default if no words
+    
+    # Create word details with estimated confidence and timestamps
+    for i, word in enumerate(words):
+        # Simulate confidence levels (would be provided by actual ASR system)
+        confidence = random.uniform(0.75, 0.98)
+        word_details.append({
+            "word": word,
+            "status": "correct",  # Default status
+            "confidence": confidence,
+            "timestamp": i * time_per_word
+        })
+    
+    return {
+        "transcribed_text": transcribed_text,
+        "word_details": word_details,
+        "duration": audio_duration,
+        "original_text": transcribed_text  # Same as transcribed for real transcription
+    }
+
+def align_spoken_words(original_words, spoken_words, word_details=None):
+    """
+    Assign a status to each original word by matching it against the spoken words with difflib
+    
+    Args:
+        original_words (list): Lowercased words of the original text
+        spoken_words (list): Lowercased spoken words
+        word_details (list, optional): Word detail dictionaries parallel to spoken_words; their
+            confidence is used for matched words and a mispronounced/substituted status is kept
+        
+    Returns:
+        tuple: (word_status_map, stats)
+    """
+    # Track statistics
+    stats = {
+        "correct": 0,
+        "mispronounced": 0,
+        "skipped": 0,
+        "substituted": 0,
+        "total_words": len(original_words)
+    }
+    
+    # Compare words using difflib
+    matcher = difflib.SequenceMatcher(None, original_words, spoken_words)
+    
+    # Create a mapping of word status based on difflib comparison
+    word_status_map = {}
+    
+    # Process each opcode (match, delete, insert, replace)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            # Words match exactly
+            for k in range(i2 - i1):
+                word_status_map[i1 + k] = {
+                    "status": "correct",
+                    "confidence": word_details[j1 + k].get("confidence", 1.0) if word_details else 1.0
+                }
+                stats["correct"] += 1
+        elif tag == 'delete':
+            # Words in original but not in spoken (skipped)
+            for k in range(i2 - i1):
+                word_status_map[i1 + k] = {
+                    "status": "skipped",
+                    "confidence": 0.0
+                }
+                stats["skipped"] += 1
+        elif tag == 'replace':
+            # Words in both but different (mispronounced or substituted)
+            for k in range(i2 - i1):
+                # If there's a corresponding word, check similarity
+                if k < (j2 - j1):
+                    orig_word = original_words[i1 + k]
+                    spoken_word = spoken_words[j1 + k]
+                    
+                    # Get existing status if available
+                    existing_status = word_details[j1 + k].get("status") if word_details else None
+                    
+                    if existing_status in ["mispronounced", "substituted"]:
+                        # Use the existing status
+                        word_status_map[i1 + k] = {
+                            "status": existing_status,
+                            "confidence": word_details[j1 + k].get("confidence", 0.7),
+                            "actual_word": spoken_word
+                        }
+                        stats[existing_status] += 1
+                    else:
+                        # Calculate similarity and decide status
                         similarity = difflib.SequenceMatcher(None, orig_word, spoken_word).ratio()
                         
                         if similarity > 0.7:
@@ -1377,22 +3367,67 @@ def compare_reading_with_text_enhanced(original_text, transcription_result):
                                 "actual_word": spoken_word
                             }
                             stats["substituted"] += 1
-                    else:
-                        # No corresponding word (skipped)
-                        word_status_map[i1 + k] = {
-                            "status": "skipped",
-                            "confidence": 0.0
-                        }
-                        stats["skipped"] += 1
+                else:
+                    # No corresponding word (skipped)
+                    word_status_map[i1 + k] = {
+                        "status": "skipped",
+                        "confidence": 0.0
+                    }
+                    stats["skipped"] += 1
+    
+    # Mark any remaining words as skipped
+    for i in range(len(original_words)):
+        if i not in word_status_map:
+            word_status_map[i] = {
+                "status": "skipped",
+                "confidence": 0
+            }
+            stats["skipped"] += 1
+    
+    return word_status_map, stats
+
+@timed_stage("alignment")
+def align_reading_with_text(original_text, spoken_text):
+    """
+    Align a plain spoken transcript against the original text using difflib
+    
+    Args:
+        original_text (str): Original text
+        spoken_text (str): Spoken text
         
-        # Mark any remaining words as skipped
-        for i in range(len(original_words)):
-            if i not in word_status_map:
-                word_status_map[i] = {
-                    "status": "skipped",
-                    "confidence": 0
-                }
-                stats["skipped"] += 1
+    Returns:
+        tuple: (original_words, word_status_map, stats)
+    """
+    original_words = re.findall(r'\b\w+\b', original_text.lower())
+    spoken_words = re.findall(r'\b\w+\b', spoken_text.lower())
+    return (original_words, *align_spoken_words(original_words, spoken_words))
+
+def compare_reading_with_text_enhanced(original_text, transcription_result):
+    """
+    Create enhanced highlighted visualization of reading accuracy with detailed categories
+    
+    Args:
+        original_text (str): Original text
+        transcription_result (dict): Transcription result with text and word details
+        
+    Returns:
+        str: HTML with highlighted text and detailed statistics
+    """
+    try:
+        # Extract information from transcription result
+        spoken_text = transcription_result.get("transcribed_text", transcription_result.get("text", ""))
+        word_details = transcription_result.get("word_details", [])
+        
+        logger.info("Comparing original text (%s chars) with spoken text (%s chars)", len(original_text), len(spoken_text))
+        logger.info("Word details available: %s", len(word_details))
+        
+        # If we have word details, use them directly for more accurate highlighting
+        if word_details:
+            return compare_reading_with_word_details(original_text, word_details)
+        
+        # If no word details, fall back to difflib comparison
+        original_words, word_status_map, stats = align_reading_with_text(original_text, spoken_text)
+        render_start = time.perf_counter()
         
         # Reconstruct original text with highlighting
         result = []
@@ -1464,13 +3499,35 @@ def compare_reading_with_text_enhanced(original_text, transcription_result):
         </style>
         """
         
-        return css_styles + ''.join(result)
+        html = css_styles + ''.join(result)
+        observe_stage("html_rendering", time.perf_counter() - render_start)
+        return html
     except Exception as e:
-        logger.error(f"Error comparing reading: {e}")
+        logger.error("Error comparing reading: %s", e)
         import traceback
         logger.error(traceback.format_exc())
         return f"<p>Error analyzing reading: {str(e)}</p>"
 
+@timed_stage("alignment")
+def align_reading_with_word_details(original_text, word_details):
+    """
+    Align spoken words against the original text and assign a status to each original word
+    
+    Args:
+        original_text (str): Original text
+        word_details (list): List of word detail dictionaries with status
+        
+    Returns:
+        tuple: (original_words, word_status_map, stats)
+    """
+    # Extract words from original text
+    original_words = re.findall(r'\b\w+\b', original_text.lower())
+    
+    # Details without a word are dropped, keeping the rest parallel to the spoken words
+    word_details = [detail for detail in word_details if detail.get("word")]
+    spoken_words = [detail["word"].lower() for detail in word_details]
+    return (original_words, *align_spoken_words(original_words, spoken_words, word_details))
+
 def compare_reading_with_word_details(original_text, word_details):
     """
     Create enhanced highlighted text using detailed word information
@@ -1483,105 +3540,8 @@ def compare_reading_with_word_details(original_text, word_details):
         str: HTML with highlighted text and detailed statistics
     """
     try:
-        # Extract words from original text
-        original_words = re.findall(r'\b\w+\b', original_text.lower())
-        
-        # Track statistics
-        stats = {
-            "correct": 0,
-            "mispronounced": 0,
-            "skipped": 0,
-            "substituted": 0,
-            "total_words": len(original_words)
-        }
-        
-        # Create word status map from word details
-        word_status_map = {}
-        spoken_words = []
-        
-        for detail in word_details:
-            if detail.get("word"):
-                spoken_words.append(detail["word"].lower())
-        
-        # Match original words with spoken words
-        matcher = difflib.SequenceMatcher(None, original_words, spoken_words)
-        
-        # Process each opcode (match, delete, insert, replace)
-        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
-            if tag == 'equal':
-                # Words match exactly
-                for k in range(i2 - i1):
-                    word_status_map[i1 + k] = {
-                        "status": "correct",
-                        "confidence": word_details[j1 + k].get("confidence", 1.0)
-                    }
-                    stats["correct"] += 1
-            elif tag == 'delete':
-                # Words in original but not in spoken (skipped)
-                for k in range(i2 - i1):
-                    word_status_map[i1 + k] = {
-                        "status": "skipped",
-                        "confidence": 0.0
-                    }
-                    stats["skipped"] += 1
-            elif tag == 'replace':
-                # Words in both but different (mispronounced or substituted)
-                for k in range(i2 - i1):
-                    # If there's a corresponding word, check similarity
-                    if k < (j2 - j1):
-                        orig_word = original_words[i1 + k]
-                        spoken_word = spoken_words[j1 + k]
-                        
-                        # Get existing status if available
-                        existing_status = word_details[j1 + k].get("status")
-                        
-                        if existing_status in ["mispronounced", "substituted"]:
-                            # Use the existing status
-                            word_status_map[i1 + k] = {
-                                "status": existing_status,
-                                "confidence": word_details[j1 + k].get("confidence", 0.7),
-                                "actual_word": spoken_word
-                            }
-                            if existing_status == "mispronounced":
-                                stats["mispronounced"] += 1
-                            else:
-                                stats["substituted"] += 1
-                        else:
-                            # Calculate similarity and decide status
-                            similarity = difflib.SequenceMatcher(None, orig_word, spoken_word).ratio()
-                            
-                            if similarity > 0.7:
-                                # Similar enough to be considered mispronounced
-                                word_status_map[i1 + k] = {
-                                    "status": "mispronounced",
-                                    "confidence": similarity,
-                                    "actual_word": spoken_word
-                                }
-                                stats["mispronounced"] += 1
-                            else:
-                                # Different enough to be considered substituted
-                                word_status_map[i1 + k] = {
-                                    "status": "substituted",
-                                    "confidence": similarity,
-                                    "actual_word": spoken_word
-                                }
-                                stats["substituted"] += 1
-                    else:
-                        # No corresponding word (skipped)
-                        word_status_map[i1 + k] = {
-                            "status": "skipped",
-                            "confidence": 0.0
-                        }
-                        stats["skipped"] += 1
-        
-        # Mark any remaining words as skipped
-        for i in range(len(original_words)):
-            if i not in word_status_map:
-                word_status_map[i] = {
-                    "status": "skipped",
-                    "confidence": 0
-                }
-                stats["skipped"] += 1
+        original_words, word_status_map, stats = align_reading_with_word_details(original_text, word_details)
+        render_start = time.perf_counter()
         
         # Reconstruct original text with highlighting
         result = []
@@ -1751,14 +3711,69 @@ def compare_reading_with_word_details(original_text, word_details):
         """
         
         # Combine the components
-        return css + stats_html + "".join(result) + js
+        html = css + stats_html + "".join(result) + js
+        observe_stage("html_rendering", time.perf_counter() - render_start)
+        return html
     
     except Exception as e:
-        logger.error(f"Error comparing reading with word details: {e}")
+        logger.error("Error comparing reading with word details: %s", e)
         import traceback
         logger.error(traceback.format_exc())
         return f"<p>Error analyzing reading: {str(e)}</p>"
 
+def encode_status_runs(statuses, confidences=None):
+    """
+    Run-length encode per-word statuses for compact responses
+    
+    Consecutive words with the same status and (rounded) confidence share one run.
+    
+    Args:
+        statuses (list): Status of each word, in passage order
+        confidences (list, optional): Confidence of each word
+        
+    Returns:
+        list: Runs of [start_index, length, status, confidence]
+    """
+    runs = []
+    for i, status in enumerate(statuses):
+        confidence = round(confidences[i], 2) if confidences else None
+        if runs and runs[-1][2] == status and runs[-1][3] == confidence:
+            runs[-1][1] += 1
+        else:
+            runs.append([i, 1, status, confidence])
+    return runs
+
+def compare_reading_compact(original_text, transcription_result):
+    """
+    Compare a reading with the original text and return structured highlighting instead of HTML
+    
+    Args:
+        original_text (str): Original text
+        transcription_result (dict): Transcription result with text and word details
+        
+    Returns:
+        dict: word_count, run-length encoded word statuses and statistics
+    """
+    spoken_text = transcription_result.get("transcribed_text", transcription_result.get("text", ""))
+    word_details = transcription_result.get("word_details", [])
+    
+    if word_details:
+        original_words, word_status_map, stats = align_reading_with_word_details(original_text, word_details)
+    else:
+        original_words, word_status_map, stats = align_reading_with_text(original_text, spoken_text)
+    
+    word_statuses = [word_status_map.get(i, {"status": "unknown"}) for i in range(len(original_words))]
+    stats["accuracy_percentage"] = int((stats["correct"] / stats["total_words"]) * 100) if stats["total_words"] > 0 else 0
+    
+    return {
+        "word_count": len(original_words),
+        "runs": encode_status_runs(
+            [info["status"] for info in word_statuses],
+            [info.get("confidence", 0) for info in word_statuses]
+        ),
+        "statistics": stats
+    }
+
 def analyze_reading_comprehensive(original_text, transcription_result, grade_level, grammar_evaluation=None):
     """
     Comprehensive reading analysis including grammar skills
@@ -1909,12 +3924,13 @@ def analyze_reading_comprehensive(original_text, transcription_result, grade_lev
     
     return comprehensive_analysis
 
-def track_spoken_words_realtime(original_text):
+def track_spoken_words_realtime(original_text, include_html=True):
     """
     Generate a structure for tracking words during real-time speaking
     
     Args:
         original_text (str): Original text to be read
+        include_html (bool): Build the span-per-word HTML (not needed for compact responses)
         
     Returns:
         dict: Word tracking data structure with HTML for display
@@ -1938,6 +3954,12 @@ def track_spoken_words_realtime(original_text):
             })
             word_positions.append((start_pos, end_pos))
         
+        if not include_html:
+            return {
+                "word_count": len(words),
+                "words": words
+            }
+        
         # Generate HTML with span tags for each word
         html_parts = []
         last_pos = 0
@@ -2001,18 +4023,1086 @@ def track_spoken_words_realtime(original_text):
         </script>
         """
         
-        return {
-            "html": css + ''.join(html_parts) + javascript,
-            "word_count": len(words),
-            "words": words
-        }
-    except Exception as e:
-        logger.error(f"Error in tracking spoken words: {e}")
-        return {
-            "html": original_text,
-            "word_count": 0,
-            "words": []
-        }
+        return {
+            "html": css + ''.join(html_parts) + javascript,
+            "word_count": len(words),
+            "words": words
+        }
+    except Exception as e:
+        logger.error("Error in tracking spoken words: %s", e)
+        return {
+            "html": original_text,
+            "word_count": 0,
+            "words": []
+        }
+
+# Tracking markup cache: passage hash -> (tracking data, size in bytes) (LRU, shared by all requests in this worker)
+_tracking_cache = OrderedDict()
+_tracking_cache_bytes = 0
+_tracking_cache_lock = threading.Lock()
+
+def tracking_data_size(tracking_data):
+    """Approximate memory held by tracking data: the markup plus the per-word dicts"""
+    return sys.getsizeof(tracking_data["html"]) + sum(
+        sys.getsizeof(word) + sum(sys.getsizeof(value) for value in word.values())
+        for word in tracking_data["words"]
+    )
+
+def get_tracking_data(original_text):
+    """
+    Return tracking data for a passage, reusing markup and word offsets cached by passage hash
+    
+    Args:
+        original_text (str): Original text to be read
+        
+    Returns:
+        tuple: (tracking_data, passage_hash). The tracking data is a copy that callers may modify.
+    """
+    passage_hash = hashlib.sha256(original_text.encode('utf-8')).hexdigest()
+    
+    global _tracking_cache_bytes
+    with _tracking_cache_lock:
+        tracking_data, _ = _tracking_cache.get(passage_hash, (None, 0))
+        if tracking_data is not None:
+            _tracking_cache.move_to_end(passage_hash)
+    
+    inc_metric("cache_requests_total", cache="tracking", result="miss" if tracking_data is None else "hit")
+    if tracking_data is None:
+        with time_stage("html_rendering"):
+            tracking_data = track_spoken_words_realtime(original_text)
+        size = tracking_data_size(tracking_data)
+        # A passage bigger than the whole budget would only evict everything else
+        if size <= TRACKING_CACHE_MAX_BYTES:
+            with _tracking_cache_lock:
+                if passage_hash not in _tracking_cache:
+                    _tracking_cache[passage_hash] = (tracking_data, size)
+                    _tracking_cache_bytes += size
+                while len(_tracking_cache) > TRACKING_CACHE_SIZE or _tracking_cache_bytes > TRACKING_CACHE_MAX_BYTES:
+                    _, (_, evicted_size) = _tracking_cache.popitem(last=False)
+                    _tracking_cache_bytes -= evicted_size
+    
+    # Word statuses are updated in place during a reading, so hand out fresh word dicts
+    tracking_data = dict(tracking_data, words=[dict(word) for word in tracking_data["words"]])
+    return tracking_data, passage_hash
+
+# =====================================================================
+# PASSAGE STORE
+# =====================================================================
+
+def new_passage_id():
+    """Reserve an id for a passage whose text is not known yet (streaming uploads)"""
+    return uuid.uuid4().hex
+
+_WORD_RE = re.compile(r'\b(\w+)\b')  # Same word boundaries as track_spoken_words_realtime
+_PASSAGE_ID_RE = re.compile(r'[0-9a-f]{16,64}')
+
+def segment_passage_text(text, max_words=None):
+    """
+    Split a passage into segments of whole paragraphs with stable word-index ranges
+    
+    Paragraphs longer than max_words are split at word boundaries. Segments are contiguous,
+    so word indices within a segment plus its start_word give the word index in the passage.
+    
+    Args:
+        text (str): Passage text
+        max_words (int, optional): Target words per segment (defaults to PASSAGE_SEGMENT_WORDS)
+        
+    Returns:
+        list: Segment dicts with start_word, end_word, byte_start and byte_end
+    """
+    max_words = max_words or PASSAGE_SEGMENT_WORDS
+    
+    # Candidate cut points: paragraph starts, plus word starts inside long paragraphs
+    paragraph_starts = [0] + [match.end() for match in re.finditer(r'\n\n+', text)]
+    word_starts = [match.start() for match in _WORD_RE.finditer(text)]
+    
+    boundaries = []  # (char_offset, word_index) where a new segment begins
+    segment_start_word = 0
+    paragraph_index = 0
+    for word_index, word_start in enumerate(word_starts):
+        # Find the paragraph this word belongs to
+        while paragraph_index + 1 < len(paragraph_starts) and paragraph_starts[paragraph_index + 1] <= word_start:
+            paragraph_index += 1
+        
+        if word_index - segment_start_word < max_words:
+            continue
+        
+        # Prefer to cut at the start of this word's paragraph, if that leaves a non-empty segment
+        paragraph_start = paragraph_starts[paragraph_index]
+        first_word_in_paragraph = next(i for i in range(segment_start_word, word_index + 1) if word_starts[i] >= paragraph_start)
+        if first_word_in_paragraph > segment_start_word:
+            boundaries.append((paragraph_start, first_word_in_paragraph))
+            segment_start_word = first_word_in_paragraph
+        else:
+            boundaries.append((word_start, word_index))
+            segment_start_word = word_index
+    
+    # Turn cut points into contiguous segments with byte offsets for seeking in the text file
+    segments = []
+    cuts = [(0, 0)] + boundaries + [(len(text), len(word_starts))]
+    byte_pos = 0
+    for i in range(len(cuts) - 1):
+        (char_start, start_word), (char_end, end_word) = cuts[i], cuts[i + 1]
+        byte_len = len(text[char_start:char_end].encode('utf-8'))
+        segments.append({
+            "index": i,
+            "start_word": start_word,
+            "end_word": end_word,
+            "byte_start": byte_pos,
+            "byte_end": byte_pos + byte_len
+        })
+        byte_pos += byte_len
+    
+    return segments
+
+# Segment index record: start_word, end_word, byte_start, byte_end. Fixed width, so any
+# segment is found with one seek however many segments the passage has
+_SEGMENT_RECORD = struct.Struct('<4Q')
+
+def _passage_paths(passage_id):
+    """Return the (metadata, text, segment index) file paths for a passage"""
+    base = os.path.join(PASSAGE_FOLDER, passage_id)
+    return f"{base}.json", f"{base}.txt", f"{base}.idx"
+
+def _write_file_atomic(path, data):
+    """Write bytes to a temp file first so readers never see a partial file"""
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+_passages_cleaned_at = 0.0
+
+def mark_passage_used(meta_path, mtime=None):
+    """Refresh a passage's metadata mtime, which remove_stale_passages reads as its last use (at most daily)"""
+    try:
+        if (os.path.getmtime(meta_path) if mtime is None else mtime) < time.time() - 24 * 3600:
+            os.utime(meta_path)
+    except OSError:
+        pass  # Removed meanwhile
+
+def remove_stale_passages():
+    """
+    Delete passages not used for PASSAGE_MAX_AGE, with their reading progress
+    (checked at most hourly per process)
+    
+    Files left by a save that did not finish (no metadata, or a temp file) are removed once as old.
+    """
+    global _passages_cleaned_at
+    now = time.time()
+    if now - _passages_cleaned_at < 3600:
+        return
+    _passages_cleaned_at = now
+    
+    cutoff = now - PASSAGE_MAX_AGE
+    if not os.path.isdir(PASSAGE_FOLDER):
+        return
+    names = os.listdir(PASSAGE_FOLDER)
+    stale = set()
+    for name in names:
+        passage_id = name.split('.', 1)[0]
+        meta_path = _passage_paths(passage_id)[0]
+        try:
+            if name.endswith('.json') and os.path.getmtime(meta_path) < cutoff:
+                stale.add(passage_id)
+            elif (name.endswith('.tmp') or not os.path.exists(meta_path)) and os.path.getmtime(os.path.join(PASSAGE_FOLDER, name)) < cutoff:
+                os.remove(os.path.join(PASSAGE_FOLDER, name))
+        except OSError:
+            pass  # Updated or removed by another request meanwhile
+    
+    for passage_id in stale:
+        # Metadata first: it is what marks the passage as available
+        for path in _passage_paths(passage_id):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        shutil.rmtree(os.path.join(PROGRESS_FOLDER, passage_id), ignore_errors=True)
+    if stale:
+        logger.info("Removed %s passages unused for %s days", len(stale), PASSAGE_MAX_AGE // 86400)
+
+def save_passage(text, title=None, passage_id=None):
+    """
+    Store a passage on disk so it can be fetched by id instead of round-tripping through the session
+    
+    The text is stored as UTF-8 next to a fixed-width segment index and a small metadata
+    file, so single segments can be read without loading the whole passage or its index.
+    
+    Args:
+        text (str): Formatted passage text
+        title (str, optional): Passage title
+        passage_id (str, optional): Id reserved with new_passage_id (defaults to a hash of the text)
+        
+    Returns:
+        str: Passage id
+    """
+    remove_stale_passages()
+    if passage_id is None:
+        passage_id = hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]
+        
+        # Ids are content hashes, so an existing passage is already up to date
+        meta_path = _passage_paths(passage_id)[0]
+        if os.path.exists(meta_path):
+            mark_passage_used(meta_path)
+            return passage_id
+    
+    segments = segment_passage_text(text)
+    
+    os.makedirs(PASSAGE_FOLDER, exist_ok=True)
+    meta_path, text_path, index_path = _passage_paths(passage_id)
+    
+    # Text and index first: metadata is what marks the passage as available
+    _write_file_atomic(text_path, text.encode('utf-8'))
+    _write_file_atomic(index_path, b''.join(
+        _SEGMENT_RECORD.pack(seg["start_word"], seg["end_word"], seg["byte_start"], seg["byte_end"])
+        for seg in segments
+    ))
+    _write_file_atomic(meta_path, json.dumps({
+        "id": passage_id,
+        "title": title,
+        "created": time.time(),
+        "revision": hashlib.sha256(text.encode('utf-8')).hexdigest()[:16],
+        "word_count": segments[-1]["end_word"],
+        "segment_count": len(segments)
+    }).encode('utf-8'))
+    
+    return passage_id
+
+def load_passage_meta(passage_id):
+    """Load a passage's metadata (without the text or segment index), or None if it does not exist"""
+    if not passage_id or not _PASSAGE_ID_RE.fullmatch(passage_id):
+        return None
+    
+    meta_path, _, _ = _passage_paths(passage_id)
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            passage = json.load(f)
+            mark_passage_used(meta_path, os.fstat(f.fileno()).st_mtime)
+    except FileNotFoundError:
+        return None
+    if "segments" in passage:  # Stored before the segment index file existed
+        passage["segment_count"] = len(passage["segments"])
+    return passage
+
+def passage_etag(passage):
+    """
+    ETag for responses built from a stored passage
+    
+    Streamed passages are saved again as pages arrive, so the tag carries the revision
+    (a hash of the text) rather than just the id.
+    """
+    return f"{passage['id']}-{passage.get('revision') or passage['created']}"
+
+def load_passage_segments(passage, start=0, count=1):
+    """
+    Read entries of a passage's segment index
+    
+    Args:
+        passage (dict): Passage metadata from load_passage_meta
+        start (int): First segment
+        count (int): Number of segments
+        
+    Returns:
+        list: Segment dicts with index, start_word, end_word, byte_start and byte_end
+    """
+    start = max(0, start)
+    count = max(0, min(count, passage["segment_count"] - start))
+    if "segments" in passage:
+        return [dict(segment) for segment in passage["segments"][start:start + count]]
+    if not count:
+        return []
+    
+    _, _, index_path = _passage_paths(passage["id"])
+    with open(index_path, 'rb') as f:
+        f.seek(start * _SEGMENT_RECORD.size)
+        data = f.read(count * _SEGMENT_RECORD.size)
+    return [
+        {"index": start + i, "start_word": start_word, "end_word": end_word,
+         "byte_start": byte_start, "byte_end": byte_end}
+        for i, (start_word, end_word, byte_start, byte_end) in enumerate(_SEGMENT_RECORD.iter_unpack(data))
+    ]
+
+def load_passage(passage_id):
+    """Load a stored passage with its full text, returning None if it does not exist"""
+    passage = load_passage_meta(passage_id)
+    if passage is None:
+        return None
+    
+    _, text_path, _ = _passage_paths(passage_id)
+    with open(text_path, 'r', encoding='utf-8') as f:
+        passage["text"] = f.read()
+    
+    return passage
+
+def load_passage_segment(passage, segment_index):
+    """
+    Read one segment of a stored passage by seeking into its text file
+    
+    Args:
+        passage (dict): Passage metadata from load_passage_meta
+        segment_index (int): Segment to read
+        
+    Returns:
+        dict: Segment info with its text, or None if the index is out of range
+    """
+    if not 0 <= segment_index < passage["segment_count"]:
+        return None
+    
+    segment = load_passage_segments(passage, segment_index)[0]
+    _, text_path, _ = _passage_paths(passage["id"])
+    with open(text_path, 'rb') as f:
+        f.seek(segment["byte_start"])
+        segment["text"] = f.read(segment["byte_end"] - segment["byte_start"]).decode('utf-8')
+    
+    return segment
+
+def get_session_text():
+    """Return the current passage text from the session, or from the passage store"""
+    original_text = session.get('original_text')
+    if original_text:
+        return original_text
+    
+    passage = load_passage(session.get('passage_id'))
+    return passage["text"] if passage else ''
+
+def realtime_reading_position(tracking_data):
+    """
+    Return the words of a realtime reading and where the reader is
+    
+    Args:
+        tracking_data: Tracking data with per-word statuses (may be empty)
+        
+    Returns:
+        Tuple of (passage words, index of the first word not read yet)
+    """
+    words = (tracking_data or {}).get('words', [])
+    start_word = next((i for i, word in enumerate(words) if word.get('status') in ('pending', 'current')), len(words))
+    return [word["word"] for word in words], start_word
+
+def align_realtime_transcription(tracking_data, transcription_result):
+    """
+    Align a realtime chunk's transcription with the passage from the reader's position
+    
+    With forced alignment the transcription endpoint scores the words itself, so the page
+    does not send the transcript back to /api/process-speech-result.
+    
+    Args:
+        tracking_data: Tracking data of the reading; word statuses are updated in place
+        transcription_result: Result of transcribe_audio_realtime
+        
+    Returns:
+        Dictionary with updated_words and next_word_index to add to the response, or None
+        when not aligning (positional mode, no passage or a failed transcription)
+    """
+    if (REALTIME_ALIGNMENT != 'forced' or not (tracking_data or {}).get('words')
+            or transcription_result.get('source') == 'error'):
+        return None
+    _, start_word = realtime_reading_position(tracking_data)
+    updated_words, next_word_index = match_speech_to_words(
+        tracking_data['words'], transcription_result.get('transcription', ''), start_word,
+        transcription_result.get('word_details')
+    )
+    return {"updated_words": updated_words, "next_word_index": next_word_index}
+
+def wants_compact_response(data=None):
+    """Check whether the client asked for structured highlighting (format=compact) instead of HTML"""
+    response_format = request.args.get('format') or (data or {}).get('format') or request.form.get('format')
+    return response_format == 'compact'
+
+def get_passage_id_for_text(text):
+    """
+    Return the stored passage id for a text, storing it if needed so the client can fetch it once
+    
+    The session's passage is reused when it holds the same text; streamed passages are stored
+    under a random id and their text is not kept in the session, so the stored text is compared.
+    """
+    passage_id = session.get('passage_id')
+    if passage_id:
+        if session.get('original_text') == text:
+            return passage_id
+        passage = load_passage(passage_id)
+        if passage and passage["text"] == text:
+            return passage_id
+    return save_passage(text, session.get('passage_title'))
+
+def passage_reference(text):
+    """
+    Return where compact highlighting for a text sits in the passage store
+    
+    Runs for a segment reading are relative to that segment, so the segment index and its
+    first word are returned with the whole-passage id.
+    
+    Args:
+        text (str): Text the highlighting was computed for
+        
+    Returns:
+        dict: passage_id, plus segment and start_word for a segment reading
+    """
+    tracking_data = session.get('tracking_data') or {}
+    if tracking_data.get('segment') is not None and session.get('original_text') == text:
+        return {
+            "passage_id": tracking_data.get('passage_id'),
+            "segment": tracking_data['segment'],
+            "start_word": tracking_data.get('start_word', 0)
+        }
+    return {"passage_id": get_passage_id_for_text(text)}
+
+def get_reading_id():
+    """Return the id of the current reading session, creating one if needed"""
+    if 'reading_id' not in session:
+        session['reading_id'] = uuid.uuid4().hex
+    return session['reading_id']
+
+def summarize_word_statuses(statuses):
+    """Count word statuses, folding mispronounced/substituted into incorrect and pending into skipped"""
+    counts = {"correct": 0, "incorrect": 0, "skipped": 0}
+    for status in statuses:
+        if status in ("mispronounced", "substituted"):
+            status = "incorrect"
+        elif status not in counts:
+            status = "skipped"
+        counts[status] += 1
+    return counts
+
+# Serializes progress updates within this process when fcntl is not available
+_progress_thread_lock = threading.Lock()
+_progress_cleaned_at = 0.0
+
+@contextlib.contextmanager
+def _progress_lock(progress_dir):
+    """Hold the lock on a reading's progress files, shared by all threads and worker processes"""
+    if fcntl is None:
+        with _progress_thread_lock:
+            yield
+        return
+    with open(os.path.join(progress_dir, "totals.lock"), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def remove_stale_progress():
+    """Delete reading progress not updated for PROGRESS_MAX_AGE (checked at most hourly per process)"""
+    global _progress_cleaned_at
+    now = time.time()
+    if now - _progress_cleaned_at < 3600:
+        return
+    _progress_cleaned_at = now
+    
+    cutoff = now - PROGRESS_MAX_AGE
+    if not os.path.isdir(PROGRESS_FOLDER):
+        return
+    for passage_id in os.listdir(PROGRESS_FOLDER):
+        passage_dir = os.path.join(PROGRESS_FOLDER, passage_id)
+        try:
+            for reading_id in os.listdir(passage_dir):
+                reading_dir = os.path.join(passage_dir, reading_id)
+                if os.path.getmtime(reading_dir) < cutoff:
+                    shutil.rmtree(reading_dir, ignore_errors=True)
+            if not os.listdir(passage_dir):
+                os.rmdir(passage_dir)
+        except OSError:
+            pass  # Updated or removed by another request meanwhile
+
+def record_segment_result(passage, reading_id, segment_index, statuses):
+    """
+    Store the word statuses for one segment and update the running whole-passage totals
+    
+    Only the segment file and a small totals file are touched, so the cost does not
+    grow with the length of the passage. The update holds a lock on the reading's
+    progress, so concurrent scores for the same reading are not lost.
+    
+    Args:
+        passage (dict): Passage metadata from load_passage_meta
+        reading_id (str): Reading session id
+        segment_index (int): Segment that was read
+        statuses (list): Status of each word in the segment
+        
+    Returns:
+        dict: Whole-passage statistics
+    """
+    remove_stale_progress()  # Before makedirs, which does not refresh an old directory's mtime
+    progress_dir = os.path.join(PROGRESS_FOLDER, passage["id"], reading_id)
+    os.makedirs(progress_dir, exist_ok=True)
+    segment_path = os.path.join(progress_dir, f"segment-{segment_index}.json")
+    totals_path = os.path.join(progress_dir, "totals.json")
+    
+    counts = summarize_word_statuses(statuses)
+    
+    with _progress_lock(progress_dir):
+        totals = {"segments_scored": 0, "counts": {"correct": 0, "incorrect": 0, "skipped": 0}}
+        if os.path.exists(totals_path):
+            with open(totals_path, 'r', encoding='utf-8') as f:
+                totals = json.load(f)
+        
+        # Replace this segment's previous contribution if it is being re-read
+        if os.path.exists(segment_path):
+            with open(segment_path, 'r', encoding='utf-8') as f:
+                previous = json.load(f)["counts"]
+            for key, value in previous.items():
+                totals["counts"][key] -= value
+        else:
+            totals["segments_scored"] += 1
+        
+        for key, value in counts.items():
+            totals["counts"][key] += value
+        
+        _write_file_atomic(segment_path, json.dumps({"counts": counts, "statuses": statuses}).encode('utf-8'))
+        _write_file_atomic(totals_path, json.dumps(totals).encode('utf-8'))
+    
+    return passage_statistics(passage, totals)
+
+def passage_statistics(passage, totals):
+    """Build whole-passage statistics from running totals"""
+    counts = totals["counts"]
+    words_scored = sum(counts.values())
+    total_words = passage["word_count"]
+    
+    return {
+        "total_words": total_words,
+        "total_segments": passage["segment_count"],
+        "segments_scored": totals["segments_scored"],
+        "words_scored": words_scored,
+        "correct": counts["correct"],
+        "incorrect": counts["incorrect"],
+        "skipped": counts["skipped"],
+        "accuracy_percentage": round((counts["correct"] / words_scored) * 100, 1) if words_scored > 0 else 0,
+        "completion_percentage": round((words_scored / total_words) * 100, 1) if total_words > 0 else 0
+    }
+
+def load_passage_statistics(passage, reading_id):
+    """Return whole-passage statistics for a reading session (zeros if nothing was scored yet)"""
+    totals_path = os.path.join(PROGRESS_FOLDER, passage["id"], reading_id, "totals.json")
+    totals = {"segments_scored": 0, "counts": {"correct": 0, "incorrect": 0, "skipped": 0}}
+    if os.path.exists(totals_path):
+        with open(totals_path, 'r', encoding='utf-8') as f:
+            totals = json.load(f)
+    return passage_statistics(passage, totals)
+
+# =====================================================================
+# SEGMENTED RECORDING UPLOADS
+# =====================================================================
+
+# The recording page uploads its audio while the student reads. Whenever another
+# SPECULATIVE_SEGMENT_SECONDS of it has arrived, that segment is cut at a pause and
+# transcribed in the background, so stopping the recording only waits for the last segment.
+# Uploads live on disk (like passages), so any worker process can take the next chunk.
+RECORDING_UPLOAD_FOLDER = os.path.join(DATABASE_FOLDER, 'recording_uploads')
+SPECULATIVE_SEGMENT_SECONDS = float(os.getenv('SPECULATIVE_SEGMENT_SECONDS', 20))  # 0 = transcribe only after the recording
+SEGMENT_CUT_SEARCH_SECONDS = float(os.getenv('SEGMENT_CUT_SEARCH_SECONDS', 5))  # Cut at the quietest moment this long before the target
+SEGMENT_UNDECODED_TAIL_SECONDS = 1.0  # The end of a partial upload may not decode yet; never cut inside it
+SEGMENT_MIN_SECONDS = 0.25  # A shorter tail is merged into the previous segment's silence
+SEGMENT_TRANSCRIPTION_WORKERS = int(os.getenv('SEGMENT_TRANSCRIPTION_WORKERS', 2))  # Background segment transcriptions per worker
+SEGMENT_READING_RATE = 2.5  # Words per second assumed until a segment's predecessor is transcribed
+RECORDING_UPLOAD_MAX_AGE = int(os.getenv('RECORDING_UPLOAD_MAX_AGE', 3600))  # Abandoned uploads are removed after this
+
+_UPLOAD_ID_RE = re.compile(r'[0-9a-f]{32}')
+
+# Finishing an upload, by upload id: a repeated Stop (double click, retry), in any worker,
+# gets the first request's result instead of racing it for the upload directory
+recording_finishes = FileSingleFlight(os.path.join(DATABASE_FOLDER, 'recording_finishes'))
+
+# Thread pool for background segment transcriptions (created lazily per worker process)
+_segment_executor = None
+_segment_executor_pid = None
+
+def get_segment_executor():
+    """Return the segment transcription thread pool, creating it on first use in this process"""
+    global _segment_executor, _segment_executor_pid
+    
+    # Threads do not survive fork (e.g. gunicorn --preload); start a pool in each worker
+    if _segment_executor is None or _segment_executor_pid != os.getpid():
+        _segment_executor = ThreadPoolExecutor(max_workers=max(1, SEGMENT_TRANSCRIPTION_WORKERS),
+                                               thread_name_prefix='segment')
+        _segment_executor_pid = os.getpid()
+    
+    return _segment_executor
+
+def speculative_segments_enabled():
+    """Whether uploads are cut into segments as they arrive (needs ffmpeg to decode partial recordings)"""
+    return SPECULATIVE_SEGMENT_SECONDS > 0 and whisper_probe.get()["ffmpeg_available"]
+
+def _upload_dir(upload_id):
+    """Directory of a recording upload, rejecting ids that are not ours"""
+    if not upload_id or not _UPLOAD_ID_RE.fullmatch(upload_id):
+        raise ValueError("Invalid upload id")
+    return os.path.join(RECORDING_UPLOAD_FOLDER, upload_id)
+
+def _load_upload_manifest(upload_dir):
+    try:
+        with open(os.path.join(upload_dir, 'manifest.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise ValueError("Unknown or expired upload")
+
+def _save_upload_manifest(upload_dir, manifest):
+    _write_file_atomic(os.path.join(upload_dir, 'manifest.json'), json.dumps(manifest).encode('utf-8'))
+
+def _segment_path(upload_dir, index, extension):
+    return os.path.join(upload_dir, f"segment-{index:04d}.{extension}")
+
+def remove_stale_recording_uploads():
+    """Delete uploads that were never finished (the page was closed while recording)"""
+    cutoff = time.time() - RECORDING_UPLOAD_MAX_AGE
+    for name in os.listdir(RECORDING_UPLOAD_FOLDER):
+        path = os.path.join(RECORDING_UPLOAD_FOLDER, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass  # Finished and removed by another request meanwhile
+
+def start_recording_upload(original_text):
+    """
+    Start a segmented upload of a recording
+    
+    Args:
+        original_text: Text the student is reading
+        
+    Returns:
+        str: Upload id for the following chunks
+    """
+    os.makedirs(RECORDING_UPLOAD_FOLDER, exist_ok=True)
+    remove_stale_recording_uploads()
+    upload_id = uuid.uuid4().hex
+    upload_dir = _upload_dir(upload_id)
+    os.makedirs(upload_dir)
+    _save_upload_manifest(upload_dir, {
+        "original_text": original_text,
+        "next_chunk": 0,
+        "cuts": [0.0],  # Segment boundaries in seconds; segment i runs from cuts[i] to cuts[i + 1]
+        "created": time.time()
+    })
+    return upload_id
+
+def find_quiet_cut(wav_file, target_seconds):
+    """
+    Find where to end a segment: the quietest 100 ms shortly before target_seconds, so words are not split
+    
+    Only audio before the target is searched, so a segment can be cut as soon as it has arrived.
+    
+    Args:
+        wav_file: Open 16-bit mono wave reader (as converted by ffmpeg)
+        target_seconds: Latest cut time, from the start of wav_file
+        
+    Returns:
+        float: Cut time in seconds from the start of wav_file
+    """
+    rate = wav_file.getframerate()
+    first = max(0, int((target_seconds - SEGMENT_CUT_SEARCH_SECONDS) * rate))
+    last = min(wav_file.getnframes(), int(target_seconds * rate))
+    wav_file.setpos(first)
+    samples = array.array('h', wav_file.readframes(last - first))
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    
+    window = max(1, rate // 10)
+    starts = range(0, max(1, len(samples) - window + 1), max(1, window // 2))
+    quietest = min(starts, key=lambda start: sum(map(abs, samples[start:start + window])))
+    return (first + quietest + window // 2) / rate
+
+def write_recording_segments(upload_dir, manifest, final=False):
+    """
+    Cut the audio received since the last cut into segment WAV files
+    
+    Full segments are cut at pauses up to every SPECULATIVE_SEGMENT_SECONDS; with final,
+    the rest of the recording becomes the last segment. New cuts are added to the manifest.
+    Only the audio after the last cut is decoded, so each cut costs the same however long
+    the recording has become.
+    
+    Returns:
+        List of the new segment indices
+    """
+    cuts = manifest["cuts"]
+    offset = cuts[-1]  # Recording time of the first decoded frame
+    wav_path = convert_to_wav(os.path.join(upload_dir, 'recording.webm'), offset)
+    new_segments = []
+    try:
+        with wave.open(wav_path, 'rb') as source:
+            params = source.getparams()
+            total = offset + source.getnframes() / params.framerate
+            decoded = total if final else total - SEGMENT_UNDECODED_TAIL_SECONDS
+            
+            while decoded - cuts[-1] >= SPECULATIVE_SEGMENT_SECONDS:
+                cut = find_quiet_cut(source, cuts[-1] + SPECULATIVE_SEGMENT_SECONDS - offset)
+                cuts.append(round(offset + cut, 3))
+                new_segments.append(len(cuts) - 2)
+            if final and total - cuts[-1] >= SEGMENT_MIN_SECONDS:
+                cuts.append(round(total, 3))
+                new_segments.append(len(cuts) - 2)
+            
+            for index in new_segments:
+                first, last = (int((cuts[i] - offset) * params.framerate) for i in (index, index + 1))
+                source.setpos(first)
+                with wave.open(_segment_path(upload_dir, index, 'wav'), 'wb') as segment:
+                    segment.setparams(params)
+                    segment.writeframes(source.readframes(last - first))
+    finally:
+        remove_temp_files([wav_path])
+    return new_segments
+
+def segment_end_word(passage_words, start_word, transcription):
+    """Index of the first passage word after what a segment's transcription read, by forced alignment"""
+    spoken = [token for token, _, _ in spoken_word_timings(transcription)]
+    window_end = min(len(passage_words), start_word + len(spoken) + ALIGNMENT_WINDOW_WORDS)
+    expected = [re.sub(r'\W+', '', word.lower()) for word in passage_words[start_word:window_end]]
+    path = force_align_words(expected, spoken)
+    return start_word + path[-1][0] + 1 if path else start_word
+
+def read_segment_result(upload_dir, index):
+    """Transcription result of a segment, or None if it is not finished (or failed)"""
+    try:
+        with open(_segment_path(upload_dir, index, 'json'), 'r', encoding='utf-8') as f:
+            result = json.load(f)
+    except FileNotFoundError:
+        return None
+    return None if 'error' in result else result
+
+def estimate_segment_start_word(upload_dir, index, start_seconds):
+    """
+    First passage word of a segment: where its predecessor ended, if that is transcribed yet
+    
+    Otherwise it is extrapolated from the last transcribed segment at SEGMENT_READING_RATE.
+    It only matters for the passage prompt and the mock transcription.
+    """
+    for previous in range(index - 1, -1, -1):
+        result = read_segment_result(upload_dir, previous)
+        if result:
+            gap = start_seconds - result["end"]
+            return result["end_word"] + round(max(0.0, gap) * SEGMENT_READING_RATE)
+    return round(start_seconds * SEGMENT_READING_RATE)
+
+def transcribe_recording_segment(upload_dir, index, start, end, passage_words, start_word=None):
+    """
+    Transcribe one segment of a recording and store the result next to it
+    
+    Args:
+        upload_dir: Directory of the upload
+        index: Segment index
+        start, end: Segment position in the recording, in seconds
+        passage_words: Words of the passage being read
+        start_word: First passage word of the segment (estimated when None)
+        
+    Returns:
+        Segment result dictionary (transcription, word_details with recording timestamps,
+        source, model, start, end, start_word, end_word)
+    """
+    if start_word is None:
+        start_word = min(len(passage_words), estimate_segment_start_word(upload_dir, index, start))
+    seconds = end - start
+    result = run_asr_backend("transcribe", _segment_path(upload_dir, index, 'wav'), seconds,
+                             passage_words, start_word, "recording")
+    if result is None:
+        result = mock_realtime_transcription(seconds, passage_words, start_word)
+    
+    # Word times become positions in the whole recording
+    word_details = []
+    for detail in result['word_details'] or spread_word_timestamps(result['transcription'], seconds):
+        detail = dict(detail)
+        for key in ('timestamp', 'start', 'end'):
+            if detail.get(key) is not None:
+                detail[key] = round(detail[key] + start, 3)
+        word_details.append(detail)
+    
+    segment = {
+        "index": index,
+        "start": start,
+        "end": end,
+        "start_word": start_word,
+        "end_word": segment_end_word(passage_words, start_word, result['transcription']),
+        "transcription": result['transcription'],
+        "word_details": word_details,
+        "source": result['source'],
+        "model": result.get('model')
+    }
+    _write_file_atomic(_segment_path(upload_dir, index, 'json'), json.dumps(segment).encode('utf-8'))
+    return segment
+
+def _transcribe_segment_in_background(upload_dir, index, start, end, passage_words):
+    try:
+        transcribe_recording_segment(upload_dir, index, start, end, passage_words)
+    except Exception as e:
+        logger.error("Error transcribing segment %s of %s: %s", index, upload_dir, e)
+        try:  # Tell the request finishing the upload not to wait for this segment
+            _write_file_atomic(_segment_path(upload_dir, index, 'json'), json.dumps({"error": str(e)}).encode('utf-8'))
+        except OSError:
+            pass  # The upload was finished or removed meanwhile
+
+def append_recording_chunk(upload_id, index, audio_bytes, elapsed):
+    """
+    Append a chunk of a segmented upload and start transcribing the segments it completes
+    
+    Chunks must arrive in order; the page sends the next one after the previous is stored.
+    
+    Args:
+        upload_id: Id from start_recording_upload
+        index: Chunk number, from 0
+        audio_bytes: Chunk data (consecutive MediaRecorder chunks of one WebM stream)
+        elapsed: Seconds recorded up to the end of this chunk
+        
+    Returns:
+        int: Segments cut so far
+        
+    Raises:
+        ValueError: Unknown upload or a chunk out of order
+    """
+    upload_dir = _upload_dir(upload_id)
+    manifest = _load_upload_manifest(upload_dir)
+    if index < manifest["next_chunk"]:  # A retried chunk that was stored already
+        return len(manifest["cuts"]) - 1
+    if index > manifest["next_chunk"]:
+        raise ValueError(f"Expected chunk {manifest['next_chunk']}, got {index}")
+    
+    with time_stage("temp_write"), open(os.path.join(upload_dir, 'recording.webm'), 'ab') as f:
+        f.write(audio_bytes)
+    manifest["next_chunk"] = index + 1
+    
+    # Decode the recording only once a full segment has arrived
+    due = SPECULATIVE_SEGMENT_SECONDS + SEGMENT_UNDECODED_TAIL_SECONDS
+    if speculative_segments_enabled() and elapsed - manifest["cuts"][-1] >= due:
+        try:
+            new_segments = write_recording_segments(upload_dir, manifest)
+        except Exception as e:  # Transcribed after the recording instead
+            logger.error("Error cutting recording segments: %s", e)
+            new_segments = []
+        passage_words = manifest["original_text"].split()
+        for segment in new_segments:
+            logger.info("Transcribing segment %s (%.1f-%.1fs) while the recording continues",
+                        segment, manifest["cuts"][segment], manifest["cuts"][segment + 1])
+            get_segment_executor().submit(_transcribe_segment_in_background, upload_dir, segment,
+                                          manifest["cuts"][segment], manifest["cuts"][segment + 1], passage_words)
+    
+    _save_upload_manifest(upload_dir, manifest)
+    return len(manifest["cuts"]) - 1
+
+def wait_for_segment_result(upload_dir, index, timeout):
+    """Wait for a background segment transcription (possibly in another worker process)"""
+    deadline = time.monotonic() + timeout
+    while True:
+        result = read_segment_result(upload_dir, index)
+        if result or time.monotonic() > deadline or os.path.exists(_segment_path(upload_dir, index, 'json')):
+            return result
+        time.sleep(0.05)
+
+def finish_recording_upload(upload_id, audio_duration):
+    """
+    Finish a segmented upload: transcribe what is left and merge the segment transcriptions
+    
+    Args:
+        upload_id: Id from start_recording_upload
+        audio_duration: Recording length in seconds
+        
+    Returns:
+        Transcription result dictionary (transcription, word_details, source, model), plus
+        "segments", "speculative_segments" (those transcribed during the recording) and
+        the "original_text" of the upload
+    """
+    upload_dir = _upload_dir(upload_id)
+    manifest = _load_upload_manifest(upload_dir)
+    original_text = manifest["original_text"]
+    recording_path = os.path.join(upload_dir, 'recording.webm')
+    try:
+        speculative = len(manifest["cuts"]) - 1
+        if not speculative_segments_enabled():
+            result = dict(transcribe_recording(recording_path, original_text, audio_duration),
+                          segments=1, speculative_segments=0, original_text=original_text)
+            inc_metric("transcriptions_total", source=result['source'])
+            return result
+        
+        passage_words = original_text.split()
+        cuts = manifest["cuts"]
+        # The rest of the recording is transcribed while background segments may still be running
+        for index in write_recording_segments(upload_dir, manifest, final=True):
+            transcribe_recording_segment(upload_dir, index, cuts[index], cuts[index + 1], passage_words)
+        
+        segments = []
+        for index in range(len(cuts) - 1):
+            result = read_segment_result(upload_dir, index)
+            if result is None and index < speculative:
+                result = wait_for_segment_result(upload_dir, index, 2 * SUBPROCESS_TIMEOUT)
+            if result is None:  # A background transcription that failed
+                start_word = segments[-1]["end_word"] if segments else 0
+                result = transcribe_recording_segment(upload_dir, index, cuts[index], cuts[index + 1],
+                                                      passage_words, start_word)
+            segments.append(result)
+        
+        sources = sorted({segment["source"] for segment in segments}) or ['mock']
+        models = sorted({segment["model"] for segment in segments if segment["model"]})
+        result = {
+            'transcription': ' '.join(segment["transcription"] for segment in segments if segment["transcription"]),
+            'word_details': [detail for segment in segments for detail in segment["word_details"]],
+            'source': '+'.join(sources),
+            'model': '+'.join(models) or None,
+            'segments': len(segments),
+            'speculative_segments': speculative,
+            'original_text': original_text
+        }
+        inc_metric("transcriptions_total", source=result['source'])
+        return result
+    finally:
+        shutil.rmtree(upload_dir, ignore_errors=True)
+
+# =====================================================================
+# RESPONSE COMPRESSION AND STATIC ASSETS
+# =====================================================================
+
+# Static file fingerprints: filename -> (mtime_ns, size, content hash); only files that exist in the static folder
+_static_hashes = {}
+_static_hashes_lock = threading.Lock()
+# Compressed static files: (filename, content hash, encoding) -> bytes (LRU)
+_static_compressed = OrderedDict()
+_static_compressed_lock = threading.Lock()
+
+def static_file_path(filename):
+    """
+    Resolve a path inside the static folder
+    
+    Args:
+        filename: Path relative to the static folder, as received in the URL
+        
+    Returns:
+        Absolute path of a regular file in the static folder, or None if the name escapes
+        the folder or does not name a regular file (directories, devices, missing files)
+    """
+    path = safe_join(STATIC_FOLDER, filename)
+    if path is None or not os.path.isfile(path):
+        return None
+    return path
+
+def static_file_hash(filename):
+    """
+    Return a short content hash for a file in the static folder
+    
+    Args:
+        filename: Path relative to the static folder
+        
+    Returns:
+        12-character hex digest, or None if the file is not a regular file in the static folder
+    """
+    path = static_file_path(filename)
+    if path is None:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    
+    cached = _static_hashes.get(filename)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+    
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:12]
+    with _static_hashes_lock:
+        _static_hashes[filename] = (stat.st_mtime_ns, stat.st_size, digest)
+    return digest
+
+def choose_content_encoding():
+    """Pick the best response encoding the client accepts ('br', 'gzip' or None)"""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+def compress_body(data, encoding):
+    """
+    Compress a response body
+    
+    Args:
+        data: Raw body bytes
+        encoding: 'br' or 'gzip'
+        
+    Returns:
+        Compressed bytes
+    """
+    if encoding == 'br':
+        return brotli.compress(data, quality=min(COMPRESS_LEVEL, 11))
+    # mtime=0 keeps the output identical for identical input
+    return gzip.compress(data, compresslevel=COMPRESS_LEVEL, mtime=0)
+
+@app.url_defaults
+def add_static_fingerprint(endpoint, values):
+    """Add a content hash to static URLs so they can be cached for a long time"""
+    if endpoint == 'static' and 'filename' in values and 'v' not in values:
+        digest = static_file_hash(values['filename'])
+        if digest:
+            values['v'] = digest
+
+@app.route('/static/<path:filename>', endpoint='static')
+def send_static(filename):
+    """Serve a static file with an ETag, and long-lived caching for fingerprinted URLs"""
+    # Resolve the path before anything reads the file, so names outside the folder are never opened
+    if static_file_path(filename) is None:
+        abort(404)
+    digest = static_file_hash(filename)
+    if digest and request.args.get('v') == digest:
+        response = send_from_directory(STATIC_FOLDER, filename, etag=digest, max_age=STATIC_MAX_AGE)
+        response.cache_control.immutable = True
+    else:
+        # Unversioned or outdated URL: let the browser cache it but revalidate every time
+        response = send_from_directory(STATIC_FOLDER, filename, etag=digest or True)
+        response.cache_control.no_cache = True
+    return response
+
+@app.after_request
+def compress_response(response):
+    """Compress JSON, HTML and text responses when the client supports it"""
+    if response.mimetype not in COMPRESS_MIMETYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+    
+    if response.status_code != 200 or 'Content-Encoding' in response.headers or request.method == 'HEAD':
+        return response
+    # Streamed responses (NDJSON progress) are sent as produced; file responses are handled below
+    if response.is_streamed and not response.direct_passthrough:
+        return response
+    
+    encoding = choose_content_encoding()
+    if not encoding:
+        return response
+    
+    if response.direct_passthrough:
+        # Only static files are compressed from disk; the compressed bytes are cached per content hash
+        if request.endpoint != 'static':
+            return response
+        filename = request.view_args['filename']
+        path = static_file_path(filename)
+        digest = static_file_hash(filename)
+        if not digest or os.path.getsize(path) < COMPRESS_MIN_SIZE:
+            return response
+        key = (filename, digest, encoding)
+        with _static_compressed_lock:
+            body = _static_compressed.get(key)
+            if body is not None:
+                _static_compressed.move_to_end(key)
+        inc_metric("cache_requests_total", cache="static_compressed", result="miss" if body is None else "hit")
+        if body is None:
+            with open(path, 'rb') as f:
+                body = compress_body(f.read(), encoding)
+            with _static_compressed_lock:
+                _static_compressed[key] = body
+                while len(_static_compressed) > STATIC_COMPRESSED_CACHE_SIZE:
+                    _static_compressed.popitem(last=False)
+        response.response.close()
+        response.direct_passthrough = False
+        response.headers.pop('Accept-Ranges', None)  # Byte ranges refer to the uncompressed file
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+        body = compress_body(data, encoding)
+    
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    
+    # The compressed bytes differ from the original representation, so the ETag becomes weak
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
 
 # =====================================================================
 # API ROUTES
@@ -2033,7 +5123,7 @@ def api_grammar_test():
             "test": test
         })
     except Exception as e:
-        logger.error(f"Error generating grammar test: {e}")
+        logger.error("Error generating grammar test: %s", e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/evaluate-grammar', methods=['POST'])
@@ -2059,7 +5149,7 @@ def api_evaluate_grammar():
             "evaluation": evaluation
         })
     except Exception as e:
-        logger.error(f"Error evaluating grammar test: {e}")
+        logger.error("Error evaluating grammar test: %s", e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/get-reading-topics', methods=['GET'])
@@ -2082,7 +5172,7 @@ def api_get_reading_topics():
             "topics": topics
         })
     except Exception as e:
-        logger.error(f"Error getting reading topics: {e}")
+        logger.error("Error getting reading topics: %s", e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/transcribe-audio-realtime', methods=['POST'])
@@ -2104,26 +5194,39 @@ def api_transcribe_audio_realtime():
         if ',' in audio_data:
             audio_data = audio_data.split(',')[1]
         
-        audio_bytes = base64.b64decode(audio_data)
+        with time_stage("base64_decode"):
+            audio_bytes = base64.b64decode(audio_data)
         
         # Call transcription service
-        logger.info("Transcribing audio data of size: %d bytes", len(audio_bytes))
-        transcription_result = transcribe_audio_realtime(audio_bytes)
-        logger.info(f"Transcription completed with source: {transcription_result.get('source', 'unknown')}")
+        realtime_logger.info("Transcribing audio data of size: %d bytes", len(audio_bytes))
+        passage_words, start_word = realtime_reading_position(session.get('tracking_data'))
+        transcription_result = transcribe_audio_realtime(audio_bytes, passage_words, start_word)
+        inc_metric("transcriptions_total", source=transcription_result.get('source', 'unknown'))
+        realtime_logger.info("Transcription completed with source: %s", transcription_result.get('source', 'unknown'))
         
         # Format response for the client
         word_details = transcription_result.get('word_details', [])
         
-        logger.info(f"Sending response with {len(word_details)} word details")
+        realtime_logger.info("Sending response with %s word details", len(word_details))
         
-        return jsonify({
+        response = {
             "success": True,
             "transcription": transcription_result.get('transcription', ''),
             "word_details": word_details,
-            "source": transcription_result.get('source', 'unknown')
-        })
+            "source": transcription_result.get('source', 'unknown'),
+            "model": transcription_result.get('model')
+        }
+        
+        # Score the words against the passage here instead of in /api/process-speech-result
+        tracking_data = session.get('tracking_data')
+        alignment = align_realtime_transcription(tracking_data, transcription_result)
+        if alignment is not None:
+            session['tracking_data'] = tracking_data
+            response.update(alignment)
+        
+        return jsonify(response)
     except Exception as e:
-        logger.error(f"Error transcribing audio: {e}")
+        logger.error("Error transcribing audio: %s", e)
         logger.error(traceback.format_exc())
         return jsonify({
             "success": False,
@@ -2138,12 +5241,20 @@ def api_compare_reading():
         data = request.get_json()
         
         # Get data from request or session
-        original_text = data.get('original_text') or session.get('original_text', '')
+        original_text = data.get('original_text') or get_session_text()
         transcription_result = data.get('transcription_result') or session.get('transcription_result')
         
         if not original_text or not transcription_result:
             return jsonify({"error": "Missing text or transcription data"}), 400
         
+        if wants_compact_response(data):
+            highlighting = compare_reading_compact(original_text, transcription_result)
+            highlighting.update(passage_reference(original_text))
+            return jsonify({
+                "success": True,
+                "highlighting": highlighting
+            })
+        
         # Generate enhanced highlighted text
         highlighted_text = compare_reading_with_text_enhanced(original_text, transcription_result)
         
@@ -2152,7 +5263,7 @@ def api_compare_reading():
             "highlighted_text": highlighted_text
         })
     except Exception as e:
-        logger.error(f"Error in enhanced reading comparison: {e}")
+        logger.error("Error in enhanced reading comparison: %s", e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/analyze-comprehensive', methods=['POST'])
@@ -2162,7 +5273,7 @@ def api_analyze_comprehensive():
         data = request.get_json()
         
         # Get data from request or session
-        original_text = data.get('original_text') or session.get('original_text', '')
+        original_text = data.get('original_text') or get_session_text()
         transcription_result = data.get('transcription_result') or session.get('transcription_result')
         grade_level = int(data.get('grade_level', 5))
         grammar_evaluation = data.get('grammar_evaluation') or session.get('grammar_evaluation')
@@ -2178,19 +5289,28 @@ def api_analyze_comprehensive():
             grammar_evaluation
         )
         
-        # Generate highlighted text
-        highlighted_text = compare_reading_with_text_enhanced(original_text, transcription_result)
-        
         # Store in session
         session['comprehensive_analysis'] = analysis
         
+        if wants_compact_response(data):
+            highlighting = compare_reading_compact(original_text, transcription_result)
+            highlighting.update(passage_reference(original_text))
+            return jsonify({
+                "success": True,
+                "analysis": analysis,
+                "highlighting": highlighting
+            })
+        
+        # Generate highlighted text
+        highlighted_text = compare_reading_with_text_enhanced(original_text, transcription_result)
+        
         return jsonify({
             "success": True,
             "analysis": analysis,
             "highlighted_text": highlighted_text
         })
     except Exception as e:
-        logger.error(f"Error in comprehensive analysis: {e}")
+        logger.error("Error in comprehensive analysis: %s", e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/prepare-realtime-tracking', methods=['POST'])
@@ -2199,28 +5319,75 @@ def api_prepare_realtime_tracking():
     try:
         data = request.get_json()
         original_text = data.get('text', '')
+        passage_id = data.get('passage_id')
+        segment = None
+        
+        # Track a single segment of a stored passage instead of the whole text
+        if passage_id and data.get('segment') is not None:
+            passage = load_passage_meta(passage_id)
+            if not passage:
+                return jsonify({"error": "Passage not found"}), 404
+            segment = load_passage_segment(passage, int(data['segment']))
+            if not segment:
+                return jsonify({"error": "Segment index out of range"}), 404
+            original_text = segment["text"]
         
         if not original_text:
             return jsonify({"error": "No text provided"}), 400
         
-        logger.info(f"Preparing real-time tracking for text of length: {len(original_text)}")
+        logger.info("Preparing real-time tracking for text of length: %s", len(original_text))
         
-        # Generate tracking structure and HTML
-        tracking_data = track_spoken_words_realtime(original_text)
+        compact = wants_compact_response(data)
         
-        # Store in session
+        # Generate tracking structure and HTML (cached per passage)
+        tracking_data, passage_hash = get_tracking_data(original_text)
+        
+        # Build the response
+        if compact:
+            # All words start as pending; the client renders the text it already has
+            response = {
+                "success": True,
+                "highlighting": {
+                    "word_count": tracking_data["word_count"],
+                    "runs": encode_status_runs([word["status"] for word in tracking_data["words"]])
+                },
+                "word_count": tracking_data["word_count"]
+            }
+        else:
+            response = {
+                "success": True,
+                "tracking_html": tracking_data["html"],
+                "word_count": tracking_data["word_count"]
+            }
+        
+        if segment:
+            tracking_data.update({"passage_id": passage_id, "segment": segment["index"], "start_word": segment["start_word"]})
+            response.update({"passage_id": passage_id, "segment": segment["index"], "start_word": segment["start_word"]})
+            if compact:
+                response["highlighting"].update({"passage_id": passage_id, "segment": segment["index"], "start_word": segment["start_word"]})
+        elif compact:
+            response["highlighting"]["passage_id"] = get_passage_id_for_text(original_text)
+        
+        # The markup is identified by the passage hash; the other response fields are small
+        etag_source = {key: value for key, value in response.items() if key != "tracking_html"}
+        etag = hashlib.sha256(f"{passage_hash}:{json.dumps(etag_source, sort_keys=True)}".encode('utf-8')).hexdigest()[:32]
+        
+        tracking_data.pop("html", None)  # The session only needs word positions and statuses
         session['tracking_data'] = tracking_data
         session['original_text'] = original_text
         
-        logger.info(f"Tracking data prepared with {tracking_data['word_count']} words")
+        logger.info("Tracking data prepared with %s words", tracking_data['word_count'])
         
-        return jsonify({
-            "success": True,
-            "tracking_html": tracking_data["html"],
-            "word_count": tracking_data["word_count"]
-        })
+        # Clients that kept the previous response can revalidate with If-None-Match
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+        else:
+            response = jsonify(response)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
     except Exception as e:
-        logger.error(f"Error preparing real-time tracking: {e}")
+        logger.error("Error preparing real-time tracking: %s", e)
         logger.error(traceback.format_exc())
         return jsonify({"error": str(e)}), 500
 
@@ -2261,9 +5428,203 @@ def api_update_word_status():
             return jsonify({"error": "Word index out of range"}), 400
             
     except Exception as e:
-        logger.error(f"Error updating word status: {e}")
+        logger.error("Error updating word status: %s", e)
         return jsonify({"error": str(e)}), 500
 
+# Realtime speech is matched to the passage by "forced" alignment (a DTW over a window of expected
+# words from the reading position, using the recognizer's word timings) or "positional" matching
+# (the n-th spoken word against the n-th word from the reading position)
+REALTIME_ALIGNMENT = os.getenv('REALTIME_ALIGNMENT', 'forced')
+ALIGNMENT_WINDOW_WORDS = int(os.getenv('ALIGNMENT_WINDOW_WORDS', 40))  # Expected words beyond the speech length
+ALIGNMENT_SKIP_COST = 0.6    # An expected word that was not read
+ALIGNMENT_INSERT_COST = 0.5  # A spoken word matching no expected word (filler, re-read); cheaper than a skip
+ALIGNMENT_CORRECT_SIMILARITY = 0.8  # Spelling similarity above which a word counts as read correctly
+
+@functools.lru_cache(maxsize=65536)
+def word_similarity(expected_word, spoken_word):
+    """Spelling similarity of two lowercase words, 0 to 1"""
+    if expected_word == spoken_word:
+        return 1.0
+    return SequenceMatcher(None, expected_word, spoken_word).ratio()
+
+def spoken_word_timings(speech_text, word_details=None):
+    """
+    Split recognized speech into words the way passage words are split, with their timings
+    
+    Args:
+        speech_text: Recognized text
+        word_details: Recognizer word details with 'word', 'start' and 'end', if available
+        
+    Returns:
+        List of (lowercase word, start seconds or None, end seconds or None)
+    """
+    if word_details and all(detail.get('word') and 'start' in detail for detail in word_details):
+        return [(token, detail['start'], detail.get('end'))
+                for detail in word_details for token in re.findall(r'\w+', detail['word'].lower())]
+    return [(token, None, None) for token in re.findall(r'\w+', speech_text.lower())]
+
+def force_align_words(expected_words, spoken_words):
+    """
+    Align spoken words to the expected passage words by dynamic time warping
+    
+    Each expected word is matched to one spoken word (at a cost of its spelling
+    dissimilarity) or skipped; each spoken word is matched or inserted. The alignment
+    starts at the first expected word and may end anywhere, since the reader has not
+    reached the end of the window yet.
+    
+    Args:
+        expected_words: Lowercase passage words from the reading position
+        spoken_words: Lowercase spoken words
+        
+    Returns:
+        List of (expected index, spoken index or None when skipped) up to the last matched word
+    """
+    n, m = len(expected_words), len(spoken_words)
+    if not n or not m:
+        return []
+    
+    # cost[i][j]: best alignment of expected[:i] with spoken[:j]; move[i][j]: last step taken
+    cost = [[0.0] * (m + 1) for _ in range(n + 1)]
+    move = [[None] * (m + 1) for _ in range(n + 1)]
+    for j in range(1, m + 1):
+        cost[0][j], move[0][j] = j * ALIGNMENT_INSERT_COST, 'insert'
+    for i in range(1, n + 1):
+        cost[i][0], move[i][0] = i * ALIGNMENT_SKIP_COST, 'skip'
+        expected_word = expected_words[i - 1]
+        for j in range(1, m + 1):
+            cost[i][j], move[i][j] = min(
+                (cost[i - 1][j - 1] + 1.0 - word_similarity(expected_word, spoken_words[j - 1]), 'match'),
+                (cost[i - 1][j] + ALIGNMENT_SKIP_COST, 'skip'),
+                (cost[i][j - 1] + ALIGNMENT_INSERT_COST, 'insert'),
+                key=lambda option: option[0]
+            )
+    
+    # Free end: stop after whichever expected word explains all the speech best (the furthest on ties)
+    i, j = min(range(n + 1), key=lambda row: (cost[row][m], -row)), m
+    path = []
+    while i > 0 and j >= 0:
+        step = move[i][j]
+        if step == 'match':
+            path.append((i - 1, j - 1))
+            i, j = i - 1, j - 1
+        elif step == 'skip':
+            path.append((i - 1, None))
+            i -= 1
+        elif step == 'insert':
+            j -= 1
+        else:
+            break
+    path.reverse()
+    
+    # Words skipped after the last match were not reached yet
+    while path and path[-1][1] is None:
+        path.pop()
+    return path
+
+def force_align_speech(words, speech_text, current_word_index, word_details=None):
+    """
+    Forced-alignment counterpart of the positional matching in match_speech_to_words
+    
+    Only a window of ALIGNMENT_WINDOW_WORDS words past the speech length is aligned, so
+    the cost per chunk does not grow with the passage.
+    
+    Returns:
+        Tuple of (list of {"index", "status"[, "start", "end"]} updates, next word index)
+    """
+    spoken = spoken_word_timings(speech_text, word_details)
+    window_end = min(len(words), current_word_index + len(spoken) + ALIGNMENT_WINDOW_WORDS)
+    expected = [word["word"].lower() for word in words[current_word_index:window_end]]
+    
+    updated_words = []
+    for offset, spoken_index in force_align_words(expected, [token for token, _, _ in spoken]):
+        word_index = current_word_index + offset
+        update = {"index": word_index}
+        if spoken_index is None:
+            update["status"] = "skipped"
+        else:
+            token, start, end = spoken[spoken_index]
+            similarity = word_similarity(expected[offset], token)
+            update["status"] = "correct" if similarity > ALIGNMENT_CORRECT_SIMILARITY else "incorrect"
+            if start is not None:
+                update.update({"start": start, "end": end})
+        words[word_index]['status'] = update["status"]
+        updated_words.append(update)
+    
+    next_word_index = updated_words[-1]["index"] + 1 if updated_words else current_word_index
+    return updated_words, next_word_index
+
+@timed_stage("alignment")
+def match_speech_to_words(words, speech_text, current_word_index, word_details=None):
+    """
+    Match recognized speech against the tracked words from the current position
+    
+    Args:
+        words: Tracked word dictionaries; their 'status' is updated in place
+        speech_text: Newly recognized speech
+        current_word_index: Index of the next word the reader is expected to say
+        word_details: Recognizer word timings, reported with the updates in forced alignment
+        
+    Returns:
+        Tuple of (list of {"index", "status"} updates, next word index)
+    """
+    if REALTIME_ALIGNMENT == 'forced':
+        return force_align_speech(words, speech_text, current_word_index, word_details)
+    
+    # Process only new speech for better performance
+    # by looking at words from current_word_index forward
+    remaining_words = [w["word"].lower() for w in words[current_word_index:]]
+    speech_words = speech_text.lower().split()
+    
+    # Match spoken words with text words
+    matched_indices = []
+    statuses = []
+    words_to_update = min(len(speech_words), len(remaining_words))
+    
+    for i in range(words_to_update):
+        word_index = current_word_index + i
+        
+        # Check if the spoken word matches the expected word
+        if i < len(speech_words) and i < len(remaining_words):
+            spoken_word = speech_words[i]
+            expected_word = remaining_words[i]
+            
+            # Determine match quality
+            similarity = difflib.SequenceMatcher(None, spoken_word, expected_word).ratio()
+            
+            if similarity > 0.8:
+                status = "correct"
+            elif similarity > 0.5:
+                status = "incorrect"  # Partially incorrect
+            else:
+                status = "incorrect"  # Completely wrong
+            
+            matched_indices.append(word_index)
+            statuses.append(status)
+            
+            # Update word status in tracking data
+            if word_index < len(words):
+                words[word_index]['status'] = status
+    
+    # Find skipped words
+    if len(matched_indices) > 0 and matched_indices[-1] - matched_indices[0] + 1 > len(matched_indices):
+        # There are gaps in the matched indices, marking skipped words
+        all_indices = list(range(matched_indices[0], matched_indices[-1] + 1))
+        skipped_indices = [idx for idx in all_indices if idx not in matched_indices]
+        
+        for idx in skipped_indices:
+            if idx < len(words):
+                words[idx]['status'] = "skipped"
+                matched_indices.append(idx)
+                statuses.append("skipped")
+    
+    # Return information about updated words
+    next_word_index = max(matched_indices) + 1 if matched_indices else current_word_index
+    updated_words = [
+        {"index": idx, "status": status}
+        for idx, status in zip(matched_indices, statuses)
+    ]
+    return updated_words, next_word_index
+
 @app.route('/api/process-speech-result', methods=['POST'])
 def api_process_speech_result():
     """API endpoint to process speech recognition results and match with text"""
@@ -2272,21 +5633,22 @@ def api_process_speech_result():
         speech_text = data.get('speech_text', '')
         current_word_index = int(data.get('current_index', 0))
         
-        logger.info(f"Processing speech result: {speech_text[:50]}...")
+        realtime_logger.info("Processing speech result: %s...", speech_text[:50])
         
         if not speech_text:
             return jsonify({"error": "No speech text provided"}), 400
         
         # Get tracking data and original text from session
         tracking_data = session.get('tracking_data', {})
-        original_text = session.get('original_text', '')
+        original_text = get_session_text()
         
         if not tracking_data:
             logger.error("No tracking data found in session")
             # Create new tracking data if not present
             if original_text:
-                logger.info("Creating new tracking data from original text")
-                tracking_data = track_spoken_words_realtime(original_text)
+                realtime_logger.info("Creating new tracking data from original text")
+                tracking_data, _ = get_tracking_data(original_text)
+                tracking_data.pop("html", None)
                 session['tracking_data'] = tracking_data
             else:
                 return jsonify({"error": "No tracking data found and no original text available"}), 400
@@ -2296,321 +5658,430 @@ def api_process_speech_result():
         if not words:
             return jsonify({"error": "No word data found in tracking data"}), 400
         
-        logger.info(f"Processing speech against {len(words)} words, starting from index {current_word_index}")
+        realtime_logger.info("Processing speech against %s words, starting from index %s", len(words), current_word_index)
         
-        # Process only new speech for better performance
-        # by looking at words from current_word_index forward
-        remaining_words = [w["word"].lower() for w in words[current_word_index:]]
-        speech_words = speech_text.lower().split()
-        
-        # Match spoken words with text words
-        matched_indices = []
-        statuses = []
-        words_to_update = min(len(speech_words), len(remaining_words))
-        
-        for i in range(words_to_update):
-            word_index = current_word_index + i
-            
-            # Check if the spoken word matches the expected word
-            if i < len(speech_words) and i < len(remaining_words):
-                spoken_word = speech_words[i]
-                expected_word = remaining_words[i]
-                
-                # Determine match quality
-                similarity = difflib.SequenceMatcher(None, spoken_word, expected_word).ratio()
-                
-                if similarity > 0.8:
-                    status = "correct"
-                elif similarity > 0.5:
-                    status = "incorrect"  # Partially incorrect
-                else:
-                    status = "incorrect"  # Completely wrong
-                
-                matched_indices.append(word_index)
-                statuses.append(status)
-                
-                # Update word status in tracking data
-                if word_index < len(words):
-                    words[word_index]['status'] = status
-        
-        # Find skipped words
-        if len(matched_indices) > 0 and matched_indices[-1] - matched_indices[0] + 1 > len(matched_indices):
-            # There are gaps in the matched indices, marking skipped words
-            all_indices = list(range(matched_indices[0], matched_indices[-1] + 1))
-            skipped_indices = [idx for idx in all_indices if idx not in matched_indices]
-            
-            for idx in skipped_indices:
-                if idx < len(words):
-                    words[idx]['status'] = "skipped"
-                    matched_indices.append(idx)
-                    statuses.append("skipped")
+        updated_words, next_word_index = match_speech_to_words(words, speech_text, current_word_index)
         
         # Update session
         tracking_data['words'] = words
         session['tracking_data'] = tracking_data
         
-        # Return information about updated words
-        next_word_index = max(matched_indices) + 1 if matched_indices else current_word_index
-        
-        logger.info(f"Updated {len(matched_indices)} words, next word index: {next_word_index}")
+        realtime_logger.info("Updated %s words, next word index: %s", len(updated_words), next_word_index)
         
         return jsonify({
             "success": True,
-            "updated_words": [
-                {"index": idx, "status": status}
-                for idx, status in zip(matched_indices, statuses)
-            ],
+            "updated_words": updated_words,
             "next_word_index": next_word_index
         })
     except Exception as e:
-        logger.error(f"Error processing speech: {e}")
+        logger.error("Error processing speech: %s", e)
         logger.error(traceback.format_exc())
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/finalize-reading-tracking', methods=['POST'])
-def api_finalize_reading_tracking():
-    """API endpoint to finalize reading tracking and generate summary"""
-    try:
-        logger.info("Finalizing reading tracking")
-        
-        # Get tracking data from session
-        tracking_data = session.get('tracking_data', {})
-        original_text = session.get('original_text', '')
-        
-        if not tracking_data:
-            logger.error("No tracking data found in session")
-            return jsonify({
-                "success": False,
-                "error": "No tracking data found. Please start a new reading session."
-            }), 400
-            
-        words = tracking_data.get('words', [])
-        
-        if not words:
-            logger.error("No words found in tracking data")
-            return jsonify({
-                "success": False,
-                "error": "No word data found. Please start a new reading session."
-            }), 400
-        
-        logger.info(f"Finalizing session with {len(words)} words")
-        
-        # Calculate statistics
-        total_words = len(words)
-        status_counts = {
-            "correct": 0,
-            "incorrect": 0,
-            "skipped": 0,
-            "pending": 0  # Words not read
-        }
-        
-        # Count statuses
-        for word in words:
-            status = word.get('status', 'pending')
-            status_counts[status] = status_counts.get(status, 0) + 1
-        
-        # Mark all pending words as skipped for the final view
-        for word in words:
-            if word.get('status', '') == 'pending':
-                word['status'] = 'skipped'
-        
-        # Calculate accuracy percentage
-        accuracy_percentage = round((status_counts["correct"] / total_words) * 100, 1) if total_words > 0 else 0
-        
-        # Generate final highlighted HTML
-        html_parts = []
-        last_pos = 0
-        
-        for word in words:
-            start = word.get('start', 0)
-            end = word.get('end', 0)
-            status = word.get('status', 'skipped')
-            
-            # Add any text before this word
-            if start > last_pos:
-                html_parts.append(original_text[last_pos:start])
-            
-            # Add the word with its final status highlight
-            word_text = original_text[start:end]
-            html_parts.append(f'<span class="word {status}">{word_text}</span>')
-            
-            last_pos = end
-        
-        # Add any remaining text
-        if last_pos < len(original_text):
-            html_parts.append(original_text[last_pos:])
+@timed_stage("html_rendering")
+def render_final_reading_html(original_text, words, status_counts, accuracy_percentage,
+                              fluency_level, accuracy_level, completion_level, recommendations, user_transcript):
+    """
+    Build the HTML summary shown when a real-time reading session is finalized
+    
+    Returns:
+        str: HTML with highlighted words, statistics and the reading analysis
+    """
+    total_words = len(words)
+    
+    # Generate final highlighted HTML
+    html_parts = []
+    last_pos = 0
+    
+    for word in words:
+        start = word.get('start', 0)
+        end = word.get('end', 0)
+        status = word.get('status', 'skipped')
         
-        # Create CSS for word highlighting
-        css = """
-        <style>
-        .word { transition: background-color 0.3s ease; }
-        .correct { background-color: #c8e6c9; }
-        .incorrect { background-color: #ffcdd2; }
-        .skipped { background-color: #f5f5f5; text-decoration: line-through; }
+        # Add any text before this word
+        if start > last_pos:
+            html_parts.append(original_text[last_pos:start])
         
-        .stats-container {
-            margin: 20px 0;
-            padding: 15px;
-            background-color: #f5f5f5;
-            border-radius: 5px;
-        }
-        .stat-item {
-            display: inline-block;
-            margin-right: 20px;
-            font-size: 16px;
-        }
-        .stat-label {
-            font-weight: bold;
-        }
-        </style>
-        """
+        # Add the word with its final status highlight
+        word_text = original_text[start:end]
+        html_parts.append(f'<span class="word {status}">{word_text}</span>')
         
-        # Create stats HTML
-        stats_html = f"""
-        <div class="stats-container">
-            <div class="stat-item">
-                <span class="stat-label">Accuracy:</span>
-                <span class="stat-value">{accuracy_percentage}%</span>
+        last_pos = end
+    
+    # Add any remaining text
+    if last_pos < len(original_text):
+        html_parts.append(original_text[last_pos:])
+    
+    # Create CSS for word highlighting
+    css = """
+    <style>
+    .word { transition: background-color 0.3s ease; }
+    .correct { background-color: #c8e6c9; }
+    .incorrect { background-color: #ffcdd2; }
+    .skipped { background-color: #f5f5f5; text-decoration: line-through; }
+    
+    .stats-container {
+        margin: 20px 0;
+        padding: 15px;
+        background-color: #f5f5f5;
+        border-radius: 5px;
+    }
+    .stat-item {
+        display: inline-block;
+        margin-right: 20px;
+        font-size: 16px;
+    }
+    .stat-label {
+        font-weight: bold;
+    }
+    </style>
+    """
+    
+    # Create stats HTML
+    stats_html = f"""
+    <div class="stats-container">
+        <div class="stat-item">
+            <span class="stat-label">Accuracy:</span>
+            <span class="stat-value">{accuracy_percentage}%</span>
+        </div>
+        <div class="stat-item">
+            <span class="stat-label">Correct Words:</span>
+            <span class="stat-value">{status_counts["correct"]}/{total_words}</span>
+        </div>
+        <div class="stat-item">
+            <span class="stat-label">Incorrect Words:</span>
+            <span class="stat-value">{status_counts["incorrect"]}</span>
+        </div>
+        <div class="stat-item">
+            <span class="stat-label">Skipped Words:</span>
+            <span class="stat-value">{status_counts["skipped"] + status_counts["pending"]}</span>
+        </div>
+    </div>
+    """
+    
+    # Add analysis section
+    analysis_html = f"""
+    <div class="analysis-container mt-4">
+        <h4>Reading Analysis</h4>
+        <div class="card mb-3">
+            <div class="card-header">
+                <i class="fas fa-chart-line me-2"></i>Performance Analysis
             </div>
-            <div class="stat-item">
-                <span class="stat-label">Correct Words:</span>
-                <span class="stat-value">{status_counts["correct"]}/{total_words}</span>
+            <div class="card-body">
+                <div class="row">
+                    <div class="col-md-6">
+                        <h5>Reading Fluency</h5>
+                        <p>Based on your reading pattern and accuracy, here are some observations:</p>
+                        <ul>
+                            <li>Overall fluency: <span class="badge bg-primary">{fluency_level}</span></li>
+                            <li>Reading accuracy: <span class="badge bg-primary">{accuracy_level}</span></li>
+                            <li>Completion: <span class="badge bg-primary">{completion_level}</span></li>
+                            <li>Words read accurately: <span class="badge bg-success">{status_counts["correct"]}</span></li>
+                            <li>Words mispronounced: <span class="badge bg-danger">{status_counts["incorrect"]}</span></li>
+                        </ul>
+                    </div>
+                    <div class="col-md-6">
+                        <h5>Recommendations</h5>
+                        <p>To improve your reading skills:</p>
+                        <ul>
+                            {"".join(f"<li>{rec}</li>" for rec in recommendations)}
+                        </ul>
+                    </div>
+                </div>
             </div>
-            <div class="stat-item">
-                <span class="stat-label">Incorrect Words:</span>
-                <span class="stat-value">{status_counts["incorrect"]}</span>
+        </div>
+        
+        <div class="card mb-3">
+            <div class="card-header">
+                <i class="fas fa-comment-alt me-2"></i>What You Read
             </div>
-            <div class="stat-item">
-                <span class="stat-label">Skipped Words:</span>
-                <span class="stat-value">{status_counts["skipped"] + status_counts["pending"]}</span>
+            <div class="card-body">
+                <p>Here's what our system heard you read:</p>
+                <div class="p-3 bg-light border rounded">
+                    {user_transcript or "<em>No spoken text was detected</em>"}
+                </div>
             </div>
         </div>
-        """
-        
-        # Compute reading fluency score (0-100)
-        fluency_score = int((status_counts["correct"] / total_words) * 100) if total_words > 0 else 0
-        
-        # Create transcript from read words, showing what the user actually said
-        transcript_words = []
-        total_read = status_counts["correct"] + status_counts["incorrect"]
-        read_percentage = int((total_read / total_words) * 100) if total_words > 0 else 0
-        
-        # Reconstruct what was actually read
-        for word in words:
-            status = word.get('status', 'skipped')
-            if status in ['correct', 'incorrect']:
-                transcript_words.append(word.get('word', ''))
-        
-        user_transcript = ' '.join(transcript_words)
-        
-        # Determine reading levels
-        fluency_level = "Excellent" if fluency_score >= 90 else "Good" if fluency_score >= 75 else "Fair" if fluency_score >= 60 else "Needs Improvement"
-        completion_level = "Complete" if read_percentage >= 90 else "Mostly Complete" if read_percentage >= 75 else "Partial" if read_percentage >= 50 else "Incomplete"
-        accuracy_level = "High" if accuracy_percentage >= 90 else "Medium" if accuracy_percentage >= 70 else "Low"
-        
-        # Generate appropriate recommendations based on performance
-        recommendations = []
+    </div>
+    """
+    
+    # Combine all parts
+    return css + stats_html + ''.join(html_parts) + analysis_html
+
+def build_final_reading_response(tracking_data, original_text, compact=False, passage_id=None, reading_id=None):
+    """
+    Score a finished real-time reading session
+    
+    Pending words are marked skipped and the statistics are stored in tracking_data.
+    
+    Args:
+        tracking_data: Session tracking data with the word statuses (updated in place)
+        original_text: Text that was tracked
+        compact: Return structured highlighting instead of the HTML summary
+        passage_id: Stored passage id for compact highlighting
+        reading_id: Reading session id; segment results are only recorded when given
         
-        if accuracy_percentage < 80:
-            recommendations.append("Focus on pronouncing each word clearly and carefully.")
-            recommendations.append("Practice reading aloud for 15 minutes daily.")
+    Returns:
+        dict: Response with highlighting or final_html, statistics and passage statistics
+    """
+    words = tracking_data.get('words', [])
+    
+    # Calculate statistics
+    total_words = len(words)
+    status_counts = {
+        "correct": 0,
+        "incorrect": 0,
+        "skipped": 0,
+        "pending": 0  # Words not read
+    }
+    
+    # Count statuses
+    for word in words:
+        status = word.get('status', 'pending')
+        status_counts[status] = status_counts.get(status, 0) + 1
+    
+    # Mark all pending words as skipped for the final view
+    for word in words:
+        if word.get('status', '') == 'pending':
+            word['status'] = 'skipped'
+    
+    # Calculate accuracy percentage
+    accuracy_percentage = round((status_counts["correct"] / total_words) * 100, 1) if total_words > 0 else 0
+    
+    # Compute reading fluency score (0-100)
+    fluency_score = int((status_counts["correct"] / total_words) * 100) if total_words > 0 else 0
+    
+    # Create transcript from read words, showing what the user actually said
+    transcript_words = []
+    total_read = status_counts["correct"] + status_counts["incorrect"]
+    read_percentage = int((total_read / total_words) * 100) if total_words > 0 else 0
+    
+    # Reconstruct what was actually read
+    for word in words:
+        status = word.get('status', 'skipped')
+        if status in ['correct', 'incorrect']:
+            transcript_words.append(word.get('word', ''))
+    
+    user_transcript = ' '.join(transcript_words)
+    
+    # Determine reading levels
+    fluency_level = "Excellent" if fluency_score >= 90 else "Good" if fluency_score >= 75 else "Fair" if fluency_score >= 60 else "Needs Improvement"
+    completion_level = "Complete" if read_percentage >= 90 else "Mostly Complete" if read_percentage >= 75 else "Partial" if read_percentage >= 50 else "Incomplete"
+    accuracy_level = "High" if accuracy_percentage >= 90 else "Medium" if accuracy_percentage >= 70 else "Low"
+    
+    # Generate appropriate recommendations based on performance
+    recommendations = []
+    
+    if accuracy_percentage < 80:
+        recommendations.append("Focus on pronouncing each word clearly and carefully.")
+        recommendations.append("Practice reading aloud for 15 minutes daily.")
+    
+    if (status_counts["skipped"] + status_counts["pending"]) > total_words * 0.2:
+        recommendations.append("Work on reading all words instead of skipping difficult ones.")
+        recommendations.append("Try reading at a slightly slower pace for better accuracy.")
+    
+    if status_counts["incorrect"] > total_words * 0.1:
+        recommendations.append("Practice the mispronounced words separately.")
+        recommendations.append("Record yourself reading and listen to identify areas for improvement.")
+    
+    # Add default recommendations if none were generated
+    if not recommendations:
+        recommendations = [
+            "Continue your excellent reading practice.",
+            "Try more challenging texts to further improve your skills.",
+            "Focus on expression and intonation for even better reading."
+        ]
+    
+    if not compact:
+        final_html = render_final_reading_html(
+            original_text, words, status_counts, accuracy_percentage,
+            fluency_level, accuracy_level, completion_level, recommendations, user_transcript
+        )
+    
+    # Store the final statuses and statistics with the tracking data
+    tracking_data['words'] = words
+    tracking_data['statistics'] = {
+        "total_words": total_words,
+        "correct": status_counts["correct"],
+        "incorrect": status_counts["incorrect"],
+        "skipped": status_counts["skipped"] + status_counts["pending"],
+        "accuracy_percentage": accuracy_percentage,
+        "fluency_level": fluency_level,
+        "user_transcript": user_transcript
+    }
+    
+    logger.info("Finalized reading with accuracy: %s%%", accuracy_percentage)
+    
+    if compact:
+        response = {
+            "success": True,
+            "highlighting": {
+                "passage_id": passage_id,
+                "word_count": total_words,
+                "runs": encode_status_runs([word.get('status', 'skipped') for word in words]),
+                "segment": tracking_data.get('segment'),
+                "start_word": tracking_data.get('start_word', 0)
+            },
+            "analysis": {
+                "fluency_level": fluency_level,
+                "accuracy_level": accuracy_level,
+                "completion_level": completion_level,
+                "recommendations": recommendations
+            },
+            "statistics": tracking_data['statistics']
+        }
+    else:
+        response = {
+            "success": True,
+            "final_html": final_html,
+            "statistics": tracking_data['statistics']
+        }
+    
+    # Fold a finished segment into the whole-passage statistics
+    passage = load_passage_meta(tracking_data.get('passage_id'))
+    if passage and reading_id and tracking_data.get('segment') is not None:
+        response["passage_statistics"] = record_segment_result(
+            passage, reading_id, tracking_data['segment'], [word.get('status', 'skipped') for word in words]
+        )
+    
+    return response
+
+@app.route('/api/finalize-reading-tracking', methods=['POST'])
+def api_finalize_reading_tracking():
+    """API endpoint to finalize reading tracking and generate summary"""
+    try:
+        logger.info("Finalizing reading tracking")
         
-        if (status_counts["skipped"] + status_counts["pending"]) > total_words * 0.2:
-            recommendations.append("Work on reading all words instead of skipping difficult ones.")
-            recommendations.append("Try reading at a slightly slower pace for better accuracy.")
+        # Get tracking data from session
+        tracking_data = session.get('tracking_data', {})
+        original_text = get_session_text()
         
-        if status_counts["incorrect"] > total_words * 0.1:
-            recommendations.append("Practice the mispronounced words separately.")
-            recommendations.append("Record yourself reading and listen to identify areas for improvement.")
+        if not tracking_data:
+            logger.error("No tracking data found in session")
+            return jsonify({
+                "success": False,
+                "error": "No tracking data found. Please start a new reading session."
+            }), 400
+            
+        words = tracking_data.get('words', [])
         
-        # Add default recommendations if none were generated
-        if not recommendations:
-            recommendations = [
-                "Continue your excellent reading practice.",
-                "Try more challenging texts to further improve your skills.",
-                "Focus on expression and intonation for even better reading."
-            ]
+        if not words:
+            logger.error("No words found in tracking data")
+            return jsonify({
+                "success": False,
+                "error": "No word data found. Please start a new reading session."
+            }), 400
         
-        # Add analysis section
-        analysis_html = f"""
-        <div class="analysis-container mt-4">
-            <h4>Reading Analysis</h4>
-            <div class="card mb-3">
-                <div class="card-header">
-                    <i class="fas fa-chart-line me-2"></i>Performance Analysis
-                </div>
-                <div class="card-body">
-                    <div class="row">
-                        <div class="col-md-6">
-                            <h5>Reading Fluency</h5>
-                            <p>Based on your reading pattern and accuracy, here are some observations:</p>
-                            <ul>
-                                <li>Overall fluency: <span class="badge bg-primary">{fluency_level}</span></li>
-                                <li>Reading accuracy: <span class="badge bg-primary">{accuracy_level}</span></li>
-                                <li>Completion: <span class="badge bg-primary">{completion_level}</span></li>
-                                <li>Words read accurately: <span class="badge bg-success">{status_counts["correct"]}</span></li>
-                                <li>Words mispronounced: <span class="badge bg-danger">{status_counts["incorrect"]}</span></li>
-                            </ul>
-                        </div>
-                        <div class="col-md-6">
-                            <h5>Recommendations</h5>
-                            <p>To improve your reading skills:</p>
-                            <ul>
-                                {"".join(f"<li>{rec}</li>" for rec in recommendations)}
-                            </ul>
-                        </div>
-                    </div>
-                </div>
-            </div>
-            
-            <div class="card mb-3">
-                <div class="card-header">
-                    <i class="fas fa-comment-alt me-2"></i>What You Read
-                </div>
-                <div class="card-body">
-                    <p>Here's what our system heard you read:</p>
-                    <div class="p-3 bg-light border rounded">
-                        {user_transcript or "<em>No spoken text was detected</em>"}
-                    </div>
-                </div>
-            </div>
-        </div>
-        """
+        logger.info("Finalizing session with %s words", len(words))
         
-        # Combine all parts
-        final_html = css + stats_html + ''.join(html_parts) + analysis_html
+        compact = wants_compact_response(request.get_json(silent=True))
+        segment_mode = tracking_data.get('segment') is not None
+        passage_id = tracking_data.get('passage_id') or (get_passage_id_for_text(original_text) if compact else None)
         
-        # Update session
-        tracking_data['words'] = words
-        tracking_data['statistics'] = {
-            "total_words": total_words,
-            "correct": status_counts["correct"],
-            "incorrect": status_counts["incorrect"],
-            "skipped": status_counts["skipped"] + status_counts["pending"],
-            "accuracy_percentage": accuracy_percentage,
-            "fluency_level": fluency_level,
-            "user_transcript": user_transcript
-        }
+        response = build_final_reading_response(
+            tracking_data, original_text, compact, passage_id,
+            reading_id=get_reading_id() if segment_mode else None
+        )
         session['tracking_data'] = tracking_data
         
-        logger.info(f"Finalized reading with accuracy: {accuracy_percentage}%")
-        
-        return jsonify({
-            "success": True,
-            "final_html": final_html,
-            "statistics": tracking_data['statistics']
-        })
+        return jsonify(response)
     except Exception as e:
-        logger.error(f"Error finalizing reading tracking: {e}")
+        logger.error("Error finalizing reading tracking: %s", e)
         logger.error(traceback.format_exc())
         return jsonify({
             "success": False,
             "error": str(e)
         }), 500
 
+def remove_upload(file_path):
+    """Delete an uploaded file once its text has been extracted"""
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning("Could not remove upload %s: %s", file_path, e)
+
+def stream_extracted_pages(file_path, filename, grade_level, passage_id):
+    """
+    Generate NDJSON lines with formatted text for each page as soon as it is extracted
+    
+    The passage is stored as the formatted pages joined by blank lines, exactly as the
+    client shows them, so the scored text matches the preview. It is saved after the first
+    page and then at most every PDF_STREAM_SAVE_INTERVAL seconds, so reading can start
+    before the last page is done.
+    """
+    title = os.path.splitext(filename)[0]
+    page_texts = []
+    total_chars = 0
+    last_save = None
+    saved_pages = 0
+    
+    def ndjson(message):
+        return json.dumps(message) + "\n"
+    
+    def save_pages():
+        nonlocal last_save, saved_pages
+        text = "\n\n".join(page_texts)
+        if text.strip() and saved_pages < len(page_texts):
+            save_passage(text, title, passage_id)
+            saved_pages = len(page_texts)
+        last_save = time.monotonic()
+        return text
+    
+    try:
+        is_pdf = filename.lower().endswith('.pdf')
+        total_pages = pdf_page_count(file_path) if is_pdf else 1
+        yield ndjson({"type": "start", "passage_id": passage_id, "title": title, "total_pages": total_pages})
+        
+        if is_pdf:
+            pages = iter_pdf_pages(file_path)
+        else:  # .txt files are sent as a single page
+            with open(file_path, 'r', encoding='utf-8') as f:
+                pages = iter([(0, f.read())])
+        
+        for page_index, page_text in pages:
+            if not page_text.strip() and is_pdf:
+                page_text = ocr_pdf_pages(file_path, [page_index]).get(page_index, '')
+            
+            page_text = page_text[:PDF_MAX_CHARS - total_chars]
+            total_chars += len(page_text) + 1
+            page_texts.append(enhance_and_format_text(page_text, grade_level))
+            if last_save is None or time.monotonic() - last_save >= PDF_STREAM_SAVE_INTERVAL:
+                save_pages()
+            
+            yield ndjson({
+                "type": "page",
+                "page": page_index + 1,
+                "text": page_texts[-1],
+                "saved": saved_pages == len(page_texts)
+            })
+            
+            if total_chars >= PDF_MAX_CHARS:
+                logger.warning("Streamed PDF text capped at %s characters (page %s)", PDF_MAX_CHARS, page_index + 1)
+                break
+        
+        # Store the remaining pages
+        formatted_text = save_pages()
+        if not formatted_text.strip():
+            yield ndjson({"type": "error", "error": "Could not extract text. File may be corrupted or contains only images."})
+            return
+        
+        yield ndjson({
+            "type": "done",
+            "passage_id": passage_id,
+            "title": title,
+            "page_count": len(page_texts),
+            "word_count": len(formatted_text.split()),
+            **extraction_limits(total_pages, len(page_texts), total_chars >= PDF_MAX_CHARS)
+        })
+    except Exception as e:
+        logger.error("Error streaming extracted text: %s", e)
+        yield ndjson({"type": "error", "error": str(e)})
+
 @app.route('/api/extract-text', methods=['POST'])
 def api_extract_text():
-    """API endpoint to extract text from uploaded PDF"""
+    """API endpoint to extract text from uploaded PDF (pass stream=1 for NDJSON page-by-page output)"""
     try:
         if 'file' not in request.files:
             return jsonify({"error": "No file provided"}), 400
@@ -2622,33 +6093,58 @@ def api_extract_text():
         if not allowed_file(file.filename):
             return jsonify({"error": "File type not allowed. Please upload a PDF or text file."}), 400
         
-        # Save the file
+        # Save the file under a unique name so concurrent uploads of the same file do not collide
         filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}-{filename}")
         file.save(file_path)
         
+        grade_level = int(request.form.get('grade_level', 5))
+        
+        # Streaming mode: the session must be updated before the first byte is sent
+        if request.form.get('stream', request.args.get('stream', '')).lower() in ('1', 'true', 'yes'):
+            passage_id = new_passage_id()
+            session.pop('original_text', None)
+            session['passage_id'] = passage_id
+            session['passage_title'] = os.path.splitext(filename)[0]
+            
+            response = Response(
+                stream_with_context(stream_extracted_pages(file_path, filename, grade_level, passage_id)),
+                mimetype='application/x-ndjson',
+                headers={"X-Accel-Buffering": "no", "Cache-Control": "no-cache"}
+            )
+            # Also runs when the client goes away before the first page
+            response.call_on_close(lambda: remove_upload(file_path))
+            return response
+        
         # Extract text based on file type
-        if filename.lower().endswith('.pdf'):
-            text = extract_text_from_pdf(file_path)
-        else:  # .txt files
-            with open(file_path, 'r', encoding='utf-8') as f:
-                text = f.read()
+        limits = {}
+        try:
+            if filename.lower().endswith('.pdf'):
+                text, limits = extract_pdf(file_path)
+            else:  # .txt files
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    text = f.read()
+        finally:
+            remove_upload(file_path)
         
         # Format for better readability
-        grade_level = int(request.form.get('grade_level', 5))
         formatted_text = enhance_and_format_text(text, grade_level)
+        passage_id = save_passage(formatted_text, os.path.splitext(filename)[0])
         
         # Store in session for later use
         session['original_text'] = formatted_text
         session['passage_title'] = os.path.splitext(filename)[0]
+        session['passage_id'] = passage_id
         
         return jsonify({
             "success": True,
             "text": formatted_text,
-            "title": os.path.splitext(filename)[0]
+            "title": os.path.splitext(filename)[0],
+            "passage_id": passage_id,
+            **limits
         })
     except Exception as e:
-        logger.error(f"Error extracting text: {e}")
+        logger.error("Error extracting text: %s", e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/save-text', methods=['POST'])
@@ -2665,18 +6161,166 @@ def api_save_text():
         
         # Format text for better readability
         formatted_text = enhance_and_format_text(original_text, grade_level)
+        passage_id = save_passage(formatted_text, passage_title)
         
         # Store in session
         session['original_text'] = formatted_text
         session['passage_title'] = passage_title
+        session['passage_id'] = passage_id
         
         return jsonify({
             "success": True,
             "text": formatted_text,
-            "title": passage_title
+            "title": passage_title,
+            "passage_id": passage_id
+        })
+    except Exception as e:
+        logger.error("Error saving text: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/passages/<passage_id>', methods=['GET'])
+def api_get_passage(passage_id):
+    """API endpoint to fetch a stored passage by id"""
+    try:
+        passage = load_passage(passage_id)
+        if not passage:
+            return jsonify({"error": "Passage not found"}), 404
+        
+        response = jsonify({
+            "success": True,
+            "passage_id": passage["id"],
+            "revision": passage.get("revision"),
+            "title": passage.get("title"),
+            "text": passage["text"]
+        })
+        response.set_etag(passage_etag(passage))
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+    except Exception as e:
+        logger.error("Error loading passage: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/passages/<passage_id>/segments', methods=['GET'])
+def api_get_passage_segments(passage_id):
+    """API endpoint to list a passage's segments (paginated with offset/limit)"""
+    try:
+        passage = load_passage_meta(passage_id)
+        if not passage:
+            return jsonify({"error": "Passage not found"}), 404
+        
+        offset = max(0, int(request.args.get('offset', 0)))
+        limit = min(max(1, int(request.args.get('limit', 50))), 200)
+        segments = load_passage_segments(passage, offset, limit)
+        
+        return jsonify({
+            "success": True,
+            "passage_id": passage_id,
+            "title": passage.get("title"),
+            "word_count": passage["word_count"],
+            "total_segments": passage["segment_count"],
+            "segments": [
+                {"index": seg["index"], "start_word": seg["start_word"], "end_word": seg["end_word"]}
+                for seg in segments
+            ]
+        })
+    except Exception as e:
+        logger.error("Error listing passage segments: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/passages/<passage_id>/segments/<int:segment_index>', methods=['GET'])
+def api_get_passage_segment(passage_id, segment_index):
+    """API endpoint to fetch one segment of a passage with its tracking markup"""
+    try:
+        passage = load_passage_meta(passage_id)
+        if not passage:
+            return jsonify({"error": "Passage not found"}), 404
+        
+        segment = load_passage_segment(passage, segment_index)
+        if not segment:
+            return jsonify({"error": "Segment index out of range"}), 404
+        
+        response = {
+            "success": True,
+            "passage_id": passage_id,
+            "segment": segment_index,
+            "total_segments": passage["segment_count"],
+            "start_word": segment["start_word"],
+            "end_word": segment["end_word"],
+            "text": segment["text"],
+            "word_count": segment["end_word"] - segment["start_word"]
+        }
+        
+        # The compact client renders the spans itself from the segment text
+        compact = wants_compact_response()
+        if not compact:
+            response["tracking_html"] = get_tracking_data(segment["text"])[0]["html"]
+        
+        response = jsonify(response)
+        response.set_etag(f"{passage_etag(passage)}-{segment_index}-{'c' if compact else 'h'}")
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+    except Exception as e:
+        logger.error("Error fetching passage segment: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/passages/<passage_id>/segments/<int:segment_index>/score', methods=['POST'])
+def api_score_passage_segment(passage_id, segment_index):
+    """API endpoint to score a reading of one segment and update whole-passage statistics"""
+    try:
+        data = request.get_json()
+        word_details = data.get('word_details')
+        speech_text = data.get('speech_text', '')
+        
+        if not word_details and not speech_text:
+            return jsonify({"error": "No speech text or word details provided"}), 400
+        
+        passage = load_passage_meta(passage_id)
+        if not passage:
+            return jsonify({"error": "Passage not found"}), 404
+        
+        segment = load_passage_segment(passage, segment_index)
+        if not segment:
+            return jsonify({"error": "Segment index out of range"}), 404
+        
+        if not word_details:
+            word_details = [{"word": word} for word in _WORD_RE.findall(speech_text)]
+        
+        # Score the segment on its own, then fold it into the passage totals
+        original_words, word_status_map, stats = align_reading_with_word_details(segment["text"], word_details)
+        statuses = [word_status_map[i]["status"] for i in range(len(original_words))]
+        passage_stats = record_segment_result(passage, get_reading_id(), segment_index, statuses)
+        
+        stats["accuracy_percentage"] = int((stats["correct"] / stats["total_words"]) * 100) if stats["total_words"] > 0 else 0
+        
+        return jsonify({
+            "success": True,
+            "passage_id": passage_id,
+            "segment": segment_index,
+            "start_word": segment["start_word"],
+            "word_statuses": statuses,
+            "segment_statistics": stats,
+            "passage_statistics": passage_stats
+        })
+    except Exception as e:
+        logger.error("Error scoring passage segment: %s", e)
+        logger.error(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/passages/<passage_id>/statistics', methods=['GET'])
+def api_get_passage_statistics(passage_id):
+    """API endpoint to get whole-passage statistics for the current reading session"""
+    try:
+        passage = load_passage_meta(passage_id)
+        if not passage:
+            return jsonify({"error": "Passage not found"}), 404
+        
+        return jsonify({
+            "success": True,
+            "passage_id": passage_id,
+            "statistics": load_passage_statistics(passage, get_reading_id())
         })
     except Exception as e:
-        logger.error(f"Error saving text: {e}")
+        logger.error("Error loading passage statistics: %s", e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/transcribe-audio', methods=['POST'])
@@ -2695,198 +6339,25 @@ def api_transcribe_audio():
         grade_level = request.form.get('grade_level', '5')
         audio_duration = float(request.form.get('audio_duration', 0))
         
-        # Save temporary audio file
-        temp_dir = tempfile.mkdtemp()
-        temp_path = os.path.join(temp_dir, "recording.webm")
-        audio_file.save(temp_path)
-        
-        logger.info(f"Audio saved to temporary file: {temp_path}")
-        
-        transcribed_text = None
-        transcription_successful = False
-        word_details = []
-        
-        # Try using Whisper.cpp for transcription if available
-        if os.path.exists(WHISPER_CPP_CLI_PATH) and os.path.exists(WHISPER_CPP_MODEL_PATH):
-            try:
-                # Convert to WAV using ffmpeg (required for whisper.cpp)
-                wav_path = os.path.join(temp_dir, "recording.wav")
-                convert_cmd = ['ffmpeg', '-i', temp_path, '-ar', '16000', '-ac', '1', '-y', wav_path]
-                
-                # Execute ffmpeg with detailed logging
-                logger.info(f"Running ffmpeg command: {' '.join(convert_cmd)}")
-                convert_result = subprocess.run(convert_cmd, capture_output=True, text=True)
-                
-                if convert_result.returncode != 0:
-                    logger.error(f"ffmpeg error: {convert_result.stderr}")
-                    raise Exception(f"ffmpeg conversion failed: {convert_result.stderr}")
-                
-                logger.info(f"Audio converted successfully to {wav_path}")
-                
-                # Use whisper.cpp for transcription with word timestamp option
-                cmd = [
-                    WHISPER_CPP_CLI_PATH,
-                    '-m', WHISPER_CPP_MODEL_PATH,
-                    '-f', wav_path,
-                    '-otxt',
-                    '--output-file', os.path.join(temp_dir, "transcription.txt"),
-                    '--word-timestamps'
-                ]
-                
-                # Execute transcription command with detailed logging
-                logger.info(f"Running Whisper.cpp command: {' '.join(cmd)}")
-                result = subprocess.run(cmd, capture_output=True, text=True)
-                
-                if result.returncode != 0:
-                    logger.error(f"Whisper.cpp error: {result.stderr}")
-                    raise Exception(f"Whisper.cpp failed: {result.stderr}")
-                
-                # Read transcription from file
-                transcription_path = os.path.join(temp_dir, "transcription.txt")
-                
-                if os.path.exists(transcription_path):
-                    # Read the full transcription
-                    with open(transcription_path, 'r') as f:
-                        transcribed_text = f.read().strip()
-                    
-                    logger.info(f"Transcription read from file: {transcribed_text[:100]}...")
-                    
-                    # Split into words to create word details
-                    words = transcribed_text.split()
-                    time_per_word = audio_duration / max(1, len(words))
-                    
-                    for i, word in enumerate(words):
-                        # Generate timestamps based on position
-                        word_details.append({
-                            "word": word,
-                            "status": "correct",  # Default status, will be compared later
-                            "confidence": 0.9,    # Whisper doesn't provide per-word confidence
-                            "timestamp": i * time_per_word
-                        })
-                    
-                    logger.info(f"Generated word details for {len(words)} words")
-                    transcription_successful = True
-                else:
-                    logger.error(f"Transcription file not found at {transcription_path}")
-                    raise Exception(f"Transcription file not found: {transcription_path}")
-                
-            except Exception as e:
-                logger.error(f"Error using Whisper.cpp: {e}")
-                logger.error("Falling back to mock transcription")
-        else:
-            logger.warning("Whisper.cpp not available, using fallback")
-        
-        # FALLBACK: If Whisper.cpp failed or not available, use a simple simulation
-        if not transcription_successful:
-            logger.info("Using fallback transcription method")
-            
-            if original_text:
-                # Simulate some mistakes in the transcription for demo purposes
-                words = original_text.split()
-                result_words = []
-                word_details = []
-                
-                for i, word in enumerate(words):
-                    # Introduce some random changes
-                    rand = random.random()
-                    
-                    if rand < 0.7:  # 70% chance for correct
-                        result_words.append(word)
-                        word_details.append({
-                            "word": word,
-                            "status": "correct",
-                            "confidence": random.uniform(0.85, 0.99),
-                            "timestamp": i * 0.4  # Simulate timestamp in seconds
-                        })
-                    elif rand < 0.8:  # 10% chance to mispronounce
-                        # Simulate minor mispronunciation by changing a character
-                        if len(word) > 2:
-                            pos = random.randint(0, len(word)-1)
-                            misspelled = word[:pos] + random.choice('abcdefghijklmnopqrstuvwxyz') + word[pos+1:]
-                            result_words.append(misspelled)
-                            word_details.append({
-                                "word": misspelled,
-                                "status": "mispronounced",
-                                "intended_word": word,
-                                "confidence": random.uniform(0.6, 0.8),
-                                "timestamp": i * 0.4
-                            })
-                        else:
-                            result_words.append(word)
-                            word_details.append({
-                                "word": word,
-                                "status": "correct",
-                                "confidence": random.uniform(0.85, 0.99),
-                                "timestamp": i * 0.4
-                            })
-                    elif rand < 0.9:  # 10% chance to skip
-                        # Skip the word
-                        word_details.append({
-                            "word": None,
-                            "status": "skipped",
-                            "intended_word": word,
-                            "confidence": 0,
-                            "timestamp": i * 0.4
-                        })
-                    else:  # 10% chance to substitute
-                        # Replace with a different word
-                        substitutions = {
-                            "the": "a", "a": "the", "to": "too", "for": "four",
-                            "their": "there", "sun": "son", "bright": "light",
-                            "different": "various", "uniquely": "truly"
-                        }
-                        if word.lower() in substitutions:
-                            substitute = substitutions[word.lower()]
-                            result_words.append(substitute)
-                            word_details.append({
-                                "word": substitute,
-                                "status": "substituted",
-                                "intended_word": word,
-                                "confidence": random.uniform(0.5, 0.7),
-                                "timestamp": i * 0.4
-                            })
-                        else:
-                            # If no substitution found, treat as correct
-                            result_words.append(word)
-                            word_details.append({
-                                "word": word,
-                                "status": "correct",
-                                "confidence": random.uniform(0.85, 0.99),
-                                "timestamp": i * 0.4
-                            })
-                
-                # Join back into text, removing empty words
-                transcribed_text = ' '.join([w for w in result_words if w])
-            else:
-                transcribed_text = "No original text provided for simulation."
-            
-            logger.info(f"Fallback transcription: {transcribed_text[:100]}...")
-            transcription_successful = True
-        
-        # Clean up temp files
-        try:
-            import shutil
-            shutil.rmtree(temp_dir)
-            logger.info(f"Temporary directory removed: {temp_dir}")
-        except Exception as e:
-            logger.error(f"Error removing temp files: {e}")
+        # Identical uploads in flight (double clicks, client retries) share one transcription
+        audio_bytes = audio_file.read()
+        result, shared = recording_flights.do(recording_flight_key(audio_bytes, original_text, audio_duration),
+                                              transcribe_uploaded_recording, audio_bytes, original_text, audio_duration)
+        if shared:
+            logger.info("Shared the result of an identical transcription in progress")
+            inc_metric("transcriptions_coalesced_total")
+        transcribed_text, word_details = result['transcription'], result['word_details']
         
         # If we still don't have a transcription, return error
-        if not transcription_successful or not transcribed_text:
+        if not transcribed_text:
             return jsonify({
                 "success": False, 
                 "error": "Failed to transcribe audio with all available methods"
             }), 500
         
         # Create enhanced transcription result
-        transcription_result = {
-            "transcribed_text": transcribed_text,
-            "text": transcribed_text,  # For compatibility
-            "word_details": word_details,
-            "audio_duration": audio_duration,
-            "duration": audio_duration,  # For compatibility
-            "timestamp": time.time()
-        }
+        transcription_result = build_recording_transcription_result(transcribed_text, word_details, audio_duration,
+                                                                    result['source'], result.get('model'))
         
         # Store in session
         session['transcription_result'] = transcription_result
@@ -2900,11 +6371,76 @@ def api_transcribe_audio():
         })
         
     except Exception as e:
-        logger.error(f"Error transcribing audio: {e}")
+        logger.error("Error transcribing audio: %s", e)
         import traceback
         logger.error(traceback.format_exc())
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route('/api/recording-segments', methods=['POST'])
+def api_recording_segments():
+    """API endpoint receiving a recording in chunks while the student is still reading"""
+    try:
+        if 'audio' not in request.files:
+            return jsonify({"success": False, "error": "No audio file provided"}), 400
+        
+        upload_id = request.form.get('upload_id') or start_recording_upload(request.form.get('original_text', ''))
+        segments = append_recording_chunk(upload_id, int(request.form.get('index', 0)), request.files['audio'].read(),
+                                          float(request.form.get('elapsed', 0)))
+        
+        return jsonify({
+            "success": True,
+            "upload_id": upload_id,
+            "segments": segments
+        })
+    except ValueError as e:
+        logger.error("Rejected recording chunk: %s", e)
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        logger.error("Error storing recording chunk: %s", e)
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/recording-segments/<upload_id>/finish', methods=['POST'])
+def api_finish_recording_segments(upload_id):
+    """API endpoint transcribing a segmented recording once it has stopped (same response as /api/transcribe-audio)"""
+    try:
+        audio_duration = float(request.form.get('audio_duration', 0))
+        _upload_dir(upload_id)  # Validates the id before it names a file
+        
+        result, shared = recording_finishes.do(upload_id, finish_recording_upload, upload_id, audio_duration)
+        if shared:
+            logger.info("Shared the result of finishing upload %s in progress", upload_id)
+        original_text = result['original_text']
+        transcribed_text, word_details = result['transcription'], result['word_details']
+        if not transcribed_text:
+            return jsonify({
+                "success": False,
+                "error": "Failed to transcribe audio with all available methods"
+            }), 500
+        logger.info("Merged %s recording segments (%s transcribed while recording)",
+                    result['segments'], result['speculative_segments'])
+        
+        transcription_result = build_recording_transcription_result(transcribed_text, word_details, audio_duration,
+                                                                    result['source'], result.get('model'))
+        
+        # Store in session
+        session['transcription_result'] = transcription_result
+        session['original_text'] = original_text
+        session['spoken_text'] = transcribed_text
+        session['word_details'] = word_details
+        
+        return jsonify({
+            "success": True,
+            "transcription": transcription_result,
+            "segments": {"total": result['segments'], "speculative": result['speculative_segments']}
+        })
+    except ValueError as e:
+        logger.error("Rejected recording upload: %s", e)
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        logger.error("Error transcribing segmented recording: %s", e)
+        logger.error(traceback.format_exc())
+        return jsonify({"success": False, "error": str(e)}), 500
+
 @app.route('/api/analyze-reading', methods=['POST'])
 def api_analyze_reading():
     """API endpoint for reading analysis"""
@@ -2912,7 +6448,7 @@ def api_analyze_reading():
         data = request.get_json()
         
         # Get data from request or session
-        original_text = data.get('original_text') or session.get('original_text', '')
+        original_text = data.get('original_text') or get_session_text()
         spoken_text = data.get('spoken_text') or session.get('spoken_text', '')
         grade_level = int(data.get('grade_level', 5))
         audio_duration = data.get('audio_duration') or session.get('audio_duration')
@@ -2926,6 +6462,16 @@ def api_analyze_reading():
         # Generate highlighted text for visualization
         transcription_result = session.get('transcription_result', {})
         
+        if wants_compact_response(data):
+            session['analysis_result'] = analysis_result
+            highlighting = compare_reading_compact(original_text, transcription_result or {"transcribed_text": spoken_text})
+            highlighting.update(passage_reference(original_text))
+            return jsonify({
+                "success": True,
+                "analysis": analysis_result,
+                "highlighting": highlighting
+            })
+        
         if transcription_result and 'word_details' in transcription_result:
             # Use enhanced comparison with word details if available
             highlighted_text = compare_reading_with_word_details(original_text, transcription_result['word_details'])
@@ -2942,7 +6488,7 @@ def api_analyze_reading():
             "highlighted_text": highlighted_text
         })
     except Exception as e:
-        logger.error(f"Error analyzing reading: {e}")
+        logger.error("Error analyzing reading: %s", e)
         return jsonify({"error": str(e)}), 500
 
 # =====================================================================
@@ -2965,16 +6511,20 @@ def realtime_reading():
 
 @app.route('/api/diagnostics/whisper-status')
 def api_diagnostics_whisper_status():
-    """API endpoint to check Whisper.cpp status"""
+    """API endpoint to check Whisper.cpp status (cached; ?refresh=1 re-runs the checks)"""
     try:
-        status = check_whisper_cpp_config()
+        status = whisper_probe.get(refresh=request.args.get('refresh') == '1')
+        backend = get_asr_backend()
         
         return jsonify({
             "success": True,
-            "whisper_status": status
+            "whisper_status": status,
+            "checked_seconds_ago": whisper_probe.age(),
+            "asr_backend": {"name": ASR_BACKEND, "available": backend.available()},
+            "model_router": model_router.snapshot()
         })
     except Exception as e:
-        logger.error(f"Error checking Whisper.cpp status: {e}")
+        logger.error("Error checking Whisper.cpp status: %s", e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/diagnostics/system-info')
@@ -2982,6 +6532,7 @@ def api_diagnostics_system_info():
     """API endpoint to get system information"""
     try:
         # Get basic system info
+        whisper_status = whisper_probe.get()
         system_info = {
             "platform": platform.system(),
             "platform_version": platform.version(),
@@ -2990,11 +6541,11 @@ def api_diagnostics_system_info():
             "hostname": platform.node(),
             "upload_folder": UPLOAD_FOLDER,
             "database_folder": DATABASE_FOLDER,
-            "has_ffmpeg": bool(whisper_cpp_status.get("ffmpeg_available")),
-            "ffmpeg_path": whisper_cpp_status.get("ffmpeg_path"),
-            "whisper_available": bool(whisper_cpp_status.get("overall_status")),
-            "whisper_cli_path": whisper_cpp_status.get("cli_path"),
-            "whisper_model_path": whisper_cpp_status.get("model_path")
+            "has_ffmpeg": whisper_status["ffmpeg_available"],
+            "ffmpeg_path": whisper_status["ffmpeg_path"],
+            "whisper_available": whisper_status["overall_status"],
+            "whisper_cli_path": whisper_status["cli_path"],
+            "whisper_model_path": whisper_status["model_path"]
         }
         
         return jsonify({
@@ -3002,7 +6553,118 @@ def api_diagnostics_system_info():
             "system_info": system_info
         })
     except Exception as e:
-        logger.error(f"Error getting system info: {e}")
+        logger.error("Error getting system info: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/healthz')
+def healthz():
+    """Health check for load balancers: no template, session or subprocess work"""
+    return jsonify(health_status())
+
+def health_status():
+    """Liveness payload shared by the Flask and ASGI health checks"""
+    return {"status": "ok", "pid": os.getpid(), "uptime_seconds": round(time.perf_counter() - IMPORT_STARTED, 1)}
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint (metrics of the worker process that serves the request)"""
+    return Response(render_prometheus_metrics(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/diagnostics/metrics')
+def api_diagnostics_metrics():
+    """API endpoint with per-stage latency summaries and counters for the diagnostics page"""
+    try:
+        return jsonify({
+            "success": True,
+            "metrics": metrics_snapshot()
+        })
+    except Exception as e:
+        logger.error("Error collecting metrics: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/diagnostics/profiling', methods=['GET', 'POST'])
+def api_diagnostics_profiling():
+    """API endpoint to list buffered profiles, and (POST) to switch sampled profiling on or off"""
+    try:
+        denied = profile_access_denied()
+        if denied:
+            return denied
+        
+        if request.method == 'POST':
+            data = request.get_json() or {}
+            if 'sample_rate' in data:
+                sample_rate = float(data['sample_rate'])
+                if not 0 < sample_rate <= 1:
+                    return jsonify({"error": "sample_rate must be between 0 and 1"}), 400
+                profiling_state["sample_rate"] = sample_rate
+            if 'enabled' in data:
+                profiling_state["enabled"] = bool(data['enabled'])
+            logger.info("Profiling %s (sample rate %s)",
+                        "enabled" if profiling_state["enabled"] else "disabled", profiling_state["sample_rate"])
+        
+        profiles = [
+            {key: value for key, value in profile.items() if key != "stats"}
+            for profile in slowest_profiles()
+        ]
+        return jsonify({
+            "success": True,
+            "profiling": dict(profiling_state, pid=os.getpid(), profiles=profiles)
+        })
+    except Exception as e:
+        logger.error("Error updating profiling: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/diagnostics/profiles/<profile_id>.<fmt>')
+def api_diagnostics_profile_download(profile_id, fmt):
+    """Download a buffered profile as a pstats file or as collapsed stacks"""
+    denied = profile_access_denied()
+    if denied:
+        return denied
+    profile = find_profile(profile_id)
+    if profile is None:
+        return jsonify({"error": "Profile not found"}), 404
+    
+    if fmt == 'pstats':
+        # Same format as pstats.Stats.dump_stats(), loadable with pstats.Stats(path) or snakeviz
+        body, mimetype = marshal.dumps(profile["stats"]), 'application/octet-stream'
+    elif fmt == 'collapsed':
+        body, mimetype = collapse_profile_stats(profile["stats"]), 'text/plain'
+    else:
+        return jsonify({"error": "Format must be pstats or collapsed"}), 400
+    
+    return Response(body, mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename=profile-{profile_id}.{fmt}'
+    })
+
+@app.route('/api/diagnostics/tracemalloc', methods=['GET', 'POST', 'DELETE'])
+def api_diagnostics_tracemalloc():
+    """API endpoint for memory tracing: POST takes a snapshot diffed against the previous one, DELETE stops tracing"""
+    global _tracemalloc_baseline
+    try:
+        denied = profile_access_denied()
+        if denied:
+            return denied
+        
+        if request.method == 'POST':
+            result = tracemalloc_snapshot_diff()
+        elif request.method == 'DELETE':
+            tracemalloc.stop()
+            _tracemalloc_baseline = None
+            result = {"tracing": False}
+        else:
+            current, peak = tracemalloc.get_traced_memory()
+            result = {
+                "tracing": tracemalloc.is_tracing(),
+                "current_kb": round(current / 1024, 1),
+                "peak_kb": round(peak / 1024, 1)
+            }
+        
+        return jsonify({
+            "success": True,
+            "tracemalloc": dict(result, pid=os.getpid())
+        })
+    except Exception as e:
+        logger.error("Error with tracemalloc: %s", e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/diagnostics')
@@ -3010,6 +6672,14 @@ def diagnostics():
     """Route for the diagnostics page"""
     return render_template('diagnostics.html')
 
+# =====================================================================
+# STARTUP TIME
+# =====================================================================
+
+STARTUP_SECONDS = time.perf_counter() - IMPORT_STARTED
+inc_metric("startup_seconds", round(STARTUP_SECONDS, 3))
+logger.info("App initialized in %.3f s (pid %s)", STARTUP_SECONDS, os.getpid())
+
 # =====================================================================
 # MAIN APP ENTRY POINT
 # =====================================================================
@@ -3017,8 +6687,8 @@ def diagnostics():
 if __name__ == '__main__':
     # Print server startup information
     logger.info("Starting Flask development server")
-    logger.info(f"UPLOAD_FOLDER: {UPLOAD_FOLDER}")
-    logger.info(f"DATABASE_FOLDER: {DATABASE_FOLDER}")
+    logger.info("UPLOAD_FOLDER: %s", UPLOAD_FOLDER)
+    logger.info("DATABASE_FOLDER: %s", DATABASE_FOLDER)
     
     # Start the Flask development server
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
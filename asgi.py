@@ -0,0 +1,466 @@
+"""
+ASGI entry point for the reading assessment app.
+
+The transcription endpoints run the configured ASR backend in worker threads, so a
+single worker keeps serving other requests (and open realtime sessions) while audio is
+being transcribed. Every other route is served by the Flask app, mounted unchanged.
+
+Run with:
+    uvicorn asgi:app --host 0.0.0.0 --port 8000
+    gunicorn asgi:app -k uvicorn.workers.UvicornWorker
+"""
+import asyncio
+import base64
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.middleware.wsgi import WSGIMiddleware
+from fastapi.responses import JSONResponse
+from flask import session as flask_session
+
+from app import (
+    app as flask_app,
+    REQUEST_ID_HEADER,
+    SUBPROCESS_TIMEOUT,
+    logger,
+    realtime_logger,
+    align_realtime_transcription,
+    build_final_reading_response,
+    build_recording_transcription_result,
+    encode_status_runs,
+    get_tracking_data,
+    health_status,
+    inc_metric,
+    load_passage,
+    load_passage_meta,
+    load_passage_segment,
+    match_speech_to_words,
+    realtime_reading_position,
+    recording_flight_key,
+    recording_flights,
+    save_passage,
+    server_timing_header,
+    start_request_trace,
+    time_stage,
+    transcribe_audio_realtime,
+    transcribe_uploaded_recording,
+)
+
+# Threads that run transcriptions. Concurrent ASR runs are capped by app.TRANSCRIPTION_CONCURRENCY;
+# the threads beyond it wait for a slot here instead of filling the event loop's default pool,
+# which stays free for loading sessions and passages
+TRANSCRIPTION_THREADS = int(os.getenv('TRANSCRIPTION_THREADS', 32))
+# Audio frames a reading WebSocket may queue for transcription before it stops reading new ones
+WS_AUDIO_QUEUE_SIZE = int(os.getenv('WS_AUDIO_QUEUE_SIZE', 4))
+# Longest a "finalize" message waits for the queued audio frames to be transcribed
+WS_FINALIZE_TIMEOUT = float(os.getenv('WS_FINALIZE_TIMEOUT', SUBPROCESS_TIMEOUT))
+
+app = FastAPI(title="Enhanced Reading Assessment Tool", docs_url=None, redoc_url=None, openapi_url=None)
+
+transcription_executor = ThreadPoolExecutor(max_workers=TRANSCRIPTION_THREADS, thread_name_prefix='transcription')
+
+@app.middleware('http')
+async def trace_request(request: Request, call_next):
+    """Give every request an ID and report its stage timings, as the Flask app does"""
+    request_id = start_request_trace(request.headers.get(REQUEST_ID_HEADER))
+    # Forward the ID so routes served by the mounted Flask app log under the same one
+    header_name = REQUEST_ID_HEADER.lower().encode()
+    request.scope['headers'] = [
+        (name, value) for name, value in request.scope['headers'] if name != header_name
+    ] + [(header_name, request_id.encode())]
+    response = await call_next(request)
+    if REQUEST_ID_HEADER not in response.headers:  # Flask routes add their own
+        response.headers[REQUEST_ID_HEADER] = request_id
+        response.headers['Server-Timing'] = server_timing_header()
+    return response
+
+async def run_transcription(func, *args):
+    """Run a blocking transcription function in the transcription threads, keeping the request's context"""
+    context = contextvars.copy_context()  # Request ID and stage timings, as asyncio.to_thread does
+    return await asyncio.get_running_loop().run_in_executor(
+        transcription_executor, functools.partial(context.run, func, *args)
+    )
+
+async def transcribe_audio_realtime_async(audio_data, passage_words=None, start_word=0):
+    """Async counterpart of app.transcribe_audio_realtime: the same steps in a worker thread"""
+    return await run_transcription(transcribe_audio_realtime, audio_data, passage_words, start_word)
+
+async def transcribe_recording_async(audio_bytes, original_text, audio_duration):
+    """
+    Save and transcribe an uploaded recording in a worker thread, falling back to a simulation
+
+    An identical upload being transcribed by any worker process (app.recording_flights) is
+    waited for instead.
+
+    Returns:
+        Tuple of (transcription result dictionary, whether it was shared from another process)
+    """
+    return await run_transcription(recording_flights.do, recording_flight_key(audio_bytes, original_text, audio_duration),
+                                   transcribe_uploaded_recording, audio_bytes, original_text, audio_duration)
+
+class AsyncSingleFlight:
+    """In-process counterpart of app.FileSingleFlight for asyncio: identical calls in flight share one task"""
+
+    def __init__(self):
+        self._tasks = {}  # key -> task of the running call
+
+    async def do(self, key, func, *args):
+        """
+        Await func(*args), or the identical call already running
+
+        Returns:
+            Tuple of (result, whether it was shared from another call)
+        """
+        task = self._tasks.get(key)
+        shared = task is not None
+        if not shared:
+            task = self._tasks[key] = asyncio.ensure_future(func(*args))
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        # Shielded: one waiting client going away does not cancel the transcription for the others
+        return await asyncio.shield(task), shared
+
+# Recordings being transcribed in this worker, by recording_flight_key; waiting here rather than
+# in app.recording_flights keeps duplicates from holding transcription threads
+local_recording_flights = AsyncSingleFlight()
+
+def _flask_request_context(connection):
+    """Build a Flask request context carrying the cookies of an ASGI request or WebSocket"""
+    base_url = str(connection.base_url)
+    if base_url.startswith('ws'):  # ws:// and wss:// map to http:// and https://
+        base_url = 'http' + base_url[2:]
+    return flask_app.test_request_context(
+        connection.url.path,
+        base_url=base_url,
+        headers={'Cookie': connection.headers.get('cookie', '')}
+    )
+
+def load_flask_session(connection):
+    """Return a copy of the Flask cookie session of an ASGI request or WebSocket"""
+    with _flask_request_context(connection):
+        return dict(flask_session)
+
+def flask_session_cookies(request, values):
+    """
+    Store values in the Flask cookie session of an ASGI request
+
+    Args:
+        request: Incoming Starlette request (its cookie holds the current session)
+        values: Session keys to set
+
+    Returns:
+        List of Set-Cookie header values to send back
+    """
+    with _flask_request_context(request):
+        flask_session.update(values)
+        response = flask_app.response_class()
+        flask_app.session_interface.save_session(flask_app, flask_session._get_current_object(), response)
+        return response.headers.getlist('Set-Cookie')
+
+@app.get('/healthz')
+async def healthz():
+    """Health check answered on the event loop, without going through the Flask thread pool"""
+    return health_status()
+
+@app.post('/api/transcribe-audio-realtime')
+async def api_transcribe_audio_realtime(request: Request):
+    """API endpoint to transcribe audio in real-time for reading assessment"""
+    try:
+        audio_data = ''
+        if request.headers.get('content-type', '').startswith('application/json'):
+            data = await request.json()
+            audio_data = data.get('audio_data', '')
+        else:
+            form = await request.form()
+            audio_data = form.get('audio_data', '')
+
+        if not audio_data:
+            return JSONResponse({"error": "No audio data provided"}, status_code=400)
+
+        # Extract actual base64 data (remove prefix if present)
+        if ',' in audio_data:
+            audio_data = audio_data.split(',')[1]
+
+        with time_stage("base64_decode"):
+            audio_bytes = base64.b64decode(audio_data)
+
+        realtime_logger.info("Transcribing audio data of size: %s bytes", len(audio_bytes))
+        tracking_data = load_flask_session(request).get('tracking_data')
+        passage_words, start_word = realtime_reading_position(tracking_data)
+        transcription_result = await transcribe_audio_realtime_async(audio_bytes, passage_words, start_word)
+        inc_metric("transcriptions_total", source=transcription_result.get('source', 'unknown'))
+        realtime_logger.info("Transcription completed with source: %s", transcription_result.get('source', 'unknown'))
+
+        content = {
+            "success": True,
+            "transcription": transcription_result.get('transcription', ''),
+            "word_details": transcription_result.get('word_details', []),
+            "source": transcription_result.get('source', 'unknown'),
+            "model": transcription_result.get('model')
+        }
+
+        # Score the words against the passage here instead of in /api/process-speech-result
+        alignment = align_realtime_transcription(tracking_data, transcription_result)
+        if alignment is None:
+            return JSONResponse(content)
+        content.update(alignment)
+        response = JSONResponse(content)
+        for cookie in flask_session_cookies(request, {'tracking_data': tracking_data}):
+            response.headers.append('set-cookie', cookie)
+        return response
+    except Exception as e:
+        logger.error("Error transcribing audio: %s", e)
+        logger.error(traceback.format_exc())
+        return JSONResponse({
+            "success": False,
+            "error": str(e),
+            "use_browser_recognition": True
+        }, status_code=500)
+
+@app.post('/api/transcribe-audio')
+async def api_transcribe_audio(request: Request):
+    """API endpoint to transcribe audio recording"""
+    try:
+        form = await request.form()
+        audio_file = form.get('audio')
+        if audio_file is None or isinstance(audio_file, str):
+            logger.error("No audio file in request")
+            return JSONResponse({"success": False, "error": "No audio file provided"}, status_code=400)
+
+        original_text = form.get('original_text', '')
+        audio_duration = float(form.get('audio_duration', 0))
+
+        # Identical uploads in flight (double clicks, client retries) share one transcription
+        audio_bytes = await audio_file.read()
+        (result, shared_by_process), shared = await local_recording_flights.do(
+            recording_flight_key(audio_bytes, original_text, audio_duration),
+            transcribe_recording_async, audio_bytes, original_text, audio_duration
+        )
+        if shared or shared_by_process:
+            logger.info("Shared the result of an identical transcription in progress")
+            inc_metric("transcriptions_coalesced_total")
+        transcribed_text, word_details = result['transcription'], result['word_details']
+        if not transcribed_text:
+            return JSONResponse({
+                "success": False,
+                "error": "Failed to transcribe audio with all available methods"
+            }, status_code=500)
+
+        transcription_result = build_recording_transcription_result(transcribed_text, word_details, audio_duration,
+                                                                    result['source'], result.get('model'))
+
+        response = JSONResponse({"success": True, "transcription": transcription_result})
+        for cookie in flask_session_cookies(request, {
+            'transcription_result': transcription_result,
+            'original_text': original_text,
+            'spoken_text': transcribed_text,
+            'word_details': word_details
+        }):
+            response.headers.append('set-cookie', cookie)
+        return response
+    except Exception as e:
+        logger.error("Error transcribing audio: %s", e)
+        logger.error(traceback.format_exc())
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+
+# =====================================================================
+# REALTIME READING WEBSOCKET
+# =====================================================================
+
+def start_reading_state(session_data, message):
+    """
+    Build the in-memory state of a WebSocket reading session from its "start" message
+
+    Mirrors /api/prepare-realtime-tracking: the text comes from the message, a stored
+    passage segment, or the Flask session.
+
+    Args:
+        session_data: Copy of the Flask session sent with the WebSocket handshake
+        message: Start message ({"text"} or {"passage_id", "segment"})
+
+    Returns:
+        Tuple of (state dict, "ready" message for the client)
+    """
+    passage_id = message.get('passage_id')
+    original_text = message.get('text', '')
+    segment = None
+
+    if passage_id and message.get('segment') is not None:
+        passage = load_passage_meta(passage_id)
+        if not passage:
+            raise ValueError("Passage not found")
+        segment = load_passage_segment(passage, int(message['segment']))
+        if not segment:
+            raise ValueError("Segment index out of range")
+        original_text = segment["text"]
+    elif not original_text:
+        original_text = session_data.get('original_text', '')
+        if not original_text:
+            passage = load_passage(session_data.get('passage_id'))
+            original_text = passage["text"] if passage else ''
+        passage_id = session_data.get('passage_id') if original_text else None
+
+    if not original_text:
+        raise ValueError("No text provided")
+
+    if not segment and not (passage_id and session_data.get('original_text') == original_text):
+        passage_id = save_passage(original_text, session_data.get('passage_title'))
+
+    tracking_data, _ = get_tracking_data(original_text)
+    tracking_data.pop("html", None)
+
+    ready = {
+        "type": "ready",
+        "word_count": tracking_data["word_count"],
+        "highlighting": {
+            "passage_id": passage_id,
+            "word_count": tracking_data["word_count"],
+            "runs": encode_status_runs([word["status"] for word in tracking_data["words"]])
+        }
+    }
+    if segment:
+        tracking_data.update({"passage_id": passage_id, "segment": segment["index"], "start_word": segment["start_word"]})
+        ready.update({"passage_id": passage_id, "segment": segment["index"], "start_word": segment["start_word"]})
+
+    state = {
+        "tracking_data": tracking_data,
+        "original_text": original_text,
+        "passage_id": passage_id,
+        "reading_id": session_data.get('reading_id') or uuid.uuid4().hex,
+        "current_index": 0
+    }
+    return state, ready
+
+def apply_speech_to_state(state, speech_text, current_index=None, word_details=None):
+    """Match speech against the session's words and return a "words" delta message"""
+    if current_index is not None:
+        state["current_index"] = int(current_index)
+    updated_words, next_word_index = match_speech_to_words(
+        state["tracking_data"]["words"], speech_text, state["current_index"], word_details
+    )
+    state["current_index"] = next_word_index
+    return {"type": "words", "updated_words": updated_words, "next_word_index": next_word_index}
+
+@app.websocket('/ws/reading')
+async def reading_websocket(websocket: WebSocket):
+    """
+    Realtime reading session over one WebSocket
+
+    Upstream: JSON "start", "speech_result" and "finalize" messages, and binary audio
+    frames (one recorded chunk each). Downstream: "ready", "words" (status deltas),
+    "final" and "error" messages. The alignment state stays in memory for the life of
+    the connection instead of round-tripping through the cookie session.
+    """
+    start_request_trace(websocket.headers.get(REQUEST_ID_HEADER))
+    await websocket.accept()
+    session_data = await asyncio.to_thread(load_flask_session, websocket)
+    state = None
+    audio_queue = asyncio.Queue(maxsize=WS_AUDIO_QUEUE_SIZE)
+
+    async def transcribe_frames():
+        # Chunks are transcribed one at a time so their words are matched in reading order
+        while True:
+            audio_bytes = await audio_queue.get()
+            inc_metric("transcription_queue_depth", -1)
+            try:
+                result = await transcribe_audio_realtime_async(
+                    audio_bytes, *realtime_reading_position(state["tracking_data"])
+                )
+                inc_metric("transcriptions_total", source=result.get('source', 'unknown'))
+                transcript = result.get('transcription', '')
+                if transcript.strip():
+                    delta = apply_speech_to_state(state, transcript, word_details=result.get('word_details'))
+                else:
+                    delta = {"type": "words", "updated_words": [], "next_word_index": state["current_index"]}
+                delta.update({"transcription": transcript, "source": result.get('source', 'unknown'),
+                              "model": result.get('model')})
+                await websocket.send_json(delta)
+            except WebSocketDisconnect:
+                return
+            except Exception as e:
+                logger.error("Error transcribing WebSocket audio: %s", e)
+                try:
+                    await websocket.send_json({"type": "error", "error": str(e)})
+                except Exception:
+                    return  # The connection is gone
+            finally:
+                audio_queue.task_done()
+
+    async def stop_transcriber():
+        # Frames left in the queue will not be transcribed: take them out of the queue-depth gauge
+        transcriber.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await transcriber
+        while not audio_queue.empty():
+            audio_queue.get_nowait()
+            audio_queue.task_done()
+            inc_metric("transcription_queue_depth", -1)
+
+    async def wait_for_queued_frames():
+        # Returns once the queue is transcribed, or the transcriber stopped, or the timeout passed
+        queue_done = asyncio.ensure_future(audio_queue.join())
+        await asyncio.wait({queue_done, transcriber}, timeout=WS_FINALIZE_TIMEOUT,
+                           return_when=asyncio.FIRST_COMPLETED)
+        if not queue_done.done():
+            queue_done.cancel()
+            logger.warning("Finalizing a reading with %s audio frames not transcribed", audio_queue.qsize())
+            await stop_transcriber()
+
+    transcriber = asyncio.create_task(transcribe_frames())
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+
+            try:
+                if message.get("bytes") is not None:
+                    if state is None:
+                        raise ValueError("Send a start message before audio")
+                    if transcriber.done():
+                        raise ValueError("Audio transcription has stopped for this session")
+                    await audio_queue.put(message["bytes"])
+                    inc_metric("transcription_queue_depth", 1)
+                    continue
+
+                data = json.loads(message.get("text") or '{}')
+                kind = data.get('type')
+
+                if kind == 'start':
+                    state, ready = await asyncio.to_thread(start_reading_state, session_data, data)
+                    await websocket.send_json(ready)
+                elif state is None:
+                    raise ValueError("Send a start message first")
+                elif kind == 'speech_result':
+                    if data.get('speech_text'):
+                        await websocket.send_json(apply_speech_to_state(state, data['speech_text'], data.get('current_index')))
+                elif kind == 'finalize':
+                    await wait_for_queued_frames()  # Score the chunks that are still being transcribed
+                    response = await asyncio.to_thread(
+                        build_final_reading_response, state["tracking_data"], state["original_text"],
+                        data.get('format') == 'compact', state["passage_id"], state["reading_id"]
+                    )
+                    await websocket.send_json({"type": "final", **response})
+                else:
+                    raise ValueError(f"Unknown message type: {kind}")
+            except (ValueError, json.JSONDecodeError) as e:
+                await websocket.send_json({"type": "error", "error": str(e)})
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                logger.error("Error in reading WebSocket: %s", e)
+                logger.error(traceback.format_exc())
+                await websocket.send_json({"type": "error", "error": str(e)})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await stop_transcriber()
+
+# Everything else (pages, static files, analysis and tracking APIs) is served by Flask
+app.mount('/', WSGIMiddleware(flask_app))
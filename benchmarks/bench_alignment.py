@@ -0,0 +1,184 @@
+"""
+Benchmark the alignment and scoring functions on synthetic readings
+
+Generates passages of 50 to 50,000 words and a simulated reading of each with
+controlled rates of skipped, substituted, mispronounced and inserted words and
+re-read phrases, then times the scoring functions and the process-speech-result
+endpoint. Results are written as JSON; pass an earlier file with --compare to see
+the change between commits.
+
+Usage:
+    python benchmarks/bench_alignment.py [--sizes 50,500,5000,50000] [--repeat 5]
+        [--budget 10] [--seed 0] [--skip 0.05 ...] [--output results.json] [--compare old.json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import app
+from reading_fixtures import DEFAULT_RATES, make_passage, simulate_reading
+
+SPEECH_CHUNK_WORDS = 12  # Words per recognized speech result, as sent by the realtime page
+
+def bench_calculate_reading_accuracy(case):
+    return lambda: app.calculate_reading_accuracy(case["passage"], case["spoken"])
+
+def bench_compare_reading_with_text(case):
+    return lambda: app.compare_reading_with_text(case["passage"], case["spoken"])
+
+def bench_compare_reading_with_text_enhanced(case):
+    return lambda: app.compare_reading_with_text_enhanced(case["passage"], case["transcription"])
+
+def bench_compare_reading_with_word_details(case):
+    return lambda: app.compare_reading_with_word_details(case["passage"], case["details"])
+
+def bench_analyze_reading_comprehensive(case):
+    return lambda: app.analyze_reading_comprehensive(case["passage"], case["transcription"], 5)
+
+def bench_api_process_speech_result(case):
+    """One speech result from the middle of the reading, including the session round trip"""
+    client = app.app.test_client()
+    response = client.post('/api/prepare-realtime-tracking', json={"text": case["passage"]})
+    if response.status_code != 200:
+        raise RuntimeError(f"prepare-realtime-tracking failed: {response.status_code}")
+    
+    spoken_words = case["spoken"].split()
+    middle = len(spoken_words) // 2
+    payload = {
+        "speech_text": ' '.join(spoken_words[middle:middle + SPEECH_CHUNK_WORDS]),
+        "current_index": case["word_count"] // 2
+    }
+    
+    def run():
+        response = client.post('/api/process-speech-result', json=payload)
+        if response.status_code != 200:
+            raise RuntimeError(f"process-speech-result failed: {response.status_code}")
+    return run
+
+BENCHMARKS = {
+    "calculate_reading_accuracy": bench_calculate_reading_accuracy,
+    "compare_reading_with_text": bench_compare_reading_with_text,
+    "compare_reading_with_text_enhanced": bench_compare_reading_with_text_enhanced,
+    "compare_reading_with_word_details": bench_compare_reading_with_word_details,
+    "analyze_reading_comprehensive": bench_analyze_reading_comprehensive,
+    "api_process_speech_result": bench_api_process_speech_result,
+}
+
+def make_case(word_count, rates, seed):
+    passage = make_passage(word_count, seed=seed)
+    spoken, details = simulate_reading(passage, rates, seed=seed)
+    duration = details[-1]["timestamp"] + 0.5 if details else 0
+    return {
+        "word_count": word_count,
+        "passage": passage,
+        "spoken": spoken,
+        "details": details,
+        "transcription": app.build_recording_transcription_result(spoken, details, duration)
+    }
+
+def time_runs(func, repeat, budget):
+    """Run `func` up to `repeat` times, stopping early once `budget` seconds are spent"""
+    timings = []
+    while len(timings) < repeat and sum(timings) < budget:
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_comparison(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(r["function"], r["words"]): r["median_ms"] for r in baseline["results"] if r["runs"]}
+    print(f"\ncompared with {baseline_path} ({baseline['meta'].get('commit')}):")
+    for result in results:
+        before = previous.get((result["function"], result["words"]))
+        if before and result["runs"]:
+            print(f"  {result['function']:>36} {result['words']:>6} words: "
+                  f"{before:10.2f} -> {result['median_ms']:10.2f} ms ({before / result['median_ms']:.2f}x)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='50,500,5000,50000', help="passage sizes in words")
+    parser.add_argument('--functions', default=','.join(BENCHMARKS), help="functions to time")
+    parser.add_argument('--repeat', type=int, default=5, help="runs per function and size")
+    parser.add_argument('--budget', type=float, default=10, help="stop repeating after this many seconds per case")
+    parser.add_argument('--seed', type=int, default=0)
+    for name, rate in DEFAULT_RATES.items():
+        parser.add_argument(f'--{name}', type=float, default=rate, help=f"per-word {name} rate (default {rate})")
+    parser.add_argument('--output', help="JSON results file (default: alignment-<commit>.json)")
+    parser.add_argument('--compare', help="earlier JSON results to compare against")
+    args = parser.parse_args()
+    
+    logging.disable(logging.INFO)  # The app logs every comparison at INFO
+    warnings.filterwarnings('ignore', message="The 'session' cookie is too large")
+    rates = {name: getattr(args, name) for name in DEFAULT_RATES}
+    commit = git_commit()
+    
+    results = []
+    previous = {}  # function -> (words, fastest run in seconds) at the last size
+    for word_count in sorted(int(size) for size in args.sizes.split(',')):
+        case = make_case(word_count, rates, args.seed)
+        for name in args.functions.split(','):
+            # Assume quadratic growth and skip sizes where a single run would blow the budget
+            if name in previous:
+                last_words, last_time = previous[name]
+                predicted = last_time * (word_count / last_words) ** 2
+                if predicted > args.budget:
+                    results.append({"function": name, "words": word_count, "runs": 0,
+                                    "skipped": f"predicted {predicted:.0f}s per run"})
+                    print(f"{name:>36} {word_count:>6} words: skipped (predicted {predicted:.0f}s per run)")
+                    continue
+            
+            timings = time_runs(BENCHMARKS[name](case), args.repeat, args.budget)
+            previous[name] = (word_count, min(timings))
+            result = {
+                "function": name,
+                "words": word_count,
+                "runs": len(timings),
+                "median_ms": round(statistics.median(timings) * 1000, 3),
+                "mean_ms": round(statistics.mean(timings) * 1000, 3),
+                "min_ms": round(min(timings) * 1000, 3),
+                "max_ms": round(max(timings) * 1000, 3)
+            }
+            results.append(result)
+            print(f"{name:>36} {word_count:>6} words: median {result['median_ms']:10.2f} ms  "
+                  f"min {result['min_ms']:10.2f} ms  ({result['runs']} runs)")
+    
+    output = args.output or f"alignment-{commit or 'worktree'}.json"
+    with open(output, 'w') as f:
+        json.dump({
+            "meta": {
+                "commit": commit,
+                "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "seed": args.seed,
+                "rates": rates
+            },
+            "results": results
+        }, f, indent=2)
+    print(f"results written to {output}")
+    
+    if args.compare:
+        print_comparison(results, args.compare)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Benchmark the OCR fallback on a generated image-only PDF
+
+Runs extract_text_from_pdf twice on the same scanned document: the first run
+rasterizes and OCRs every page in the process pool, the second is served from
+the per-page OCR cache. Requires poppler (pdftoppm) and tesseract.
+
+Usage:
+    python benchmarks/bench_ocr.py [--pages 10]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+from pdf_fixtures import write_image_pdf
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=10)
+    args = parser.parse_args()
+    
+    if not app.ocr_available():
+        sys.exit("OCR is not available: install poppler and tesseract (and pdf2image/pytesseract)")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        app.OCR_CACHE_FOLDER = os.path.join(tmp, 'ocr_cache')
+        pdf_path = write_image_pdf(os.path.join(tmp, 'scanned.pdf'), args.pages)
+        
+        for label in ('cold', 'cached'):
+            start = time.perf_counter()
+            text = app.extract_text_from_pdf(pdf_path)
+            elapsed = time.perf_counter() - start
+            print(f"{label:>7}: {elapsed:.3f}s for {args.pages} pages, {len(text.split())} words, "
+                  f"dpi<={app.OCR_DPI} workers={app.PDF_EXTRACT_WORKERS}")
+        
+        shutil.rmtree(app.OCR_CACHE_FOLDER, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
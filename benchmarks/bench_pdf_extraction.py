@@ -0,0 +1,64 @@
+"""
+Benchmark PDF text extraction on 10, 100 and 500-page documents
+
+Compares the old single-process loop (string concatenation per page) with
+extract_text_from_pdf, which spreads page ranges over the process pool.
+
+Usage:
+    python benchmarks/bench_pdf_extraction.py [--repeat 3]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import PyPDF2
+import app
+from pdf_fixtures import write_text_pdf
+
+PAGE_COUNTS = [10, 100, 500]
+
+def legacy_extract(pdf_path):
+    """The original sequential extraction loop"""
+    with open(pdf_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        text = ""
+        for page in reader.pages:
+            text += page.extract_text() + "\n"
+    return text
+
+def best_of(func, repeat):
+    """Return the fastest wall-clock time of `repeat` runs"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    
+    # Warm up the pool so its start-up cost is not charged to the first size
+    app.get_process_pool()
+    
+    print(f"workers={app.PDF_EXTRACT_WORKERS} pages_per_task={app.PDF_PAGES_PER_TASK}")
+    print(f"{'pages':>6} {'legacy_s':>10} {'pooled_s':>10} {'speedup':>8}")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        for page_count in PAGE_COUNTS:
+            pdf_path = write_text_pdf(os.path.join(tmp, f"bench_{page_count}.pdf"), page_count)
+            
+            legacy = best_of(lambda: legacy_extract(pdf_path), args.repeat)
+            pooled = best_of(lambda: app.extract_text_from_pdf(pdf_path, max_pages=page_count, max_chars=10 ** 9), args.repeat)
+            
+            print(f"{page_count:>6} {legacy:>10.3f} {pooled:>10.3f} {legacy / pooled:>7.2f}x")
+
+if __name__ == '__main__':
+    main()
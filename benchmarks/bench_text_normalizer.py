@@ -0,0 +1,139 @@
+"""
+Benchmark enhance_and_format_text on a multi-megabyte text
+
+Times the compiled single-pass normalizer against the original chained
+replace/re.sub implementation (kept below for comparison) and checks that
+both produce byte-for-byte identical output.
+
+Usage:
+    python benchmarks/bench_text_normalizer.py [--size-mb 4] [--repeat 5]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+
+WORDS = (
+    "the quick brown fox jumps over lazy dog reading practice helps students "
+    "learn new words every day teacher asked class to read passage aloud"
+).split()
+ARTIFACTS = ['â€™', 'â€œ', 'â€', 'â€¢', 'Â©', '&amp;', '&lt;', '&amp;lt;', '\u00a0']
+
+def legacy_enhance_and_format_text(text, grade_level=None):
+    """
+    Original chained implementation of enhance_and_format_text, kept as the reference
+    
+    Args:
+        text (str): Raw text to format
+        grade_level (int, optional): Student grade level
+    
+    Returns:
+        str: Formatted text
+    """
+    if not text or len(text.strip()) < 10:
+        return text
+    
+    # Normalize line breaks and whitespace
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    text = re.sub(r'\n{3,}', '\n\n', text)  # Normalize multiple line breaks
+    
+    # Handle encoding issues and special characters
+    char_replacements = {
+        'â€™': "'", 'â€˜': "'", 'â€œ': '"', 'â€': '"',
+        'â€"': '–', 'â€"': '—', 'â€¢': '•', 'â€¦': '…',
+        'Â©': '©', 'Â®': '®', 'â„¢': '™', 'Â°': '°',
+        '&amp;': '&', '&lt;': '<', '&gt;': '>', '\u00a0': ' ',
+    }
+    for old, new in char_replacements.items():
+        text = text.replace(old, new)
+    
+    # Remove PDF artifacts (page numbers, headers/footers)
+    text = re.sub(r'\n\s*\d+\s*\n', '\n', text)  # Standalone page numbers
+    text = re.sub(r'\n\s*Page\s+\d+(\s+of\s+\d+)?\s*\n', '\n', text, flags=re.IGNORECASE)  # Page X [of Y]
+    
+    # Handle hyphenation across lines
+    text = re.sub(r'(\w)-\n(\s*[a-z])', r'\1\2', text)
+    
+    # Split text into paragraphs
+    paragraphs = text.split('\n\n')
+    formatted_paragraphs = []
+    
+    for paragraph in paragraphs:
+        if paragraph.strip():
+            # Check if this looks like a heading
+            if re.match(r'^[A-Z0-9\s]{5,}$', paragraph.strip()):
+                formatted_paragraphs.append(f"## {paragraph.strip()}")
+            else:
+                formatted_paragraphs.append(paragraph.strip())
+    
+    # Join paragraphs with proper spacing
+    formatted_text = '\n\n'.join(formatted_paragraphs)
+    
+    return formatted_text
+
+def make_pdf_like_text(size_chars, seed=0):
+    """Generate text with PDF extraction artifacts: page numbers, headers, hyphenation, mojibake"""
+    rng = random.Random(seed)
+    lines = []
+    total = 0
+    page = 1
+    while total < size_chars:
+        roll = rng.random()
+        if roll < 0.02:
+            line = f"\n{page}\n"
+            page += 1
+        elif roll < 0.03:
+            line = f"Page {page} of 900"
+        elif roll < 0.04:
+            line = f"CHAPTER {page}"
+        elif roll < 0.10:
+            line = ""
+        else:
+            words = [rng.choice(WORDS) for _ in range(rng.randint(6, 14))]
+            if rng.random() < 0.1:
+                words.insert(3, rng.choice(ARTIFACTS))
+            line = ' '.join(words)
+            if rng.random() < 0.08:
+                line += " continu-"
+        separator = "\r\n" if rng.random() < 0.05 else "\n"
+        lines.append(line + separator)
+        total += len(line) + 1
+    return ''.join(lines)
+
+def best_of(func, text, repeat):
+    """Return (fastest time, output) over `repeat` runs"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = func(text)
+        timings.append(time.perf_counter() - start)
+    return min(timings), output
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=float, default=4)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    
+    text = make_pdf_like_text(int(args.size_mb * 1024 * 1024))
+    
+    legacy_time, legacy_output = best_of(legacy_enhance_and_format_text, text, args.repeat)
+    compiled_time, compiled_output = best_of(app.enhance_and_format_text, text, args.repeat)
+    
+    print(f"input: {len(text):,} chars")
+    print(f"legacy:   {legacy_time:.3f}s")
+    print(f"compiled: {compiled_time:.3f}s ({legacy_time / compiled_time:.2f}x)")
+    
+    if compiled_output != legacy_output:
+        sys.exit("FAIL: output differs from the original implementation")
+    print("output identical: yes")
+
+if __name__ == '__main__':
+    main()
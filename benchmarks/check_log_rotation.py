@@ -0,0 +1,93 @@
+"""
+Check that the log file is rotated by one process while several processes log to it
+
+Imports the app with a small LOG_MAX_BYTES, forks worker processes the way gunicorn does
+with preload_app, and has every process log numbered lines at once. All lines must end up
+exactly once in app.log and its backups, app.log.1 must exist, and no file may grow past
+LOG_MAX_BYTES. A second process importing the app on its own must write its own
+app.<pid>.log instead of rotating app.log too. Exits non-zero otherwise.
+
+Usage:
+    python benchmarks/check_log_rotation.py [--processes 4] [--lines 500]
+"""
+
+import argparse
+import glob
+import os
+import subprocess
+import sys
+import tempfile
+
+from load_test_asgi import ROOT
+
+MAX_BYTES = 20000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=4, help="forked processes logging at once, the parent included")
+    parser.add_argument('--lines', type=int, default=500, help="lines logged by each process")
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        log_file = os.path.join(tmp, 'app.log')
+        env = {
+            'LOG_FILE': log_file,
+            'LOG_MAX_BYTES': str(MAX_BYTES),
+            'LOG_BACKUP_COUNT': '1000',
+            'LOG_SAMPLE_RATES': '',
+        }
+        os.environ.update(env)
+        os.chdir(tmp)  # data/ and uploads/ are created in the working directory
+        sys.path.insert(0, ROOT)
+        import app
+
+        def log_lines(name):
+            for index in range(args.lines):
+                app.logger.warning("rotation-check %s %d", name, index)
+
+        children = []
+        for number in range(1, args.processes):
+            pid = os.fork()
+            if pid == 0:
+                log_lines(f"child{number}")
+                os._exit(0)
+            children.append(pid)
+        log_lines("parent")
+        for pid in children:
+            os.waitpid(pid, 0)
+
+        # Another process importing the app on its own while this one writes app.log
+        subprocess.run([sys.executable, '-c', 'import app; app.logger.warning("rotation-check separate 0")'],
+                       cwd=tmp, env={**os.environ, 'PYTHONPATH': ROOT}, check=True, capture_output=True)
+        app.log_listener.stop()  # Writes out the queued records
+
+        rotated = sorted(path for path in glob.glob(f"{log_file}*") if not path.endswith('.lock'))
+        separate = glob.glob(os.path.join(tmp, 'app.*.log'))
+        lines = []
+        for path in rotated:
+            if os.path.getsize(path) > MAX_BYTES:
+                failures.append(f"{os.path.basename(path)} is {os.path.getsize(path)} bytes, over {MAX_BYTES}")
+            with open(path, encoding='utf-8') as f:
+                lines += [line.split(' - ')[-1].strip() for line in f if 'rotation-check' in line]
+        print(f"{len(rotated)} files: {', '.join(os.path.basename(path) for path in rotated[:4])}, ...")
+        print(f"{len(lines)} check lines, separate process wrote {[os.path.basename(path) for path in separate]}")
+
+        expected = [f"rotation-check {name} {index}" for name in ['parent'] + [f"child{n}" for n in range(1, args.processes)]
+                    for index in range(args.lines)]
+        if f"{log_file}.1" not in rotated:
+            failures.append("app.log was not rotated")
+        if sorted(lines) != sorted(expected):
+            missing = len(set(expected) - set(lines))
+            failures.append(f"{missing} lines missing and {len(lines) - len(set(lines))} duplicated")
+        if len(separate) != 1:
+            failures.append("the separately started process did not write its own app.<pid>.log")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("OK: one process rotates app.log and no line is lost")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
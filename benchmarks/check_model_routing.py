@@ -0,0 +1,82 @@
+"""
+Check that the model router reacts to transcriptions queueing for a slot
+
+Runs the Flask app in-process with one transcription slot and two stand-in Whisper.cpp
+models: "base" (accurate, slow) and "tiny" (fast). A realtime chunk sent alone must be
+transcribed with base; when several chunks arrive at once, those that waited for the slot
+must be routed to tiny, because base would miss the realtime latency target once the
+wait is added. Exits non-zero if either does not happen.
+
+Usage:
+    python benchmarks/check_model_routing.py [--chunks 4] [--chunk-seconds 3]
+"""
+
+import argparse
+import base64
+import os
+import sys
+import tempfile
+import threading
+
+from load_test_asgi import ROOT
+from load_test_sessions import make_chunk_wav, setup_fake_tools
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chunks', type=int, default=4, help="realtime chunks sent at once")
+    parser.add_argument('--chunk-seconds', type=float, default=3.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = setup_fake_tools(tmp, 0.3, 'sleep')
+        models = {}
+        for name in ('base', 'tiny'):
+            models[name] = os.path.join(tmp, f'ggml-{name}.bin')
+            with open(models[name], 'wb') as f:
+                f.write(b'\0' * 1024)
+        env.update({
+            'WHISPER_MODELS': ','.join(f'{name}={path}' for name, path in models.items()),
+            'WHISPER_LATENCY_TARGETS': 'realtime=3',
+            # base takes ~2 s on a 3 s chunk: within the target alone, not after waiting for one
+            'FAKE_WHISPER_MODEL_RTF': 'tiny=0.02,base=0.6',
+            'TRANSCRIPTION_CONCURRENCY': '1',
+            'LOG_FILE': os.path.join(tmp, 'app.log'),
+        })
+        os.environ.update(env)
+        sys.path.insert(0, ROOT)
+        import app
+
+        client = app.app.test_client()
+        audio = base64.b64encode(make_chunk_wav("the students read the passage", args.chunk_seconds)).decode()
+
+        def send_chunk():
+            response = client.post('/api/transcribe-audio-realtime', json={"audio_data": audio})
+            return response.get_json().get('model')
+
+        alone = send_chunk()
+        print(f"chunk sent alone: {alone}")
+
+        routed = [None] * args.chunks
+        def send_queued(index):
+            routed[index] = send_chunk()
+        threads = [threading.Thread(target=send_queued, args=(index,)) for index in range(args.chunks)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        print(f"{args.chunks} chunks sent at once: {', '.join(map(str, routed))}")
+        print(f"router: {app.model_router.snapshot()}")
+
+    failures = []
+    if alone != 'base':
+        failures.append(f"a chunk sent alone should use base, got {alone}")
+    if 'tiny' not in routed:
+        failures.append("no queued chunk was routed to tiny")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("OK: queued realtime chunks are routed to the faster model")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
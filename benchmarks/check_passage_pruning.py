@@ -0,0 +1,73 @@
+"""
+Check that passages nobody uses are removed from the passage store
+
+Stores passages through the app, ages some of them past PASSAGE_MAX_AGE, and runs the
+cleanup. Passages unused for longer must be removed with their reading progress and any
+leftover files of an unfinished save; a passage that was loaded recently must be kept even
+if it was stored long ago. Exits non-zero otherwise.
+
+Usage:
+    python benchmarks/check_passage_pruning.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from load_test_asgi import ROOT
+
+DAY = 24 * 3600
+
+def age(paths, days):
+    """Set the mtime of the given files `days` days back"""
+    then = time.time() - days * DAY
+    for path in paths:
+        os.utime(path, (then, then))
+
+def main():
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.update({'LOG_FILE': os.path.join(tmp, 'app.log'), 'PASSAGE_MAX_AGE': str(30 * DAY)})
+        os.chdir(tmp)  # data/ and uploads/ are created in the working directory
+        sys.path.insert(0, ROOT)
+        import app
+
+        unused = app.save_passage("A passage nobody has opened for two months.", "Old")
+        used = app.save_passage("A passage stored long ago but read this week.", "Old but used")
+        fresh = app.save_passage("A passage stored today.", "New")
+        passage = app.load_passage_meta(unused)
+        app.record_segment_result(passage, "reading1", 0, ["correct"] * passage["word_count"])
+
+        age(app._passage_paths(unused), 60)
+        age(app._passage_paths(used), 60)
+        leftover = os.path.join(app.PASSAGE_FOLDER, "0" * 32 + ".txt")  # A save that never wrote its metadata
+        with open(leftover, 'w') as f:
+            f.write("partial")
+        age([leftover], 60)
+
+        if app.load_passage_meta(used) is None:
+            failures.append("the passage used this week could not be loaded")
+        app._passages_cleaned_at = 0.0  # The cleanup runs at most hourly
+        app.remove_stale_passages()
+
+        remaining = sorted(os.listdir(app.PASSAGE_FOLDER))
+        print(f"passage files left: {remaining}")
+        if any(name.startswith(unused) for name in remaining):
+            failures.append("the unused passage was not removed")
+        if os.path.exists(os.path.join(app.PROGRESS_FOLDER, unused)):
+            failures.append("the unused passage's reading progress was not removed")
+        if os.path.exists(leftover):
+            failures.append("the files of an unfinished save were not removed")
+        for passage_id, label in ((used, "recently used"), (fresh, "new")):
+            if app.load_passage(passage_id) is None:
+                failures.append(f"the {label} passage was removed")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("OK: unused passages and their progress are removed, used ones are kept")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
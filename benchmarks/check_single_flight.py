@@ -0,0 +1,110 @@
+"""
+Check how identical requests are coalesced across worker processes (app.FileSingleFlight)
+
+Forked processes call the same key at once and count how often the function really ran:
+- concurrent identical calls run once and the others share the result
+- a failure is not stored: the callers that were waiting run the call again, and a call
+  made right after the failure runs too
+- a result is shared only for the grace period after the call finished
+
+Usage:
+    python benchmarks/check_single_flight.py [--processes 3] [--grace 1]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from load_test_asgi import ROOT
+
+def run_counted(runs_path, duration, fail_first):
+    """Record a run, then succeed (or fail, on the first run when asked) after `duration` seconds"""
+    with open(runs_path, 'a') as f:
+        f.write(f"{os.getpid()}\n")
+    with open(runs_path) as f:
+        run_number = len(f.readlines())
+    time.sleep(duration)
+    if fail_first and run_number == 1:
+        raise RuntimeError("transient failure")
+    return {"run": run_number}
+
+def call(flight, key, runs_path, duration, fail_first, results):
+    try:
+        result, shared = flight.do(key, run_counted, runs_path, duration, fail_first)
+        results.put(("ok", result["run"], shared))
+    except RuntimeError as e:
+        results.put(("error", str(e), False))
+
+def run_at_once(flight, key, runs_path, processes, duration, fail_first=False):
+    """Call the key from several processes at once; return (outcomes, number of real runs)"""
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=call, args=(flight, key, runs_path, duration, fail_first, results))
+        for _ in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+        time.sleep(0.05)  # The first one takes the lock
+    for worker in workers:
+        worker.join()
+    outcomes = sorted((results.get() for _ in workers), key=str)
+    with open(runs_path) as f:
+        return outcomes, len(f.readlines())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=3)
+    parser.add_argument('--grace', type=float, default=1.0, help="seconds a finished result is shared")
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['LOG_FILE'] = os.path.join(tmp, 'app.log')
+        os.chdir(tmp)  # data/ and uploads/ are created in the working directory
+        sys.path.insert(0, ROOT)
+        import app
+
+        flight = app.FileSingleFlight(os.path.join(tmp, 'flights'), grace=args.grace)
+        runs = os.path.join(tmp, 'runs')
+
+        outcomes, count = run_at_once(flight, 'shared', f"{runs}-shared", args.processes, 0.5)
+        print(f"concurrent calls: {count} run(s), {outcomes}")
+        if count != 1 or sum(shared for _, _, shared in outcomes) != args.processes - 1:
+            failures.append("concurrent identical calls did not share one run")
+
+        shared_result, shared = flight.do('shared', run_counted, f"{runs}-shared", 0, False)
+        print(f"call within the grace period: shared={shared}")
+        if not shared:
+            failures.append("a call right after the run did not get its result")
+        time.sleep(args.grace + 0.2)
+        _, shared = flight.do('shared', run_counted, f"{runs}-shared", 0, False)
+        print(f"call after the grace period: shared={shared}")
+        if shared:
+            failures.append("a result was shared after the grace period")
+
+        outcomes, count = run_at_once(flight, 'failing', f"{runs}-failing", args.processes, 0.5, fail_first=True)
+        print(f"first run fails: {count} run(s), {outcomes}")
+        errors = [outcome for outcome in outcomes if outcome[0] == "error"]
+        if len(errors) != 1 or count != 2:
+            failures.append("waiters did not retry once after the running call failed")
+
+        try:
+            flight.do('failed-once', run_counted, f"{runs}-failed-once", 0, True)
+        except RuntimeError:
+            pass
+        result, shared = flight.do('failed-once', run_counted, f"{runs}-failed-once", 0, True)
+        print(f"call right after a failure: run {result['run']}, shared={shared}")
+        if shared or result["run"] != 2:
+            failures.append("a failure was returned to a later call instead of running again")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("OK: identical calls share one run, failures are retried, results expire after the grace period")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
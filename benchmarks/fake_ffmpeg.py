@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Stand-in for ffmpeg used by the load tests
+
+The load tests upload audio that is already 16 kHz mono WAV, so converting it is
+a copy: the input after -i is copied to the last argument. Segmented uploads append
+one WAV file per chunk, where the browser appends WebM chunks of one stream; their
+audio is joined into a single WAV, as ffmpeg would decode the stream. "-ss SECONDS"
+before -i drops the audio before that position.
+"""
+
+import shutil
+import struct
+import sys
+
+def join_wavs(data, start_seconds=0.0):
+    """
+    Return one WAV with the audio of concatenated WAV files from start_seconds on, or None
+    if data holds a single file and nothing is skipped (it can be copied as is)
+    """
+    fmt, audio, offset, files = None, [], 0, 0
+    while data[offset:offset + 4] == b'RIFF':
+        end = offset + 8 + struct.unpack('<I', data[offset + 4:offset + 8])[0]
+        position = offset + 12
+        while position + 8 <= end:
+            chunk_id, size = data[position:position + 4], struct.unpack('<I', data[position + 4:position + 8])[0]
+            if chunk_id == b'fmt ':
+                fmt = fmt or data[position + 8:position + 8 + size]
+            elif chunk_id == b'data':
+                audio.append(data[position + 8:position + 8 + size])
+            position += 8 + size + (size & 1)
+        offset, files = end, files + 1
+    if (files < 2 and not start_seconds) or fmt is None:
+        return None
+    block_align, byte_rate = struct.unpack('<H', fmt[12:14])[0], struct.unpack('<I', fmt[8:12])[0]
+    audio = b''.join(audio)[int(start_seconds * byte_rate) // block_align * block_align:]
+    chunks = b'fmt ' + struct.pack('<I', len(fmt)) + fmt + b'data' + struct.pack('<I', len(audio)) + audio
+    return b'RIFF' + struct.pack('<I', 4 + len(chunks)) + b'WAVE' + chunks
+
+def main(argv):
+    if '-i' not in argv or len(argv) < 3:
+        print("usage: fake_ffmpeg.py -i INPUT [options] OUTPUT", file=sys.stderr)
+        return 1
+    source = argv[argv.index('-i') + 1]
+    start_seconds = float(argv[argv.index('-ss') + 1]) if '-ss' in argv[:argv.index('-i')] else 0.0
+    with open(source, 'rb') as f:
+        joined = join_wavs(f.read(), start_seconds)
+    if joined is None:
+        shutil.copyfile(source, argv[-1])
+    else:
+        with open(argv[-1], 'wb') as f:
+            f.write(joined)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Stand-in for the Whisper.cpp CLI used by the load tests
+
+Accepts the same arguments as the real CLI (-m, -f, --output-file, ...), takes time
+in proportion to the length of the input audio and writes a plain-text transcription
+to --output-file. Point WHISPER_CPP_CLI_PATH at this file.
+
+The words written are read from a "TXT " chunk in the WAV file when the load test
+embedded one (what the simulated student said); otherwise the words of --prompt, or
+filler words, at a normal reading rate are written. Greedy runs (--beam-size 1) take
+FAKE_WHISPER_GREEDY_FACTOR of the time.
+
+Environment:
+    FAKE_WHISPER_RTF          seconds of work per second of audio (default 0.3)
+    FAKE_WHISPER_MODEL_RTF    per-model overrides, "tiny=0.05,base=0.3" (matched against the -m file name)
+    FAKE_WHISPER_LOAD_SECONDS fixed model-load time per run (default 0.2)
+    FAKE_WHISPER_MODE         "sleep" (default) or "spin" to burn CPU like the real model
+    FAKE_WHISPER_GREEDY_FACTOR work of a --beam-size 1 run relative to beam search (default 0.6)
+"""
+
+import os
+import struct
+import sys
+import time
+
+WORDS_PER_SECOND = 2.5
+FILLER = "the students read the passage aloud to the class every morning".split()
+
+def read_wav(path):
+    """Return (duration in seconds, embedded text or None) of a WAV file"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:4] != b'RIFF' or data[8:12] != b'WAVE':
+        return len(data) / 32000, None  # Not a WAV: assume 16 kHz 16-bit mono
+    
+    byte_rate, audio_bytes, text = 32000, 0, None
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id, size = data[offset:offset + 4], struct.unpack('<I', data[offset + 4:offset + 8])[0]
+        body = data[offset + 8:offset + 8 + size]
+        if chunk_id == b'fmt ':
+            byte_rate = struct.unpack('<I', body[8:12])[0] or byte_rate
+        elif chunk_id == b'data':
+            audio_bytes = size
+        elif chunk_id == b'TXT ':
+            text = body.decode('utf-8', 'replace').strip()
+        offset += 8 + size + (size & 1)
+    return audio_bytes / byte_rate, text
+
+def work(seconds, mode):
+    if mode == 'spin':
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            pass
+    else:
+        time.sleep(seconds)
+
+def main(argv):
+    options = {}
+    for flag, value in zip(argv, argv[1:]):
+        if flag in ('-m', '-f', '--output-file', '-of', '--prompt', '--beam-size', '-bs'):
+            options[flag] = value
+    wav_path = options.get('-f')
+    output_path = options.get('--output-file') or options.get('-of')
+    if not wav_path or not output_path:
+        print("usage: fake_whisper.py -m MODEL -f WAV --output-file PATH", file=sys.stderr)
+        return 2
+    
+    duration, text = read_wav(wav_path)
+    rtf = float(os.getenv('FAKE_WHISPER_RTF', 0.3))
+    model_name = os.path.basename(options.get('-m', ''))
+    for item in filter(None, os.getenv('FAKE_WHISPER_MODEL_RTF', '').split(',')):
+        name, _, value = item.partition('=')
+        if name and name in model_name:
+            rtf = float(value)
+            break
+    load_seconds = float(os.getenv('FAKE_WHISPER_LOAD_SECONDS', 0.2))
+    if (options.get('--beam-size') or options.get('-bs')) == '1':
+        rtf *= float(os.getenv('FAKE_WHISPER_GREEDY_FACTOR', 0.6))
+    work(load_seconds + duration * rtf, os.getenv('FAKE_WHISPER_MODE', 'sleep'))
+    
+    if text is None:
+        count = max(1, round(duration * WORDS_PER_SECOND))
+        heard = options.get('--prompt', '').split() or FILLER
+        text = ' '.join(heard[i % len(heard)] for i in range(count))
+    
+    # Whisper.cpp writes one segment per line
+    words = text.split()
+    segments = [' '.join(words[i:i + 10]) for i in range(0, len(words), 10)]
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(segments) + '\n')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,151 @@
+"""
+Load test: Flask under a sync gunicorn worker vs the ASGI entry point
+
+Starts each server as a subprocess with stand-in ffmpeg and Whisper.cpp executables
+that sleep instead of decoding audio, then sends concurrent realtime transcription
+requests mixed with light API calls. One sync worker serves a single request at a
+time; the ASGI worker keeps answering while transcriptions wait on subprocesses.
+
+Usage:
+    python benchmarks/load_test_asgi.py [--requests 40] [--concurrency 8] [--delay 0.5]
+"""
+
+import argparse
+import base64
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FAKE_FFMPEG = """#!/bin/sh
+# Stand-in ffmpeg: copy the input to the last argument after a delay
+sleep {delay}
+in=""
+prev=""
+for arg in "$@"; do
+    if [ "$prev" = "-i" ]; then in="$arg"; fi
+    prev="$arg"
+    out="$arg"
+done
+cp "$in" "$out"
+"""
+
+FAKE_WHISPER = """#!/bin/sh
+# Stand-in Whisper.cpp: write a fixed transcription to --output-file after a delay
+sleep {delay}
+prev=""
+for arg in "$@"; do
+    if [ "$prev" = "--output-file" ]; then out="$arg"; fi
+    prev="$arg"
+done
+echo "the quick brown fox jumps over the lazy dog" > "$out"
+"""
+
+SERVERS = {
+    'flask': ['gunicorn', '--workers', '1', '--bind', '127.0.0.1:{port}', 'app:app'],
+    'asgi': ['uvicorn', 'asgi:app', '--workers', '1', '--host', '127.0.0.1', '--port', '{port}', '--log-level', 'warning'],
+}
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def write_fake_tools(tmp, delay):
+    """Create fake ffmpeg/whisper executables and a model file; return the environment using them"""
+    bin_dir = os.path.join(tmp, 'bin')
+    os.makedirs(bin_dir)
+    for name, script in (('ffmpeg', FAKE_FFMPEG), ('whisper', FAKE_WHISPER)):
+        path = os.path.join(bin_dir, name)
+        with open(path, 'w') as f:
+            f.write(script.format(delay=delay / 2))
+        os.chmod(path, 0o755)
+    model_path = os.path.join(tmp, 'ggml-fake.bin')
+    with open(model_path, 'wb') as f:
+        f.write(b'\0' * 1024)
+
+    env = dict(os.environ)
+    env['PATH'] = bin_dir + os.pathsep + env.get('PATH', '')
+    env['WHISPER_CPP_CLI_PATH'] = os.path.join(bin_dir, 'whisper')
+    env['WHISPER_CPP_MODEL_PATH'] = model_path
+    return env
+
+def wait_until_ready(base_url, process, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            urllib.request.urlopen(base_url + '/api/grammar-test?grade_level=5', timeout=1).read()
+            return
+        except Exception:
+            time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+def timed_request(base_url, kind, audio_payload):
+    if kind == 'transcribe':
+        request = urllib.request.Request(
+            base_url + '/api/transcribe-audio-realtime', data=audio_payload,
+            headers={'Content-Type': 'application/json'}, method='POST'
+        )
+    else:
+        request = urllib.request.Request(base_url + '/api/grammar-test?grade_level=5')
+    start = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=120) as response:
+        body = json.loads(response.read())
+    elapsed = time.perf_counter() - start
+    return kind, elapsed, body.get('source')
+
+def run_load(base_url, total, concurrency):
+    audio_payload = json.dumps({'audio_data': base64.b64encode(os.urandom(32000)).decode()}).encode()
+    kinds = ['transcribe' if i % 2 == 0 else 'light' for i in range(total)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda kind: timed_request(base_url, kind, audio_payload), kinds))
+    return results, time.perf_counter() - start
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=40, help="total requests (half transcriptions)")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--delay', type=float, default=0.5, help="seconds of fake ffmpeg + whisper work per chunk")
+    parser.add_argument('--servers', default='flask,asgi')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = write_fake_tools(tmp, args.delay)
+        env.setdefault('TRANSCRIPTION_CONCURRENCY', str(args.concurrency))
+
+        for name in args.servers.split(','):
+            port = free_port()
+            cmd = [part.format(port=port) for part in SERVERS[name]]
+            process = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                base_url = f"http://127.0.0.1:{port}"
+                wait_until_ready(base_url, process)
+                results, wall = run_load(base_url, args.requests, args.concurrency)
+            finally:
+                process.terminate()
+                process.wait()
+
+            sources = {source for kind, _, source in results if kind == 'transcribe'}
+            print(f"{name:>6}: {args.requests / wall:6.1f} req/s over {wall:.2f}s (transcription source: {', '.join(sorted(sources))})")
+            for kind in ('transcribe', 'light'):
+                latencies = [elapsed for k, elapsed, _ in results if k == kind]
+                print(f"        {kind:>10}: p50 {statistics.median(latencies) * 1000:7.0f} ms  "
+                      f"p95 {percentile(latencies, 95) * 1000:7.0f} ms  max {max(latencies) * 1000:7.0f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+"""
+End-to-end load test replaying classroom reading sessions
+
+Each simulated student prepares a passage, uploads the reading in audio chunks to
+/api/transcribe-audio-realtime, sends every transcription to
+/api/process-speech-result unless the transcription endpoint already aligned it (as
+the page does) and finalizes the session. Audio is transcribed by
+fake_whisper.py, which takes time in proportion to the chunk length and returns
+what the student "said" (a seeded simulated reading with mistakes).
+
+The report gives p50/p95/p99 latency per endpoint, and the reading audio processed
+per wall-clock second: the number of students reading at the same time that the
+server keeps up with, overall and per CPU core.
+
+Usage:
+    python benchmarks/load_test_sessions.py [--server asgi|flask|gthread] [--workers 1] [--threads N] [--slots N]
+        [--sessions 20] [--concurrency 4] [--words 150] [--chunk-seconds 3]
+        [--rtf 0.3] [--pace] [--output report.json]
+    python benchmarks/load_test_sessions.py --url http://host:port ...   (existing server)
+"""
+
+import argparse
+import base64
+import http.cookiejar
+import json
+import os
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from load_test_asgi import ROOT, free_port, wait_until_ready
+from reading_fixtures import make_passage, simulate_reading
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+WORDS_PER_SECOND = 2.5  # Reading rate used to size the audio chunks
+SAMPLE_RATE = 16000
+
+SERVERS = {
+    'flask': ['gunicorn', '--workers', '{workers}', '--bind', '127.0.0.1:{port}', 'app:app'],
+    # gunicorn_config.py sizing; --workers/--threads override it through its environment variables
+    'gthread': ['gunicorn', '-c', 'gunicorn_config.py', '--bind', '127.0.0.1:{port}', 'app:app'],
+    'asgi': ['uvicorn', 'asgi:app', '--workers', '{workers}', '--host', '127.0.0.1', '--port', '{port}',
+             '--log-level', 'warning'],
+}
+
+def make_chunk_wav(text, seconds):
+    """16 kHz mono WAV of silence carrying the words fake_whisper.py will "hear" in a TXT chunk"""
+    audio = b'\0' * (int(seconds * SAMPLE_RATE) * 2)
+    spoken = text.encode('utf-8')
+    if len(spoken) % 2:
+        spoken += b' '
+    fmt = struct.pack('<HHIIHH', 1, 1, SAMPLE_RATE, SAMPLE_RATE * 2, 2, 16)
+    chunks = (b'fmt ' + struct.pack('<I', len(fmt)) + fmt
+              + b'TXT ' + struct.pack('<I', len(spoken)) + spoken
+              + b'data' + struct.pack('<I', len(audio)) + audio)
+    return b'RIFF' + struct.pack('<I', 4 + len(chunks)) + b'WAVE' + chunks
+
+def setup_fake_tools(tmp, rtf, mode):
+    """Put fake ffmpeg/whisper on PATH and return the server environment"""
+    bin_dir = os.path.join(tmp, 'bin')
+    os.makedirs(bin_dir)
+    for name, script in (('ffmpeg', 'fake_ffmpeg.py'), ('whisper', 'fake_whisper.py')):
+        path = os.path.join(bin_dir, name)
+        with open(path, 'w') as f:
+            f.write(f"#!/bin/sh\nexec {sys.executable} {os.path.join(BENCH_DIR, script)} \"$@\"\n")
+        os.chmod(path, 0o755)
+    model_path = os.path.join(tmp, 'ggml-fake.bin')
+    with open(model_path, 'wb') as f:
+        f.write(b'\0' * 1024)
+    
+    env = dict(os.environ)
+    env.update({
+        'PATH': bin_dir + os.pathsep + env.get('PATH', ''),
+        'WHISPER_CPP_CLI_PATH': os.path.join(bin_dir, 'whisper'),
+        'WHISPER_CPP_MODEL_PATH': model_path,
+        'FAKE_WHISPER_RTF': str(rtf),
+        'FAKE_WHISPER_MODE': mode,
+        'LOG_LEVEL': 'WARNING',
+    })
+    return env
+
+class Session:
+    """One student's reading session with its own cookie jar"""
+    
+    def __init__(self, base_url, record):
+        self.base_url = base_url
+        self.record = record
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    
+    def post(self, endpoint, payload):
+        request = urllib.request.Request(
+            self.base_url + endpoint, data=json.dumps(payload).encode(),
+            headers={'Content-Type': 'application/json'}, method='POST'
+        )
+        start = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=300) as response:
+                body = json.loads(response.read())
+            ok = True
+        except (urllib.error.URLError, OSError, ValueError):
+            body, ok = {}, False
+        self.record(endpoint, time.perf_counter() - start, ok)
+        return body
+
+def run_session(base_url, index, args, record):
+    """Replay one reading session; returns the seconds of audio it uploaded"""
+    passage = make_passage(args.words, seed=args.seed + index)
+    spoken, _ = simulate_reading(passage, seed=args.seed + index)
+    spoken_words = spoken.split()
+    chunk_words = max(1, round(args.chunk_seconds * WORDS_PER_SECOND))
+    
+    session = Session(base_url, record)
+    session.post('/api/prepare-realtime-tracking', {"text": passage})
+    
+    current_index = 0
+    audio_seconds = 0.0
+    for start in range(0, len(spoken_words), chunk_words):
+        chunk_start = time.perf_counter()
+        text = ' '.join(spoken_words[start:start + chunk_words])
+        seconds = args.chunk_seconds * len(text.split()) / chunk_words
+        audio = base64.b64encode(make_chunk_wav(text, seconds)).decode()
+        audio_seconds += seconds
+        
+        result = session.post('/api/transcribe-audio-realtime', {"audio_data": audio})
+        transcription = result.get('transcription', '')
+        if 'updated_words' in result:  # Aligned by the transcription endpoint (forced alignment)
+            current_index = result.get('next_word_index', current_index)
+        elif transcription:
+            result = session.post('/api/process-speech-result',
+                                  {"speech_text": transcription, "current_index": current_index})
+            current_index = result.get('next_word_index', current_index)
+        
+        if args.pace:  # The next chunk is only recorded after this one's duration
+            time.sleep(max(0.0, seconds - (time.perf_counter() - chunk_start)))
+    
+    session.post('/api/finalize-reading-tracking', {"format": "compact"})
+    return audio_seconds
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def run_load(base_url, args):
+    latencies = {}
+    errors = {}
+    lock = threading.Lock()
+    
+    def record(endpoint, elapsed, ok):
+        with lock:
+            latencies.setdefault(endpoint, []).append(elapsed)
+            if not ok:
+                errors[endpoint] = errors.get(endpoint, 0) + 1
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        audio_seconds = sum(pool.map(lambda i: run_session(base_url, i, args, record), range(args.sessions)))
+    wall = time.perf_counter() - start
+    
+    cores = args.cores or os.cpu_count() or 1
+    return {
+        "sessions": args.sessions,
+        "concurrency": args.concurrency,
+        "wall_seconds": round(wall, 2),
+        "audio_seconds": round(audio_seconds, 1),
+        # Seconds of reading transcribed per wall second = students reading at once the server keeps up with
+        "sustained_sessions": round(audio_seconds / wall, 2),
+        "cores": cores,
+        "sustained_sessions_per_core": round(audio_seconds / wall / cores, 2),
+        "endpoints": {
+            endpoint: {
+                "requests": len(values),
+                "errors": errors.get(endpoint, 0),
+                "p50_ms": round(statistics.median(values) * 1000, 1),
+                "p95_ms": round(percentile(values, 95) * 1000, 1),
+                "p99_ms": round(percentile(values, 99) * 1000, 1)
+            }
+            for endpoint, values in latencies.items()
+        }
+    }
+
+def print_report(name, report):
+    print(f"{name}: {report['sessions']} sessions x {report['concurrency']} concurrent in {report['wall_seconds']}s, "
+          f"{report['audio_seconds']}s of reading audio")
+    print(f"  sustained sessions: {report['sustained_sessions']} "
+          f"({report['sustained_sessions_per_core']} per core, {report['cores']} cores)")
+    for endpoint, stats in report["endpoints"].items():
+        print(f"  {endpoint:>32}: {stats['requests']:5} req  p50 {stats['p50_ms']:8.1f} ms  "
+              f"p95 {stats['p95_ms']:8.1f} ms  p99 {stats['p99_ms']:8.1f} ms  errors {stats['errors']}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help="test an already running server instead of starting one")
+    parser.add_argument('--server', default='asgi', choices=sorted(SERVERS))
+    parser.add_argument('--workers', type=int, help="worker processes (default: 1, or the config's for gthread)")
+    parser.add_argument('--threads', type=int, help="threads per gthread worker (default: the config's)")
+    parser.add_argument('--slots', type=int, help="transcriptions run at once per worker (TRANSCRIPTION_CONCURRENCY)")
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=4, help="students reading at the same time")
+    parser.add_argument('--words', type=int, default=150, help="passage length in words")
+    parser.add_argument('--chunk-seconds', type=float, default=3.0, help="audio per realtime chunk")
+    parser.add_argument('--rtf', type=float, default=0.3, help="fake Whisper seconds of work per audio second")
+    parser.add_argument('--mode', default='sleep', choices=('sleep', 'spin'), help="fake Whisper sleeps or burns CPU")
+    parser.add_argument('--pace', action='store_true', help="upload chunks in real time, as a reading student would")
+    parser.add_argument('--cores', type=int, help="CPU cores available to the server (default: this machine's)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write the report as JSON")
+    args = parser.parse_args()
+    
+    if args.url:
+        report = run_load(args.url.rstrip('/'), args)
+        name = args.url
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = setup_fake_tools(tmp, args.rtf, args.mode)
+            if args.workers:
+                env['WEB_CONCURRENCY'] = str(args.workers)
+            if args.threads:
+                env['GUNICORN_THREADS'] = str(args.threads)
+            if args.slots:
+                env['TRANSCRIPTION_CONCURRENCY'] = str(args.slots)
+            port = free_port()
+            cmd = [part.format(port=port, workers=args.workers or 1) for part in SERVERS[args.server]]
+            process = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                base_url = f"http://127.0.0.1:{port}"
+                wait_until_ready(base_url, process)
+                report = run_load(base_url, args)
+            finally:
+                process.terminate()
+                process.wait()
+        name = (f"{args.server} ({args.workers or 'default'} workers"
+                f"{f', {args.threads} threads' if args.threads else ''}{f', {args.slots} slots' if args.slots else ''})")
+    
+    print_report(name, report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(dict(report, settings=vars(args)), f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Synthetic PDF generator used by the benchmarks
+
+Writes minimal, valid PDF files without any third-party dependency so the
+benchmarks can run on a fresh checkout.
+"""
+
+import random
+
+WORDS = (
+    "the quick brown fox jumps over lazy dog reading practice helps students "
+    "learn new words every day teacher asked class to read passage aloud "
+    "carefully and clearly while listening for each sound in sentence"
+).split()
+
+def _serialize(objects, path):
+    """Write numbered PDF objects plus a cross-reference table"""
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    
+    xref_offset = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode()
+    
+    with open(path, 'wb') as f:
+        f.write(out)
+
+def write_text_pdf(path, page_count, lines_per_page=40, seed=0):
+    """Write a PDF with `page_count` pages of random English-like text"""
+    rng = random.Random(seed)
+    page_numbers = [4 + i * 2 for i in range(page_count)]
+    
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{n} 0 R' for n in page_numbers)}] /Count {page_count} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    
+    for _ in range(page_count):
+        lines = [' '.join(rng.choice(WORDS) for _ in range(12)) for _ in range(lines_per_page)]
+        stream = "BT /F1 10 Tf 40 800 Td 14 TL " + " ".join(f"({line}) '" for line in lines) + " ET"
+        content_number = len(objects) + 2
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_number} 0 R >>".encode()
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream".encode())
+    
+    _serialize(objects, path)
+    return path
+
+def write_image_pdf(path, page_count, lines_per_page=20, seed=0):
+    """Write a scanned-style PDF: every page is a single image with no text layer (needs Pillow)"""
+    from PIL import Image, ImageDraw
+    
+    rng = random.Random(seed)
+    pages = []
+    for _ in range(page_count):
+        image = Image.new('L', (1240, 1754), color=255)  # A4 at 150 DPI
+        draw = ImageDraw.Draw(image)
+        for line in range(lines_per_page):
+            text = ' '.join(rng.choice(WORDS) for _ in range(8))
+            draw.text((100, 100 + line * 60), text, fill=0)
+        pages.append(image)
+    
+    pages[0].save(path, 'PDF', resolution=150.0, save_all=True, append_images=pages[1:])
+    return path
@@ -0,0 +1,103 @@
+"""
+Synthetic passages and reading transcripts used by the benchmarks
+
+Transcripts are derived from a passage with controlled rates of skipped,
+substituted, mispronounced and inserted words and re-read phrases, so timings
+are reproducible for a given seed and comparable between commits.
+"""
+
+import random
+
+WORDS = (
+    "the quick brown fox jumps over lazy dog reading practice helps students "
+    "learn new words every day teacher asked class to read passage aloud "
+    "carefully and clearly while listening for each sound in sentence "
+    "morning river bright garden little window because through before always"
+).split()
+
+FILLERS = ["um", "uh", "and", "the", "so"]
+
+DEFAULT_RATES = {
+    "skip": 0.05,
+    "substitute": 0.04,
+    "mispronounce": 0.04,
+    "insert": 0.02,
+    "reread": 0.02
+}
+
+def make_passage(word_count, seed=0):
+    """Return a passage of `word_count` words in sentences and paragraphs"""
+    rng = random.Random(seed)
+    sentences = []
+    remaining = word_count
+    while remaining > 0:
+        length = min(remaining, rng.randint(6, 16))
+        words = [rng.choice(WORDS) for _ in range(length)]
+        words[0] = words[0].capitalize()
+        if length > 8 and rng.random() < 0.3:
+            words[length // 2] += ','
+        sentences.append(' '.join(words) + rng.choice('..!?'))
+        remaining -= length
+    
+    paragraphs = [' '.join(sentences[i:i + 5]) for i in range(0, len(sentences), 5)]
+    return '\n\n'.join(paragraphs)
+
+def _mispronounce(word, rng):
+    if len(word) < 3:
+        return word + rng.choice('sd')
+    pos = rng.randint(1, len(word) - 1)
+    return word[:pos] + rng.choice('aeioubdt') + word[pos + 1:]
+
+def simulate_reading(passage, rates=None, seed=0):
+    """
+    Simulate a student reading `passage` aloud
+    
+    Args:
+        passage: Passage text
+        rates: Per-word probabilities of "skip", "substitute", "mispronounce",
+            "insert" (a filler before the word) and "reread" (repeat the last 1-3 words)
+        seed: Random seed
+    
+    Returns:
+        Tuple of (spoken text, word details in the transcription result format)
+    """
+    rates = dict(DEFAULT_RATES, **(rates or {}))
+    rng = random.Random(seed)
+    spoken = []
+    details = []
+    timestamp = 0.0
+    
+    def say(word, status, intended=None, confidence=None):
+        nonlocal timestamp
+        detail = {
+            "word": word,
+            "status": status,
+            "confidence": confidence if confidence is not None else rng.uniform(0.85, 0.99),
+            "timestamp": round(timestamp, 2)
+        }
+        if intended:
+            detail["intended_word"] = intended
+        details.append(detail)
+        if word:
+            spoken.append(word)
+            timestamp += rng.uniform(0.25, 0.6)
+    
+    original = [word.strip('.,!?') for word in passage.split()]
+    for i, word in enumerate(original):
+        if rng.random() < rates["insert"]:
+            say(rng.choice(FILLERS), "inserted", confidence=rng.uniform(0.4, 0.7))
+        if i and rng.random() < rates["reread"]:
+            for repeated in original[max(0, i - rng.randint(1, 3)):i]:
+                say(repeated, "repeated")
+        
+        roll = rng.random()
+        if roll < rates["skip"]:
+            say(None, "skipped", intended=word, confidence=0)
+        elif roll < rates["skip"] + rates["substitute"]:
+            say(rng.choice(WORDS), "substituted", intended=word, confidence=rng.uniform(0.5, 0.7))
+        elif roll < rates["skip"] + rates["substitute"] + rates["mispronounce"]:
+            say(_mispronounce(word, rng), "mispronounced", intended=word, confidence=rng.uniform(0.6, 0.8))
+        else:
+            say(word, "correct")
+    
+    return ' '.join(spoken), details
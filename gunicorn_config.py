@@ -0,0 +1,81 @@
+"""
+Gunicorn settings for the Flask app, sized for transcription requests
+
+    gunicorn -c gunicorn_config.py app:app
+
+A transcription request spends nearly all of its time waiting for the ffmpeg and
+Whisper.cpp subprocesses, so a worker thread is cheap while it waits but the CPU
+cores are not. Workers and threads are therefore sized from the cores and the number
+of transcriptions that should run at once, with spare threads so page and
+realtime-session requests are still answered while every transcription slot is busy.
+
+Environment (all optional):
+    WEB_CONCURRENCY            worker processes (default: one per CPU core)
+    TRANSCRIPTION_CONCURRENCY  transcriptions allowed to run at once per worker, enforced by
+                               the app (default: the cores shared out between the workers)
+    GUNICORN_LIGHT_THREADS     extra threads per worker for other requests (default 4)
+    GUNICORN_THREADS           threads per worker, overriding the two settings above
+    PDF_EXTRACT_WORKERS        PDF/OCR pool processes per worker (default: the cores shared out
+                               between the workers)
+    MAX_AUDIO_SECONDS          longest recording to transcribe (default 900)
+    WHISPER_MAX_RTF            slowest Whisper.cpp seconds per audio second expected (default 0.5)
+"""
+
+import math
+import os
+
+def available_cores():
+    """CPU cores this process may run on (the affinity mask is narrower than cpu_count in containers)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+CORES = available_cores()
+LIGHT_REQUEST_THREADS = int(os.getenv('GUNICORN_LIGHT_THREADS', 4))
+MAX_AUDIO_SECONDS = float(os.getenv('MAX_AUDIO_SECONDS', 900))  # A 15-minute reading
+WHISPER_MAX_RTF = float(os.getenv('WHISPER_MAX_RTF', 0.5))  # base.en on a busy core; tiny is ~5x faster
+
+# Workers: one per core, so the Python side of requests (alignment, HTML rendering, PDF
+# text extraction) runs on every core; each process keeps its own metrics and caches
+workers = int(os.getenv('WEB_CONCURRENCY', CORES))
+# Threads: the worker's share of concurrent transcriptions plus headroom for light requests.
+# The app reads TRANSCRIPTION_CONCURRENCY at import and caps its ASR runs with it, so the
+# per-worker share is set here before the app is loaded
+TRANSCRIPTION_SLOTS = int(os.environ.setdefault('TRANSCRIPTION_CONCURRENCY', str(math.ceil(CORES / workers))))
+threads = int(os.getenv('GUNICORN_THREADS', TRANSCRIPTION_SLOTS + LIGHT_REQUEST_THREADS))
+# Each worker starts its own PDF/OCR process pool; share the cores out instead of one per core each
+os.environ.setdefault('PDF_EXTRACT_WORKERS', str(math.ceil(CORES / workers)))
+worker_class = 'gthread'
+
+# Import the app once in the master: workers fork with the modules, compiled templates and
+# the cached whisper.cpp/ffmpeg probe already in memory (see on_starting)
+preload_app = True
+
+# Timeouts derived from the longest audio: ffmpeg and Whisper.cpp each get SUBPROCESS_TIMEOUT,
+# which the app reads at import, so it is set here before the app is loaded
+SUBPROCESS_TIMEOUT = int(os.environ.setdefault(
+    'SUBPROCESS_TIMEOUT', str(math.ceil(MAX_AUDIO_SECONDS * WHISPER_MAX_RTF) + 30)
+))
+# gthread workers keep heartbeating while a request runs, so this only restarts a worker
+# that is stuck; a sync worker (-k sync) would also be killed mid-request after it
+timeout = 2 * SUBPROCESS_TIMEOUT + 30
+# On reload or deploy, let in-flight transcriptions finish before workers are stopped
+graceful_timeout = SUBPROCESS_TIMEOUT + 30
+keepalive = 5  # Behind a proxy that reuses connections
+
+# The heartbeat file is touched constantly; keep it off a possibly slow container disk
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+def on_starting(server):
+    """
+    Run the startup probes in the master, once, so forked workers inherit the result
+    
+    This hook runs before the master installs its SIGCHLD handler, which would otherwise
+    reap the probe's ffmpeg subprocess as if it were a worker.
+    """
+    import app
+    status = app.whisper_probe.get()
+    server.log.info("Whisper.cpp %s; %d workers x %d threads (%d transcription slots each), timeout %ss",
+                    "available" if status["overall_status"] else "NOT available",
+                    workers, threads, TRANSCRIPTION_SLOTS, timeout)
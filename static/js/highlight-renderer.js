@@ -0,0 +1,145 @@
+/**
+ * Client-side rendering of compact highlighting responses
+ * 
+ * API endpoints called with format=compact return run-length encoded
+ * word statuses instead of HTML:
+ *   { passage_id, word_count, runs: [[startIndex, length, status, confidence], ...] }
+ * Segment readings add `segment` and `start_word`; their runs are relative
+ * to the segment. This module fetches the passage (or segment) text once
+ * per saved revision and builds the word spans locally, using the styles in
+ * style.css.
+ */
+
+const HighlightRenderer = (() => {
+    // Same word boundaries as the server's \b\w+\b (Unicode letters, numbers and underscore)
+    const WORD_PATTERN = /[\p{L}\p{N}_]+/gu;
+    
+    const passageCache = new Map();
+    
+    // Class names for each rendering style
+    const STYLES = {
+        // Word-detail comparison (analysis results)
+        analysis: status => `word-span highlight-${status}`,
+        // Real-time tracking
+        realtime: status => `word ${status}`
+    };
+    
+    async function fetchPassageText(passageId, segment = null) {
+        const hasSegment = segment !== null && segment !== undefined;
+        const key = hasSegment ? `${passageId}/${segment}` : passageId;
+        if (!passageCache.has(key)) {
+            const url = hasSegment
+                ? `/api/passages/${passageId}/segments/${segment}?format=compact`
+                : `/api/passages/${passageId}`;
+            const request = fetch(url)
+                .then(response => response.json())
+                .then(data => {
+                    if (!data.success) {
+                        throw new Error(data.error || 'Passage not found');
+                    }
+                    return data.text;
+                })
+                .catch(error => {
+                    passageCache.delete(key);
+                    throw error;
+                });
+            passageCache.set(key, request);
+        }
+        return passageCache.get(key);
+    }
+    
+    // Drop the cached text of a passage (and its segments) after it was saved again,
+    // e.g. while a PDF upload is still streaming pages into it
+    function forgetPassage(passageId) {
+        for (const key of passageCache.keys()) {
+            if (key === passageId || key.startsWith(`${passageId}/`)) {
+                passageCache.delete(key);
+            }
+        }
+    }
+    
+    function expandRuns(runs, wordCount) {
+        const statuses = new Array(wordCount).fill(null);
+        for (const [start, length, status, confidence] of runs) {
+            for (let i = start; i < start + length && i < wordCount; i++) {
+                statuses[i] = { status, confidence };
+            }
+        }
+        return statuses;
+    }
+    
+    function render(container, text, highlighting, style = 'analysis') {
+        const statuses = expandRuns(highlighting.runs, highlighting.word_count);
+        const className = STYLES[style] || STYLES.analysis;
+        const fragment = document.createDocumentFragment();
+        
+        let lastPos = 0;
+        let index = 0;
+        for (const match of text.matchAll(WORD_PATTERN)) {
+            if (match.index > lastPos) {
+                fragment.appendChild(document.createTextNode(text.slice(lastPos, match.index)));
+            }
+            
+            const info = statuses[index] || { status: 'unknown', confidence: null };
+            const span = document.createElement('span');
+            span.id = `word-${index}`;
+            span.className = className(info.status);
+            span.textContent = match[0];
+            span.dataset.wordIndex = index;
+            span.dataset.wordStatus = info.status;
+            if (info.confidence !== null && info.confidence !== undefined) {
+                span.dataset.confidence = info.confidence.toFixed(2);
+            }
+            fragment.appendChild(span);
+            
+            lastPos = match.index + match[0].length;
+            index++;
+        }
+        
+        if (lastPos < text.length) {
+            fragment.appendChild(document.createTextNode(text.slice(lastPos)));
+        }
+        
+        container.replaceChildren(fragment);
+    }
+    
+    function renderStats(container, stats) {
+        const items = [
+            ['Accuracy', `${stats.accuracy_percentage}%`],
+            ['Correct', `${stats.correct}/${stats.total_words}`],
+            ['Mispronounced', stats.mispronounced],
+            ['Skipped', stats.skipped],
+            ['Substituted', stats.substituted]
+        ];
+        
+        const wrapper = document.createElement('div');
+        wrapper.className = 'reading-stats';
+        for (const [label, value] of items) {
+            if (value === undefined) continue;
+            const item = document.createElement('div');
+            item.className = 'stat-item';
+            item.innerHTML = '<span class="stat-label"></span><span class="stat-value"></span>';
+            item.children[0].textContent = label;
+            item.children[1].textContent = value;
+            wrapper.appendChild(item);
+        }
+        container.prepend(wrapper);
+    }
+    
+    /**
+     * Render a compact highlighting response into a container.
+     * Pass `text` when the client already has it; otherwise it is fetched once by passage id
+     * (and segment, for a segment reading).
+     */
+    async function renderCompact(container, highlighting, { text = null, style = 'analysis' } = {}) {
+        const passageText = text !== null ? text : await fetchPassageText(highlighting.passage_id, highlighting.segment);
+        render(container, passageText, highlighting, style);
+        if (highlighting.statistics) {
+            renderStats(container, highlighting.statistics);
+        }
+    }
+    
+    return { renderCompact, fetchPassageText, forgetPassage, expandRuns };
+})();
+
+window.HighlightRenderer = HighlightRenderer;
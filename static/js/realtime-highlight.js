@@ -20,6 +20,8 @@ class RealtimeHighlighter {
             highlightCurrent: true,
             autoScroll: true,
             preferServerRecognition: true,
+            useWebSocket: true,  // Use /ws/reading when the server supports it (ASGI), else plain HTTP
+            socketPath: '/ws/reading',
             ...options
         };
         
@@ -34,6 +36,12 @@ class RealtimeHighlighter {
         this.transcriptText = ''; // Store the current transcript
         this.recognitionRestartAttempts = 0;
         this.maxRecognitionRestarts = 5; // Maximum number of automatic restarts
+        this.preparedResponses = new Map(); // text -> { etag, data } for If-None-Match revalidation
+        
+        // WebSocket reading session (state lives on the server for the life of the connection)
+        this.socket = null;
+        this.socketReady = false;
+        this.pendingFinal = null;
         
         // Speech recognition
         this.recognition = null;
@@ -255,30 +263,50 @@ class RealtimeHighlighter {
             this.isServerRecognition = false;
             this.updateRecognitionSource('Not started');
 
-            // Call the API to prepare text for highlighting
+            // Call the API to prepare text for highlighting, revalidating a previous response if we have one
+            const cached = this.preparedResponses.get(text);
+            const headers = { 'Content-Type': 'application/json' };
+            if (cached) {
+                headers['If-None-Match'] = cached.etag;
+            }
+            
             const response = await fetch(`${this.options.apiEndpoint}/prepare-realtime-tracking`, {
                 method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
+                headers: headers,
                 body: JSON.stringify({
-                    text: text
+                    text: text,
+                    format: 'compact'  // Word spans are built client-side from the text we already have
                 })
             });
             
-            if (!response.ok) {
-                throw new Error(`API error: ${response.status}`);
-            }
-            
-            const data = await response.json();
-            
-            if (!data.success) {
-                throw new Error(data.error || 'Failed to prepare text');
+            let data;
+            if (response.status === 304 && cached) {
+                // The server still tracks the same passage; reuse the markup data we already have
+                data = cached.data;
+            } else {
+                if (!response.ok) {
+                    throw new Error(`API error: ${response.status}`);
+                }
+                
+                data = await response.json();
+                
+                if (!data.success) {
+                    throw new Error(data.error || 'Failed to prepare text');
+                }
+                
+                const etag = response.headers.get('ETag');
+                if (etag) {
+                    this.preparedResponses.set(text, { etag, data });
+                }
             }
             
             // Set up the reading text
             const readingTextElement = document.getElementById('reading-text');
-            readingTextElement.innerHTML = data.tracking_html;
+            if (data.highlighting) {
+                await HighlightRenderer.renderCompact(readingTextElement, data.highlighting, { text, style: 'realtime' });
+            } else {
+                readingTextElement.innerHTML = data.tracking_html;
+            }
             
             // Store data
             this.totalWords = data.word_count;
@@ -292,6 +320,8 @@ class RealtimeHighlighter {
             // Clear any previous results
             document.getElementById('reading-results').style.display = 'none';
             
+            this.openSocket(text);
+            
             return true;
         } catch (error) {
             this.showError(`Error preparing text: ${error.message}`);
@@ -299,6 +329,81 @@ class RealtimeHighlighter {
         }
     }
     
+    openSocket(text) {
+        this.closeSocket();
+        if (!this.options.useWebSocket || !('WebSocket' in window)) return;
+        
+        const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+        const socket = new WebSocket(`${protocol}//${window.location.host}${this.options.socketPath}`);
+        socket.binaryType = 'arraybuffer';
+        this.socket = socket;
+        
+        socket.addEventListener('open', () => {
+            socket.send(JSON.stringify({ type: 'start', text: text }));
+        });
+        
+        socket.addEventListener('message', (event) => {
+            let data;
+            try {
+                data = JSON.parse(event.data);
+            } catch (error) {
+                console.error('Invalid WebSocket message:', error);
+                return;
+            }
+            this.handleSocketMessage(data);
+        });
+        
+        // Servers without WebSocket support (plain Flask) refuse the upgrade; HTTP keeps working
+        socket.addEventListener('close', () => {
+            if (this.socket === socket) {
+                this.socket = null;
+                this.socketReady = false;
+                this.rejectPendingFinal(new Error('Connection closed'));
+            }
+        });
+    }
+    
+    closeSocket() {
+        if (this.socket) {
+            const socket = this.socket;
+            this.socket = null;
+            this.socketReady = false;
+            socket.close();
+        }
+    }
+    
+    handleSocketMessage(data) {
+        switch (data.type) {
+            case 'ready':
+                this.socketReady = true;
+                break;
+            case 'words':
+                if (data.transcription && data.transcription.trim()) {
+                    this.transcriptText = this.transcriptText ? `${this.transcriptText} ${data.transcription}` : data.transcription;
+                    this.updateTranscript(this.transcriptText.trim());
+                }
+                this.applyWordUpdates(data);
+                break;
+            case 'final':
+                if (this.pendingFinal) {
+                    this.pendingFinal.resolve(data);
+                    this.pendingFinal = null;
+                }
+                break;
+            case 'error':
+                console.error('Reading session error:', data.error);
+                this.rejectPendingFinal(new Error(data.error));
+                break;
+        }
+    }
+    
+    rejectPendingFinal(error) {
+        if (this.pendingFinal) {
+            this.pendingFinal.reject(error);
+            this.pendingFinal = null;
+        }
+    }
+    
     startReading() {
         if (!this.isRecognitionSupported) {
             this.showError("Speech recognition is not supported in your browser");
@@ -444,6 +549,23 @@ class RealtimeHighlighter {
                 recorder.addEventListener('stop', async () => {
                     if (!this.isReading || this.isPaused) return;
                     
+                    if (this.socketReady) {
+                        // Send the chunk as a binary frame; word updates arrive as "words" messages
+                        const audioBlob = new Blob(audioChunks, { type: 'audio/webm' });
+                        this.socket.send(await audioBlob.arrayBuffer());
+                        
+                        if (this.isReading && !this.isPaused && this.isServerRecognition) {
+                            audioChunks.length = 0;
+                            recorder.start();
+                            setTimeout(() => {
+                                if (recorder.state === 'recording') {
+                                    recorder.stop();
+                                }
+                            }, 3000); // Record 3 seconds at a time
+                        }
+                        return;
+                    }
+                    
                     try {
                         // Convert audio to base64
                         const audioBlob = new Blob(audioChunks, { type: 'audio/webm' });
@@ -484,7 +606,12 @@ class RealtimeHighlighter {
                                         }
                                         
                                         this.updateTranscript(this.transcriptText.trim());
-                                        this.processSpeechResult(transcript);
+                                        if (data.updated_words !== undefined) {
+                                            // The server already aligned the chunk with the passage
+                                            this.applyWordUpdates(data);
+                                        } else {
+                                            this.processSpeechResult(transcript);
+                                        }
                                     }
                                     
                                     // Continue recording if still reading
@@ -599,6 +726,15 @@ class RealtimeHighlighter {
     async processSpeechResult(speechText) {
         if (!speechText || !this.isReading) return;
         
+        if (this.socketReady) {
+            this.socket.send(JSON.stringify({
+                type: 'speech_result',
+                speech_text: speechText,
+                current_index: this.currentWordIndex
+            }));
+            return;
+        }
+        
         try {
             // Send to server for processing
             const response = await fetch(`${this.options.apiEndpoint}/process-speech-result`, {
@@ -624,23 +760,7 @@ class RealtimeHighlighter {
                 throw new Error(data.error || 'Failed to process speech');
             }
             
-            // Update word statuses
-            if (data.updated_words && data.updated_words.length > 0) {
-                for (const update of data.updated_words) {
-                    this.updateWordStatus(update.index, update.status);
-                }
-                
-                // Update current word index if provided
-                if (data.next_word_index !== undefined) {
-                    this.currentWordIndex = data.next_word_index;
-                    this.highlightCurrentWord(this.currentWordIndex);
-                    
-                    // Auto scroll if enabled
-                    if (this.options.autoScroll) {
-                        this.scrollToCurrentWord(this.currentWordIndex);
-                    }
-                }
-            }
+            this.applyWordUpdates(data);
         } catch (error) {
             console.error('Error processing speech result:', error);
             // Continue reading even if there's an error processing a speech segment
@@ -648,6 +768,26 @@ class RealtimeHighlighter {
         }
     }
     
+    applyWordUpdates(data) {
+        // Update word statuses
+        if (data.updated_words && data.updated_words.length > 0) {
+            for (const update of data.updated_words) {
+                this.updateWordStatus(update.index, update.status);
+            }
+            
+            // Update current word index if provided
+            if (data.next_word_index !== undefined) {
+                this.currentWordIndex = data.next_word_index;
+                this.highlightCurrentWord(this.currentWordIndex);
+                
+                // Auto scroll if enabled
+                if (this.options.autoScroll) {
+                    this.scrollToCurrentWord(this.currentWordIndex);
+                }
+            }
+        }
+    }
+    
     updateWordStatus(wordIndex, status) {
         const wordElement = document.getElementById(`word-${wordIndex}`);
         if (wordElement) {
@@ -693,25 +833,39 @@ class RealtimeHighlighter {
         }
     }
     
+    requestSocketFinal() {
+        // Resolves with the "final" message once the server has scored all queued audio
+        return new Promise((resolve, reject) => {
+            this.pendingFinal = { resolve, reject };
+            this.socket.send(JSON.stringify({ type: 'finalize' }));
+        });
+    }
+    
     async finalizeReading() {
         try {
-            // Call API to finalize the reading session
-            const response = await fetch(`${this.options.apiEndpoint}/finalize-reading-tracking`, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify({})
-            });
+            let data;
             
-            if (!response.ok) {
-                // Try to get more detailed error information
-                const errorData = await response.json().catch(() => ({}));
-                throw new Error(`API error ${response.status}: ${errorData.error || response.statusText}`);
+            if (this.socketReady) {
+                data = await this.requestSocketFinal();
+            } else {
+                // Call API to finalize the reading session
+                const response = await fetch(`${this.options.apiEndpoint}/finalize-reading-tracking`, {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json'
+                    },
+                    body: JSON.stringify({})
+                });
+                
+                if (!response.ok) {
+                    // Try to get more detailed error information
+                    const errorData = await response.json().catch(() => ({}));
+                    throw new Error(`API error ${response.status}: ${errorData.error || response.statusText}`);
+                }
+                
+                data = await response.json();
             }
             
-            const data = await response.json();
-            
             if (!data.success) {
                 throw new Error(data.error || 'Failed to finalize reading');
             }
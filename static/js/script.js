@@ -2,6 +2,7 @@ document.addEventListener('DOMContentLoaded', function() {
     // Global state
     const state = {
         original_text: '',
+        passage_id: null,
         passage_title: '',
         spoken_text: '',
         transcription_result: null,
@@ -13,9 +14,16 @@ document.addEventListener('DOMContentLoaded', function() {
         mediaRecorder: null,
         audioChunks: [],
         recordingTimer: null,
-        recordingTime: 0
+        recordingTime: 0,
+        uploadId: null,
+        uploadChain: Promise.resolve(),
+        uploadFailed: false
     };
 
+    // The recording is uploaded in chunks of this length while the student reads, so the
+    // server can transcribe the finished parts before the recording is stopped
+    const RECORDING_CHUNK_MS = 2000;
+
     // Navigation elements
     const navButtons = {
         textInput: document.getElementById('nav-text-input'),
@@ -106,28 +114,73 @@ document.addEventListener('DOMContentLoaded', function() {
             const formData = new FormData();
             formData.append('file', forms.fileUpload.files[0]);
             formData.append('grade_level', elements.gradeLevel.value);
+            formData.append('stream', '1');
             
             showAlert('Uploading and processing file...', 'info');
             
+            // Pages are streamed back as NDJSON so the preview fills in while the rest is processed
+            const pageTexts = [];
+            
+            function handleMessage(message) {
+                if (message.type === 'start') {
+                    // The passage is stored from the first page on, so reading can start early
+                    state.passage_id = message.passage_id;
+                    state.passage_title = message.title;
+                    elements.previewTitle.textContent = message.title;
+                    elements.previewText.textContent = '';
+                    elements.previewCard.classList.remove('d-none');
+                } else if (message.type === 'page') {
+                    if (message.saved) {
+                        // The stored passage grew; text fetched before this page is stale
+                        HighlightRenderer.forgetPassage(state.passage_id);
+                    }
+                    pageTexts.push(message.text);
+                    state.original_text = pageTexts.join('\n\n');
+                    elements.previewText.textContent = state.original_text;
+                } else if (message.type === 'done') {
+                    // The stored passage is the pages joined as shown, so the preview is already final;
+                    // pages since the last save were stored just before this message
+                    HighlightRenderer.forgetPassage(state.passage_id);
+                    if (message.truncated) {
+                        showAlert(message.warning, 'warning');
+                    } else {
+                        showAlert('Text successfully extracted!', 'success');
+                    }
+                } else if (message.type === 'error') {
+                    showAlert(message.error || 'Error extracting text.', 'danger');
+                }
+            }
+            
             fetch('/api/extract-text', {
                 method: 'POST',
                 body: formData
             })
-            .then(response => response.json())
-            .then(data => {
-                if (data.success) {
-                    state.original_text = data.text;
-                    state.passage_title = data.title;
-                    
-                    // Show the preview
-                    elements.previewTitle.textContent = data.title;
-                    elements.previewText.textContent = data.text;
-                    elements.previewCard.classList.remove('d-none');
-                    
-                    showAlert('Text successfully extracted!', 'success');
-                } else {
-                    showAlert(data.error || 'Error extracting text.', 'danger');
+            .then(response => {
+                if (!response.ok || !response.body) {
+                    return response.json().then(data => {
+                        showAlert(data.error || 'Error extracting text.', 'danger');
+                    });
+                }
+                
+                const reader = response.body.getReader();
+                const decoder = new TextDecoder();
+                let buffer = '';
+                
+                function readChunk() {
+                    return reader.read().then(({ done, value }) => {
+                        buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+                        const lines = buffer.split('\n');
+                        buffer = done ? '' : lines.pop();
+                        
+                        const pending = lines
+                            .filter(line => line.trim())
+                            .map(line => handleMessage(JSON.parse(line)));
+                        
+                        return Promise.all(pending).then(() => (done ? null : readChunk()));
+                    });
                 }
+                
+                return readChunk();
             })
             .catch(error => {
                 console.error('Error:', error);
@@ -162,6 +215,7 @@ document.addEventListener('DOMContentLoaded', function() {
             .then(data => {
                 if (data.success) {
                     state.original_text = data.text;
+                    state.passage_id = data.passage_id;
                     state.passage_title = data.title;
                     
                     // Show the preview
@@ -468,13 +522,32 @@ document.addEventListener('DOMContentLoaded', function() {
                     // Create a new MediaRecorder instance
                     state.mediaRecorder = new MediaRecorder(stream);
                     state.audioChunks = [];
+                    state.uploadId = null;
+                    state.uploadChain = Promise.resolve();
+                    state.uploadFailed = false;
+                    let chunkIndex = 0;
+                    const startedAt = performance.now();
                     
-                    // Start the recording
-                    state.mediaRecorder.start();
+                    // Start the recording, delivering a chunk every RECORDING_CHUNK_MS
+                    state.mediaRecorder.start(RECORDING_CHUNK_MS);
                     
                     // Event handler when data is available
                     state.mediaRecorder.addEventListener('dataavailable', event => {
                         state.audioChunks.push(event.data);
+                        if (event.data.size === 0) {
+                            return;
+                        }
+                        
+                        // Chunks are uploaded one after another, in order
+                        const index = chunkIndex++;
+                        const elapsed = (performance.now() - startedAt) / 1000;
+                        state.uploadChain = state.uploadChain
+                            .then(() => state.uploadFailed ? null : uploadRecordingChunk(event.data, index, elapsed))
+                            .catch(error => {
+                                // The whole recording is uploaded after it stops instead
+                                console.warn('Error uploading recording chunk:', error);
+                                state.uploadFailed = true;
+                            });
                     });
                     
                     // Event handler when recording is stopped
@@ -555,6 +628,8 @@ document.addEventListener('DOMContentLoaded', function() {
         // Reset state
         state.audioChunks = [];
         state.recordingTime = 0;
+        state.uploadId = null;
+        state.uploadFailed = false;
         
         // Update UI
         buttons.startRecording.classList.remove('d-none');
@@ -564,38 +639,98 @@ document.addEventListener('DOMContentLoaded', function() {
         elements.recordingTime.textContent = '00:00';
     }
 
+    // Upload one chunk of the recording while it is still going on
+    function uploadRecordingChunk(blob, index, elapsed) {
+        const formData = new FormData();
+        formData.append('audio', blob);
+        formData.append('index', index);
+        formData.append('elapsed', elapsed.toFixed(2));
+        if (state.uploadId) {
+            formData.append('upload_id', state.uploadId);
+        } else {
+            formData.append('original_text', state.original_text);
+        }
+        
+        return fetch('/api/recording-segments', {
+            method: 'POST',
+            body: formData
+        })
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Chunk upload failed');
+            }
+            return response.json();
+        })
+        .then(data => {
+            state.uploadId = data.upload_id;
+        });
+    }
+
+    // Transcribe the chunks uploaded during the recording; most of it is transcribed already
+    function finishSegmentedUpload() {
+        const formData = new FormData();
+        formData.append('audio_duration', state.audio_duration);
+        formData.append('grade_level', elements.gradeLevel.value);
+        
+        return fetch(`/api/recording-segments/${state.uploadId}/finish`, {
+            method: 'POST',
+            body: formData
+        })
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Network response was not ok');
+            }
+            return response.json();
+        });
+    }
+
+    // Upload the whole recording at once (when the chunked upload did not work)
+    function uploadWholeRecording() {
+        // Create a Blob from the audio chunks
+        const audioBlob = new Blob(state.audioChunks, { type: 'audio/webm' });
+        
+        // Create a FormData object for sending the audio
+        const formData = new FormData();
+        formData.append('audio', audioBlob);
+        formData.append('original_text', state.original_text);
+        formData.append('grade_level', elements.gradeLevel.value);
+        formData.append('audio_duration', state.audio_duration);
+        
+        // Send the audio to the server for transcription
+        return fetch('/api/transcribe-audio', {
+            method: 'POST',
+            body: formData
+        })
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Network response was not ok');
+            }
+            return response.json();
+        });
+    }
+
     // Process recorded audio
     function processAudio() {
         // Show loading spinner
         elements.transcriptionLoading.classList.remove('d-none');
         
         try {
-            // Create a Blob from the audio chunks
-            const audioBlob = new Blob(state.audioChunks, { type: 'audio/webm' });
-            
-            // Create a FormData object for sending the audio
-            const formData = new FormData();
-            formData.append('audio', audioBlob);
-            formData.append('original_text', state.original_text);
-            formData.append('grade_level', elements.gradeLevel.value);
-            
             // Calculate audio duration (in seconds)
             state.audio_duration = state.recordingTime;
-            formData.append('audio_duration', state.audio_duration);
             
             console.log('Sending audio for transcription...');
             console.log('Audio duration:', state.audio_duration);
             
-            // Send the audio to the server for transcription
-            fetch('/api/transcribe-audio', {
-                method: 'POST',
-                body: formData
-            })
-            .then(response => {
-                if (!response.ok) {
-                    throw new Error('Network response was not ok');
+            // Wait for the last chunk to be uploaded, then collect the transcription
+            state.uploadChain
+            .then(() => {
+                if (state.uploadId && !state.uploadFailed) {
+                    return finishSegmentedUpload().catch(error => {
+                        console.warn('Error finishing the chunked upload:', error);
+                        return uploadWholeRecording();
+                    });
                 }
-                return response.json();
+                return uploadWholeRecording();
             })
             .then(data => {
                 if (data.success) {
@@ -735,7 +870,8 @@ document.addEventListener('DOMContentLoaded', function() {
                 grade_level: elements.gradeLevel.value,
                 audio_duration: state.audio_duration,
                 student_name: elements.studentName.value || 'Anonymous Student',
-                passage_title: state.passage_title
+                passage_title: state.passage_title,
+                format: 'compact'  // Structured highlighting, rendered client-side
             };
             
             // Include grammar evaluation if available
@@ -767,7 +903,7 @@ document.addEventListener('DOMContentLoaded', function() {
                     state.analysis_result = data.analysis;
                     
                     // Display results
-                    displayComprehensiveResults(data.analysis, data.highlighted_text);
+                    displayComprehensiveResults(data.analysis, data.highlighting || data.highlighted_text);
                     
                     // Enable results navigation
                     navButtons.results.disabled = false;
@@ -847,8 +983,14 @@ document.addEventListener('DOMContentLoaded', function() {
         document.getElementById('wpm-score').textContent = Math.round(analysis.fluency_metrics.words_per_minute);
         document.getElementById('comprehension-score').textContent = `${Math.round(analysis.comprehension_estimate)}%`;
         
-        // Highlighted text
-        document.getElementById('highlighted-text').innerHTML = highlightedText;
+        // Highlighted text (compact responses are rendered from the passage text we already have)
+        const highlightedContainer = document.getElementById('highlighted-text');
+        if (highlightedText && typeof highlightedText === 'object') {
+            HighlightRenderer.renderCompact(highlightedContainer, highlightedText, { text: state.original_text })
+                .catch(error => console.error('Error rendering highlighting:', error));
+        } else {
+            highlightedContainer.innerHTML = highlightedText;
+        }
         
         // Fluency metrics table
         document.getElementById('wpm-value').textContent = Math.round(analysis.fluency_metrics.words_per_minute);